@@ -0,0 +1,140 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Benchmark of the start-up time of run.py.
+
+Measures the time to import run.py and to list experiments from the cached
+index, and checks that listing doesn't import any of the modules run.py only
+needs to actually run experiments. Exits with an error if the listing imports
+them or takes longer than the given budget.
+
+Run from the experiments directory, e.g. `python3 bench_startup.py`."""
+
+import argparse
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = [
+    'asyncio',
+    'simbricks.orchestration.exectools',
+    'simbricks.orchestration.experiments',
+    'simbricks.orchestration.runtime',
+    'simbricks.orchestration.simulators',
+    'simbricks.orchestration.nodeconfig',
+    'simbricks.orchestration.e2e_components',
+    'simbricks.orchestration.e2e_topologies',
+]
+"""Modules that must not be imported when listing cached experiments."""
+
+
+def timed(cmd, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def imported_modules(cmd):
+    p = subprocess.run(
+        [sys.executable, '-X', 'importtime'] + cmd,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    mods = set()
+    for line in p.stderr.splitlines():
+        if line.startswith('import time:') and line.count('|') == 2:
+            mods.add(line.split('|')[2].strip())
+    return mods
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'modules',
+        metavar='EXP',
+        nargs='*',
+        help='Experiment modules to list (default: pyexps/*.py)'
+    )
+    parser.add_argument(
+        '--repeat',
+        metavar='N',
+        type=int,
+        default=10,
+        help='Number of repetitions per measurement'
+    )
+    parser.add_argument(
+        '--budget-ms',
+        metavar='MS',
+        type=float,
+        default=200,
+        help='Maximum time for listing cached experiments on top of the '
+        'interpreter start-up'
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        run = ['run.py', '--workdir', workdir, '--list']
+
+        # fill the index, skipping files that aren't experiment modules
+        modules = []
+        for m in args.modules or sorted(glob.glob('pyexps/*.py')):
+            p = subprocess.run(
+                [sys.executable] + run + [m],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=False
+            )
+            if p.returncode == 0:
+                modules.append(m)
+        if not os.path.exists(f'{workdir}/.exp_index.json'):
+            sys.exit('no experiment modules to list')
+
+        baseline = timed([sys.executable, '-c', 'pass'], args.repeat)
+        t_import = timed([sys.executable, '-c', 'import run'], args.repeat)
+        t_list = timed([sys.executable] + run + modules, args.repeat)
+        heavy = imported_modules(run + modules) & set(HEAVY_MODULES)
+
+    print(f'modules listed:       {len(modules)}')
+    print(f'interpreter start-up: {baseline * 1e3:.1f} ms')
+    print(f'import run.py:        {(t_import - baseline) * 1e3:.1f} ms')
+    print(f'cached --list:        {(t_list - baseline) * 1e3:.1f} ms')
+
+    failed = False
+    if heavy:
+        print(f'error: --list imports {", ".join(sorted(heavy))}')
+        failed = True
+    if (t_list - baseline) * 1e3 > args.budget_ms:
+        print(f'error: --list exceeds budget of {args.budget_ms:.0f} ms')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
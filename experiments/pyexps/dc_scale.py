@@ -0,0 +1,76 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Scaling experiments with hosts in leaf-spine and fat-tree topologies. Each
+client host sends to a server host in the other half of the topology, and the
+tiers above the edge are simulated either by SimBricks switches or by ns-3.
+"""
+
+import simbricks.orchestration.experiments as exp
+import simbricks.orchestration.nodeconfig as node
+import simbricks.orchestration.simulators as sim
+from simbricks.orchestration import dc_topologies as dc
+
+topologies = {
+    'ls-4x2x2': dc.leaf_spine(4, 2, 2),
+    'ls-40x8x25': dc.leaf_spine(40, 8, 25),
+    'ft-4': dc.fat_tree(4),
+    'ft-16': dc.fat_tree(16),
+}
+upper_tiers = ['switch', 'ns3']
+experiments = []
+
+for (topo_name, topo) in topologies.items():
+    for upper in upper_tiers:
+        e = exp.Experiment(f'dc_scale-{topo_name}-{upper}')
+        ns3_tiers = range(1, len(topo.tiers)) if upper == 'ns3' else ()
+        dcnet = dc.DCNetwork(topo, ns3_tiers=ns3_tiers)
+
+        hosts = []
+        for (switch, slots) in dcnet.edge_slots():
+            for (ip, prefix, mac) in slots:
+                nic = sim.I40eNIC()
+                nic.name = f'nic-{ip}'
+                nic.mac = mac
+                nic.set_network(switch)
+                e.add_nic(nic)
+
+                node_config = node.I40eLinuxNode()
+                node_config.ip = ip
+                node_config.prefix = prefix
+                host = sim.QemuHost(node_config)
+                host.name = f'host-{ip}'
+                host.add_nic(nic)
+                e.add_host(host)
+                hosts.append(host)
+        dcnet.add_to_experiment(e)
+
+        half = len(hosts) // 2
+        for (i, host) in enumerate(hosts):
+            if i < half:
+                host.node_config.app = node.TcpCongClient()
+                host.node_config.app.server_ip = hosts[half + i].node_config.ip
+                host.wait = True
+            else:
+                host.node_config.app = node.TcpCongServer()
+
+        experiments.append(e)
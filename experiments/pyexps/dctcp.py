@@ -23,7 +23,9 @@
 import simbricks.orchestration.experiments as exp
 import simbricks.orchestration.nodeconfig as node
 import simbricks.orchestration.simulators as sim
+from simbricks.orchestration.convergence import Metric
 from simbricks.orchestration.simulator_utils import create_dctcp_hosts
+from simbricks.orchestration.sweep import Sweep
 
 # iperf TCP_multi_client test
 # naming convention following host-nic-net-app
@@ -51,112 +53,126 @@ sys_clock = '1GHz'  # if not set, default 1GHz
 
 ip_start = '192.168.64.1'
 
-experiments = []
+# opt-in: end runs once the total iperf throughput of the clients has converged
+early_stop = False
 
 # set network sim
 NetClass = sim.NS3DumbbellNet
 
-for mtu in types_of_mtu:
-    for host in types_of_host:
-        for nic in types_of_nic:
-            for k_val in range(0, max_k + 1, k_step):
-
-                net = NetClass()
-                net.opt = link_rate_opt + link_latency_opt + f'--EcnTh={k_val}'
-
-                e = exp.Experiment(
-                    host + '-' + nic + '-' + 'dumbbell' + '-' + 'DCTCPm' +
-                    f'{k_val}' + f'-{mtu}'
-                )
-                e.add_network(net)
-
-                freq = cpu_freq
-                # host
-                if host == 'qemu':
-                    HostClass = sim.QemuHost
-                elif host == 'qt':
-                    freq = cpu_freq_qemu
-
-                    def qemu_timing(node_config: node.NodeConfig):
-                        h = sim.QemuHost(node_config)
-                        h.sync = True
-                        return h
-
-                    HostClass = qemu_timing
-                elif host == 'gt':
-
-                    def gem5_timing(node_config: node.NodeConfig):
-                        h = sim.Gem5Host(node_config)
-                        #h.sys_clock = sys_clock
-                        return h
-
-                    HostClass = gem5_timing
-                    e.checkpoint = True
-                elif host == 'gO3':
-
-                    def gem5_o3(node_config: node.NodeConfig):
-                        h = sim.Gem5Host(node_config)
-                        h.cpu_type = 'DerivO3CPU'
-                        h.sys_clock = sys_clock
-                        return h
-
-                    HostClass = gem5_o3
-                    e.checkpoint = True
-                else:
-                    raise NameError(host)
-
-                # nic
-                if nic == 'ib':
-                    NicClass = sim.I40eNIC
-                    NcClass = node.I40eDCTCPNode
-                elif nic == 'cb':
-                    NicClass = sim.CorundumBMNIC
-                    NcClass = node.CorundumDCTCPNode
-                elif nic == 'cv':
-                    NicClass = sim.CorundumVerilatorNIC
-                    NcClass = node.CorundumDCTCPNode
-                else:
-                    raise NameError(nic)
-
-                servers = create_dctcp_hosts(
-                    e,
-                    num_pairs,
-                    'server',
-                    net,
-                    NicClass,
-                    HostClass,
-                    NcClass,
-                    node.DctcpServer,
-                    freq,
-                    mtu
-                )
-                clients = create_dctcp_hosts(
-                    e,
-                    num_pairs,
-                    'client',
-                    net,
-                    NicClass,
-                    HostClass,
-                    NcClass,
-                    node.DctcpClient,
-                    freq,
-                    mtu,
-                    ip_start=num_pairs + 1
-                )
-
-                i = 0
-                for cl in clients:
-                    cl.node_config.app.server_ip = servers[i].node_config.ip
-                    i += 1
-
-                # All the clients will not poweroff after finishing iperf test
-                # except the last one This is to prevent the simulation gets
-                # stuck when one of host exits.
-
-                # The last client waits for the output printed in other hosts,
-                # then cleanup
-                clients[num_pairs - 1].node_config.app.is_last = True
-                clients[num_pairs - 1].wait = True
-
-                print(e.name)
-                experiments.append(e)
+
+def make_experiment(
+    name: str, mtu: int, host: str, nic: str, k_val: int
+) -> exp.Experiment:
+    net = NetClass()
+    net.opt = link_rate_opt + link_latency_opt + f'--EcnTh={k_val}'
+
+    e = exp.Experiment(name)
+    e.add_network(net)
+
+    freq = cpu_freq
+    # host
+    if host == 'qemu':
+        HostClass = sim.QemuHost
+    elif host == 'qt':
+        freq = cpu_freq_qemu
+
+        def qemu_timing(node_config: node.NodeConfig):
+            h = sim.QemuHost(node_config)
+            h.sync = True
+            return h
+
+        HostClass = qemu_timing
+    elif host == 'gt':
+
+        def gem5_timing(node_config: node.NodeConfig):
+            h = sim.Gem5Host(node_config)
+            #h.sys_clock = sys_clock
+            return h
+
+        HostClass = gem5_timing
+        e.checkpoint = True
+    elif host == 'gO3':
+
+        def gem5_o3(node_config: node.NodeConfig):
+            h = sim.Gem5Host(node_config)
+            h.cpu_type = 'DerivO3CPU'
+            h.sys_clock = sys_clock
+            return h
+
+        HostClass = gem5_o3
+        e.checkpoint = True
+    else:
+        raise NameError(host)
+
+    # nic
+    if nic == 'ib':
+        NicClass = sim.I40eNIC
+        NcClass = node.I40eDCTCPNode
+    elif nic == 'cb':
+        NicClass = sim.CorundumBMNIC
+        NcClass = node.CorundumDCTCPNode
+    elif nic == 'cv':
+        NicClass = sim.CorundumVerilatorNIC
+        NcClass = node.CorundumDCTCPNode
+    else:
+        raise NameError(nic)
+
+    servers = create_dctcp_hosts(
+        e,
+        num_pairs,
+        'server',
+        net,
+        NicClass,
+        HostClass,
+        NcClass,
+        node.DctcpServer,
+        freq,
+        mtu
+    )
+    clients = create_dctcp_hosts(
+        e,
+        num_pairs,
+        'client',
+        net,
+        NicClass,
+        HostClass,
+        NcClass,
+        node.DctcpClient,
+        freq,
+        mtu,
+        ip_start=num_pairs + 1
+    )
+
+    i = 0
+    for cl in clients:
+        cl.node_config.app.server_ip = servers[i].node_config.ip
+        i += 1
+
+    # All the clients will not poweroff after finishing iperf test
+    # except the last one This is to prevent the simulation gets
+    # stuck when one of host exits.
+
+    # The last client waits for the output printed in other hosts,
+    # then cleanup
+    clients[num_pairs - 1].node_config.app.is_last = True
+    clients[num_pairs - 1].wait = True
+
+    if early_stop:
+        e.convergence.append(Metric('throughput', clients))
+
+    return e
+
+
+# experiments are only constructed once selected by name
+experiments = [
+    Sweep(
+        '{host}-{nic}-dumbbell-DCTCPm{k_val}-{mtu}',
+        make_experiment,
+        {
+            'mtu': types_of_mtu,
+            'host': types_of_host,
+            'nic': types_of_nic,
+            'k_val': range(0, max_k + 1, k_step),
+        }
+    )
+]
@@ -26,7 +26,7 @@ import random
 import simbricks.orchestration.experiments as exp
 import simbricks.orchestration.nodeconfig as node
 import simbricks.orchestration.simulators as sim
-from simbricks.orchestration import proxy
+from simbricks.orchestration import partition
 from simbricks.orchestration.simulator_utils import create_multinic_hosts
 
 host_types = ['qemu', 'gem5', 'qt']
@@ -84,6 +84,8 @@ for host_type in host_types:
                     return h
 
                 HostClass = qemu_timing
+                # hosts boot before using their NICs, which start at this time
+                e.set_phases(warmup_duration=580000000)
             elif host_type == 'gem5':
                 HostClass = sim.Gem5Host
                 e.checkpoint = False
@@ -98,6 +100,7 @@ for host_type in host_types:
             e.assign_sim_host(switch_top, 0)
 
             racks = []
+            remote_n2ns = {}
             for i in range(0, n):
                 h_i = int(i / nets_per_host)
                 if separate_net:
@@ -156,23 +159,16 @@ for host_type in host_types:
                 racks.append((servers, clients))
 
                 if h_i != 0:
-                    lp = proxy.SocketsNetProxyListener()
-                    lp.name = f'listener-{i}'
-                    e.add_proxy(lp)
-                    e.assign_sim_host(lp, h_i)
-
-                    cp = proxy.SocketsNetProxyConnecter(lp)
-                    cp.name = f'connecter-{i}'
-                    e.add_proxy(cp)
-                    e.assign_sim_host(cp, 0)
-
-                    lp.add_n2n(switch_top, switch)
+                    remote_n2ns.setdefault(h_i, []).append((switch_top, switch))
 
                 for c in clients + servers:
-                    if host_type == 'qt':
-                        c.pcidevs[0].start_tick = 580000000000
                     c.extra_deps.append(switch_top)
 
+            # proxies between the top switch and the racks on other hosts,
+            # listening on the racks' hosts
+            for (h_i, n2ns) in remote_n2ns.items():
+                partition.add_proxy_pairs(e, h_i, 0, n2ns=n2ns)
+
             all_servers = []
             all_clients = []
             for (s, c) in racks:
@@ -130,8 +130,8 @@ for host_type in host_types:
 
                     lp.add_n2n(switch_top, switch)
 
-                for c in clients + servers:
-                    c.pcidevs[0].start_tick = 580000000000
+            # hosts boot before using their NICs, which start at this time
+            e.set_phases(warmup_duration=580000000)
 
             # add to experiments
             experiments.append(e)
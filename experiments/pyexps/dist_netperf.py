@@ -23,7 +23,7 @@
 import simbricks.orchestration.experiments as exp
 import simbricks.orchestration.nodeconfig as node
 import simbricks.orchestration.simulators as sim
-from simbricks.orchestration import proxy
+from simbricks.orchestration import partition
 from simbricks.orchestration.simulator_utils import create_basic_hosts
 
 host_types = ['qemu', 'gem5', 'qt']
@@ -100,30 +100,24 @@ for host_type in host_types:
                 c.wait = True
                 c.node_config.app.server_ip = servers[0].node_config.ip
 
-            # create proxy
-            lp = proxy.SocketsNetProxyListener()
-            lp.name = 'listener'
-            e.add_proxy(lp)
-            cp = proxy.SocketsNetProxyConnecter(lp)
-            cp.name = 'connecter'
-            e.add_proxy(cp)
-
-            # assign network and server to first host with listener
-            e.assign_sim_host(lp, 0)
+            # assign network and server to first host
             e.assign_sim_host(net, 0)
             e.assign_sim_host(servers[0], 0)
             e.assign_sim_host(servers[0].pcidevs[0], 0)
-            e.assign_sim_host(cp, 1)
 
             # round-robin assignment for hosts
             k = 1
+            remote_nics = []
             for c in clients:
                 e.assign_sim_host(c, k)
                 e.assign_sim_host(c.pcidevs[0], k)
 
                 if k != 0:
-                    cp.add_nic(c.nics[0])
+                    remote_nics.append(c.nics[0])
                 k = (k + 1) % 2
 
+            # proxies between the hosts, listening on the first one
+            partition.add_proxy_pairs(e, 0, 1, nics=remote_nics)
+
             # add to experiments
             experiments.append(e)
@@ -0,0 +1,95 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Network benchmarks with packet generators instead of hosts.
+
+Naming: pktgen-<net>-<mix>-<generators>-<rate per generator>-<packet size>
+net: sw (one switch), db (dumbbell of two switches), tofino
+mix: pair (generators send to their neighbour), incast (all send to the
+     first), uniform (all send to all others)
+"""
+
+import simbricks.orchestration.experiments as exp
+import simbricks.orchestration.simulators as sim
+
+net_types = ['sw', 'db', 'tofino']
+mixes = ['pair', 'incast', 'uniform']
+num_gens = [2, 8, 32]
+rates = [1, 10, 100]  # Gbps
+packet_sizes = [64, 1500]
+duration = 10 * 1000 * 1000  # 10ms
+
+experiments = []
+
+for net_type in net_types:
+    for mix in mixes:
+        for n in num_gens:
+            for rate in rates:
+                for size in packet_sizes:
+                    e = exp.Experiment(
+                        f'pktgen-{net_type}-{mix}-{n}-{rate}g-{size}'
+                    )
+
+                    if net_type == 'sw':
+                        nets = [sim.SwitchNet()]
+                    elif net_type == 'db':
+                        nets = [sim.SwitchNet(), sim.SwitchNet()]
+                        nets[1].connect_network(nets[0])
+                    elif net_type == 'tofino':
+                        nets = [sim.TofinoNet()]
+                    else:
+                        raise NameError(net_type)
+                    for (i, net) in enumerate(nets):
+                        net.name = f'net{i}'
+                        e.add_network(net)
+
+                    gens = []
+                    for i in range(n):
+                        g = sim.PktGenHost()
+                        g.name = f'gen{i}'
+                        # 0 would be the network address of the subnet
+                        g.gen_id = i + 1
+                        g.rate = rate
+                        g.packet_size = size
+                        g.duration = duration
+                        # split generators evenly across the dumbbell
+                        g.set_network(nets[i * len(nets) // n])
+                        e.add_nic(g)
+                        gens.append(g)
+
+                    for (i, g) in enumerate(gens):
+                        if mix == 'incast':
+                            if i != 0:
+                                g.add_flow(gens[0])
+                            else:
+                                g.rate = 0
+                        elif mix == 'uniform':
+                            for d in gens:
+                                if d is not g:
+                                    g.add_flow(d)
+                        elif mix == 'pair':
+                            # the default peer gen_id ^ 1 pairs 1 with 0
+                            g.add_flow(gens[i ^ 1])
+                        else:
+                            raise NameError(mix)
+
+                    experiments.append(e)
@@ -24,6 +24,7 @@ import simbricks.orchestration.experiments as exp
 import simbricks.orchestration.nodeconfig as node
 import simbricks.orchestration.simulators as sim
 from simbricks.orchestration.simulator_utils import create_basic_hosts
+from simbricks.orchestration.sweep import Sweep
 
 # iperf UDP test
 # naming convention following host-nic-net-app
@@ -45,93 +46,99 @@ num_client_types = [1, 4, 9, 14, 20]
 #    num_client_types.append(n)
 #    print(n)
 
-experiments = []
-
-for n_client in num_client_types:
 
+def make_experiment(
+    name: str, n_client: int, host_type: str, nic_type: str, net_type: str
+) -> exp.Experiment:
     per_client_rate = int(total_rate / n_client)
     rate = f'{per_client_rate}m'
 
-    for host_type in host_types:
-        for nic_type in nic_types:
-            for net_type in net_types:
-
-                e = exp.Experiment(
-                    host_type + '-' + nic_type + '-' + net_type + '-Host-' +
-                    f'{total_rate}m' + f'-{n_client}'
-                )
-                # network
-                if net_type == 'sw':
-                    net = sim.SwitchNet()
-                elif net_type == 'br':
-                    net = sim.NS3BridgeNet()
-                else:
-                    raise NameError(net_type)
-                e.add_network(net)
-
-                # host
-                if host_type == 'qemu':
-                    HostClass = sim.QemuHost
-                elif host_type == 'qt':
-
-                    def qemu_timing(node_config: node.NodeConfig):
-                        h = sim.QemuHost(node_config)
-                        h.sync = True
-                        return h
-
-                    HostClass = qemu_timing
-                elif host_type == 'gt':
-                    HostClass = sim.Gem5Host
-                    e.checkpoint = True
-                else:
-                    raise NameError(host_type)
-
-                # nic
-                if nic_type == 'ib':
-                    NicClass = sim.I40eNIC
-                    NcClass = node.I40eLinuxNode
-                elif nic_type == 'cb':
-                    NicClass = sim.CorundumBMNIC
-                    NcClass = node.CorundumLinuxNode
-                elif nic_type == 'cv':
-                    NicClass = sim.CorundumVerilatorNIC
-                    NcClass = node.CorundumLinuxNode
-                else:
-                    raise NameError(nic_type)
-
-                # create servers and clients
-                servers = create_basic_hosts(
-                    e,
-                    1,
-                    'server',
-                    net,
-                    NicClass,
-                    HostClass,
-                    NcClass,
-                    node.IperfUDPServer
-                )
-
-                clients = create_basic_hosts(
-                    e,
-                    n_client,
-                    'client',
-                    net,
-                    NicClass,
-                    HostClass,
-                    NcClass,
-                    node.IperfUDPClient,
-                    ip_start=2
-                )
-
-                clients[n_client - 1].node_config.app.is_last = True
-                clients[n_client - 1].wait = True
-
-                for c in clients:
-                    c.node_config.app.server_ip = servers[0].node_config.ip
-                    c.node_config.app.rate = rate
-                    #c.wait = True
-
-                print(e.name)
-
-                # add to experiments
-                experiments.append(e)
+    e = exp.Experiment(name)
+    # network
+    if net_type == 'sw':
+        net = sim.SwitchNet()
+    elif net_type == 'br':
+        net = sim.NS3BridgeNet()
+    else:
+        raise NameError(net_type)
+    e.add_network(net)
+
+    # host
+    if host_type == 'qemu':
+        HostClass = sim.QemuHost
+    elif host_type == 'qt':
+
+        def qemu_timing(node_config: node.NodeConfig):
+            h = sim.QemuHost(node_config)
+            h.sync = True
+            return h
+
+        HostClass = qemu_timing
+    elif host_type == 'gt':
+        HostClass = sim.Gem5Host
+        e.checkpoint = True
+    else:
+        raise NameError(host_type)
+
+    # nic
+    if nic_type == 'ib':
+        NicClass = sim.I40eNIC
+        NcClass = node.I40eLinuxNode
+    elif nic_type == 'cb':
+        NicClass = sim.CorundumBMNIC
+        NcClass = node.CorundumLinuxNode
+    elif nic_type == 'cv':
+        NicClass = sim.CorundumVerilatorNIC
+        NcClass = node.CorundumLinuxNode
+    else:
+        raise NameError(nic_type)
+
+    # create servers and clients
+    servers = create_basic_hosts(
+        e,
+        1,
+        'server',
+        net,
+        NicClass,
+        HostClass,
+        NcClass,
+        node.IperfUDPServer
+    )
+
+    clients = create_basic_hosts(
+        e,
+        n_client,
+        'client',
+        net,
+        NicClass,
+        HostClass,
+        NcClass,
+        node.IperfUDPClient,
+        ip_start=2
+    )
+
+    clients[n_client - 1].node_config.app.is_last = True
+    clients[n_client - 1].wait = True
+
+    for c in clients:
+        c.node_config.app.server_ip = servers[0].node_config.ip
+        c.node_config.app.rate = rate
+        #c.wait = True
+
+    return e
+
+
+# experiments are only constructed once selected by name
+experiments = [
+    Sweep(
+        '{host_type}-{nic_type}-{net_type}-Host-' + f'{total_rate}m' +
+        '-{n_client}',
+        make_experiment,
+        {
+            'n_client': num_client_types,
+            'host_type': host_types,
+            'nic_type': nic_types,
+            'net_type': net_types,
+        }
+    )
+]
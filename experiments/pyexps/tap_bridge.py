@@ -0,0 +1,56 @@
+# Copyright 2022 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Bridges a simulated host to a TAP device on the machine running the experiment.
+
+The host is reachable from the machine as 10.0.0.1 through the device
+`tapsim`, which gets the address 10.0.0.100. Creating the device requires
+root privileges. The host runs until the experiment is interrupted.
+"""
+
+from simbricks.orchestration.experiments import Experiment
+from simbricks.orchestration.nodeconfig import I40eLinuxNode, IdleHost
+from simbricks.orchestration.simulators import I40eNIC, QemuHost, TapNet
+
+e = Experiment(name='tap_bridge')
+
+host_config = I40eLinuxNode()
+host_config.ip = '10.0.0.1'
+host_config.app = IdleHost()
+host = QemuHost(host_config)
+host.name = 'host'
+host.wait = True
+e.add_host(host)
+
+nic = I40eNIC()
+nic.name = 'nic'
+e.add_nic(nic)
+host.add_nic(nic)
+
+tap = TapNet()
+tap.name = 'sim'
+tap.create_tap = True
+tap.tap_ip = '10.0.0.100/24'
+e.add_network(tap)
+nic.set_network(tap)
+
+experiments = [e]
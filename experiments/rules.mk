@@ -33,4 +33,7 @@ typecheck-python:
 			experiments/simbricks/orchestration/utils/graphlib.py \
 		-- experiments/ results/
 
+bench-startup-python:
+	cd experiments && python3 bench_startup.py
+
 include mk/subdir_post.mk
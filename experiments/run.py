@@ -22,22 +22,26 @@
 """This is the top-level module of the SimBricks orchestration framework that
 users interact with."""
 
+from __future__ import annotations
+
 import argparse
-import asyncio
-import fnmatch
 import importlib
 import importlib.util
 import json
 import os
-import pickle
-import signal
 import sys
 import typing as tp
 
-from simbricks.orchestration import exectools
-from simbricks.orchestration import experiments as exps
-from simbricks.orchestration import runtime
-from simbricks.orchestration.experiment import experiment_environment
+from simbricks.orchestration import sweep
+from simbricks.orchestration.exp_index import ExperimentIndex
+
+# The modules below pull in asyncio and all simulator definitions. They are
+# only imported once experiments actually run, so that --list is fast.
+# pylint: disable=import-outside-toplevel
+if tp.TYPE_CHECKING:
+    from simbricks.orchestration import exectools
+    from simbricks.orchestration import experiments as exps
+    from simbricks.orchestration import runtime
 
 
 def parse_args() -> argparse.Namespace:
@@ -55,7 +59,7 @@ def parse_args() -> argparse.Namespace:
         action='store_const',
         const=True,
         default=False,
-        help='List available experiment names'
+        help='List available experiment names (matching --filter if given)'
     )
     parser.add_argument(
         '--filter',
@@ -64,6 +68,14 @@ def parse_args() -> argparse.Namespace:
         nargs='+',
         help='Only run experiments matching the given Unix shell style patterns'
     )
+    parser.add_argument(
+        '--no-index-cache',
+        action='store_const',
+        const=True,
+        default=False,
+        help='Execute all experiment modules instead of using the cached '
+        'experiment names for --list and --filter'
+    )
     parser.add_argument(
         '--pickled',
         action='store_const',
@@ -102,6 +114,74 @@ def parse_args() -> argparse.Namespace:
         default=False,
         help='Dump pcap file (if supported by component simulator)'
     )
+    parser.add_argument(
+        '--pcap-sim',
+        metavar='PATTERN',
+        type=str,
+        action='append',
+        help='Only capture packets of network simulators whose name matches '
+        'this pattern (can be repeated)'
+    )
+    parser.add_argument(
+        '--pcap-dir',
+        metavar='DIR',
+        type=str,
+        default=None,
+        help='Directory for pcap files instead of the workdir'
+    )
+    parser.add_argument(
+        '--pcap-rotate-size',
+        metavar='BYTES',
+        type=int,
+        default=0,
+        help='Start a new pcap file once the current one exceeds this size'
+    )
+    parser.add_argument(
+        '--pcap-rotate-time',
+        metavar='NS',
+        type=int,
+        default=0,
+        help='Start a new pcap file every interval of virtual time'
+    )
+    parser.add_argument(
+        '--pcap-keep',
+        metavar='N',
+        type=int,
+        default=0,
+        help='Only keep the last N rotated pcap files'
+    )
+    parser.add_argument(
+        '--tune-sync',
+        action='store_const',
+        const=True,
+        default=False,
+        help='Set sync periods to the largest value not affecting accuracy, '
+        'i.e. the lowest link latency of each simulator'
+    )
+    parser.add_argument(
+        '--consolidate-nics',
+        metavar='N',
+        type=int,
+        default=0,
+        help='Run up to N i40e NICs connected to the same network in one '
+        'multi-NIC process each'
+    )
+    parser.add_argument(
+        '--pipeline',
+        action='store_const',
+        const=True,
+        default=False,
+        help='Prepare the next run while the current one is running '
+        '(sequential and distributed runtimes)'
+    )
+    parser.add_argument(
+        '--cleanup',
+        action='store_const',
+        const=True,
+        default=False,
+        help='Remove the workdir of a run once its output has been written '
+        '(sequential and distributed runtimes)'
+    )
     parser.add_argument(
         '--profile-int',
         metavar='S',
@@ -109,6 +189,45 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help='Enable periodic sigusr1 to each simulator every S seconds.'
     )
+    parser.add_argument(
+        '--progress',
+        action='store_const',
+        const=True,
+        default=False,
+        help='Print virtual-time progress of runs every profiling interval '
+        '(implies --profile-int 10 if not set)'
+    )
+    parser.add_argument(
+        '--stall-intervals',
+        metavar='N',
+        type=int,
+        default=None,
+        help='Abort runs without virtual-time progress for N profiling '
+        'intervals (implies --profile-int 10 if not set)'
+    )
+    parser.add_argument(
+        '--inactivity-timeout',
+        metavar='S',
+        type=int,
+        default=None,
+        help='Abort runs if no simulator produces output for S seconds'
+    )
+    parser.add_argument(
+        '--sample-resources',
+        metavar='S',
+        type=float,
+        default=None,
+        help='Sample CPU, memory, context switch and I/O statistics of '
+        'simulators every S seconds'
+    )
+    parser.add_argument(
+        '--instrument',
+        metavar='S',
+        type=float,
+        default=None,
+        help='Export event-loop lag and hot-path timings of the orchestrator '
+        'every S seconds and at the end to OUTDIR/orchestrator.jsonl'
+    )
 
     # arguments for the experiment environment
     g_env = parser.add_argument_group('Environment')
@@ -154,6 +273,21 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help='Shared memory directory base (workdir if not set)'
     )
+    g_env.add_argument(
+        '--shm-auto',
+        action='store_const',
+        const=True,
+        default=False,
+        help='Place shared memory on hugetlbfs or /dev/shm if --shmdir is not '
+        'set, and check available shared memory before starting runs'
+    )
+    g_env.add_argument(
+        '--disk-pool',
+        metavar='N',
+        type=int,
+        default=0,
+        help='Keep N disk images per base image ready in the background'
+    )
 
     # arguments for the parallel runtime
     g_par = parser.add_argument_group('Parallel Runtime')
@@ -222,12 +356,24 @@ def parse_args() -> argparse.Namespace:
         default='sockets',
         help='Proxy type to use (sockets,rdma) for auto distribution'
     )
+    g_dist.add_argument(
+        '--proxy-pairs',
+        metavar='N',
+        type=int,
+        default=None,
+        help=(
+            'Number of proxy pairs per pair of hosts for auto distribution '
+            '(default: based on channel count and synchronization)'
+        )
+    )
 
     return parser.parse_args()
 
 
 def load_executors(path: str) -> tp.List[exectools.Executor]:
     """Load hosts list from json file and return list of executors."""
+    from simbricks.orchestration import exectools
+
     with open(path, 'r', encoding='utf-8') as f:
         hosts = json.load(f)
 
@@ -244,6 +390,8 @@ def load_executors(path: str) -> tp.List[exectools.Executor]:
             else:
                 raise RuntimeError('invalid host type "' + h['type'] + '"')
             ex.ip = h['ip']
+            ex.cores = h.get('cores')
+            ex.mem = h.get('mem')
             exs.append(ex)
     return exs
 
@@ -266,6 +414,9 @@ def add_exp(
     no_simbricks: bool,
     args: argparse.Namespace
 ):
+    from simbricks.orchestration import runtime
+    from simbricks.orchestration.experiment import experiment_environment
+
     outpath = f'{args.outdir}/{e.name}-{run}.json'
     if os.path.exists(outpath) and not args.force:
         print(f'skip {e.name} run {run}')
@@ -283,16 +434,102 @@ def add_exp(
     env.pcap_file = ''
     if args.pcap:
         env.pcap_file = workdir + '/pcap'
+        if args.pcap_dir is not None:
+            env.pcap_file = os.path.abspath(f'{args.pcap_dir}/{e.name}-{run}')
+    env.pcap_sims = args.pcap_sim
+    env.pcap_rotate_bytes = args.pcap_rotate_size
+    env.pcap_rotate_interval = args.pcap_rotate_time
+    env.pcap_keep = args.pcap_keep
     if args.shmdir is not None:
         env.shm_base = os.path.abspath(shmdir)
+    elif rt.shm_manager is not None:
+        rt.shm_manager.place(e, env, f'{e.name}/{run}')
 
     run = runtime.Run(e, run, env, outpath, prereq)
     rt.add_run(run)
     return run
 
 
+def load_module(path: str) -> tp.List[tp.Union[exps.Experiment, sweep.Sweep]]:
+    """Execute an experiment module and return its experiments."""
+    modname, _ = os.path.splitext(os.path.basename(path))
+
+    class ExperimentModuleLoadError(Exception):
+        pass
+
+    spec = importlib.util.spec_from_file_location(modname, path)
+    if spec is None:
+        raise ExperimentModuleLoadError('spec is None')
+    mod = importlib.util.module_from_spec(spec)
+    if spec.loader is None:
+        raise ExperimentModuleLoadError('spec.loader is None')
+    spec.loader.exec_module(mod)
+    return mod.experiments
+
+
+def load_experiments(
+    args: argparse.Namespace, index: tp.Optional[ExperimentIndex]
+) -> tp.List[tp.Union[exps.Experiment, sweep.Sweep]]:
+    """
+    Load the experiments from all modules that define experiments matching
+    `--filter`.
+
+    Modules whose cached names don't match are skipped without executing
+    them.
+    """
+    experiments = []
+    for path in args.experiments:
+        if index is not None and args.filter:
+            names = index.names(path)
+            if names is not None and not any(
+                sweep.matches(n, args.filter) for n in names
+            ):
+                continue
+        entries = load_module(path)
+        if index is not None:
+            index.update(path, sweep.experiment_names(entries))
+        experiments += entries
+    return experiments
+
+
+def list_experiments(
+    args: argparse.Namespace, index: tp.Optional[ExperimentIndex]
+) -> None:
+    for path in args.experiments:
+        names = index.names(path) if index is not None else None
+        if names is None:
+            names = list(sweep.experiment_names(load_module(path)))
+            if index is not None:
+                index.update(path, names)
+        for name in names:
+            if sweep.matches(name, args.filter):
+                print(name)
+
+
 def main():
     args = parse_args()
+    index = None
+    if not args.pickled and not args.no_index_cache:
+        index = ExperimentIndex(f'{args.workdir}/.exp_index.json')
+    if args.list and not args.pickled:
+        list_experiments(args, index)
+        if index is not None:
+            index.save()
+        sys.exit(0)
+
+    import asyncio
+    import pickle
+    import signal
+
+    from simbricks.orchestration import exectools
+    from simbricks.orchestration import experiments as exps
+    from simbricks.orchestration.consolidation import consolidate_nics
+    from simbricks.orchestration.phases import apply_phases
+    from simbricks.orchestration import runtime
+    from simbricks.orchestration import tuning
+    from simbricks.orchestration.disk_images import DiskImagePool
+    from simbricks.orchestration.shm import ShmManager
+
     if args.hosts is None:
         executors = [exectools.LocalExecutor()]
     else:
@@ -310,54 +547,79 @@ def main():
     elif args.runtime == 'slurm':
         rt = runtime.SlurmRuntime(args.slurmdir, args, verbose=args.verbose)
     elif args.runtime == 'dist':
-        rt = runtime.DistributedSimpleRuntime(executors, verbose=args.verbose)
+        rt = runtime.DistributedSimpleRuntime(
+            executors,
+            verbose=args.verbose,
+            pipeline=args.pipeline,
+            cleanup=args.cleanup
+        )
     else:
         warn_multi_exec(executors)
         rt = runtime.LocalSimpleRuntime(
-            verbose=args.verbose, executor=executors[0]
+            verbose=args.verbose,
+            executor=executors[0],
+            pipeline=args.pipeline,
+            cleanup=args.cleanup
         )
 
-    if args.profile_int:
-        rt.enable_profiler(args.profile_int)
+    profile_int = args.profile_int
+    if not profile_int and (args.progress or args.stall_intervals):
+        profile_int = 10
+    if profile_int:
+        rt.enable_profiler(profile_int, args.progress, args.stall_intervals)
+
+    if args.inactivity_timeout:
+        rt.enable_inactivity_timeout(args.inactivity_timeout)
+
+    if args.sample_resources:
+        rt.enable_resource_sampler(args.sample_resources)
+
+    if args.shm_auto:
+        rt.enable_shm_manager(ShmManager())
+
+    disk_pool = None
+    if args.disk_pool > 0:
+        disk_pool = DiskImagePool(
+            f'{args.workdir}/.diskpool', args.disk_pool, verbose=args.verbose
+        )
+        rt.enable_disk_pool(disk_pool)
 
     # load experiments
     if not args.pickled:
         # default: load python modules with experiments
-        experiments = []
-        for path in args.experiments:
-            modname, _ = os.path.splitext(os.path.basename(path))
-
-            class ExperimentModuleLoadError(Exception):
-                pass
-
-            spec = importlib.util.spec_from_file_location(modname, path)
-            if spec is None:
-                raise ExperimentModuleLoadError('spec is None')
-            mod = importlib.util.module_from_spec(spec)
-            if spec.loader is None:
-                raise ExperimentModuleLoadError('spec.loader is None')
-            spec.loader.exec_module(mod)
-            experiments += mod.experiments
-
-        if args.list:
-            for e in experiments:
-                print(e.name)
-            sys.exit(0)
-
-        for e in experiments:
+        experiments = load_experiments(args, index)
+        if index is not None:
+            index.save()
+
+        for e in sweep.select_experiments(experiments, args.filter):
+            for change in apply_phases(e):
+                if args.verbose:
+                    print(f'{e.name}: {change}')
+            if args.consolidate_nics:
+                multinics = consolidate_nics(e, args.consolidate_nics)
+                if args.verbose:
+                    for mn in multinics:
+                        print(
+                            f'{e.name}: {mn.full_name()} runs '
+                            f'{len(mn.subnics)} NICs'
+                        )
+            if args.tune_sync:
+                for msg in tuning.latency_mismatches(e):
+                    print(
+                        f'Warning: {e.name}: latency mismatch on {msg}',
+                        file=sys.stderr
+                    )
+                changed = tuning.tune_sync_periods(e)
+                if args.verbose:
+                    for (sim, period) in changed.items():
+                        print(
+                            f'{e.name}: sync period of {sim.full_name()} '
+                            f'set to {period} ns'
+                        )
             if args.auto_dist and not isinstance(e, exps.DistributedExperiment):
-                e = runtime.auto_dist(e, executors, args.proxy_type)
-            # apply filter if any specified
-            if (args.filter) and (len(args.filter) > 0):
-                match = False
-                for f in args.filter:
-                    match = fnmatch.fnmatch(e.name, f)
-                    if match:
-                        break
-
-                if not match:
-                    continue
-
+                e = runtime.auto_dist(
+                    e, executors, args.proxy_type, args.proxy_pairs
+                )
             # if this is an experiment with a checkpoint we might have to create
             # it
             no_simbricks = e.no_simbricks
@@ -382,7 +644,18 @@ def main():
     signal.signal(signal.SIGINT, lambda *_: rt.interrupt())
 
     # invoke runtime to run experiments
-    asyncio.run(rt.start())
+    if args.instrument:
+        from simbricks.orchestration import instrumentation
+        os.makedirs(args.outdir, exist_ok=True)
+        monitor = instrumentation.LoopMonitor(
+            args.instrument, f'{args.outdir}/orchestrator.jsonl'
+        )
+        asyncio.run(instrumentation.instrumented(rt.start(), monitor))
+    else:
+        asyncio.run(rt.start())
+
+    if disk_pool is not None:
+        disk_pool.cleanup()
 
 
 if __name__ == '__main__':
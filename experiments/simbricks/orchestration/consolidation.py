@@ -0,0 +1,140 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Consolidation of NIC simulators into multi-NIC processes.
+
+`I40eMultiNIC` runs several i40e NICs in one `i40e_bm` process, which then
+occupies a single core instead of one per NIC. This pass rewrites experiments
+built with individual `I40eNIC` instances to use multi-NIC processes."""
+
+import typing as tp
+
+from simbricks.orchestration.experiments import (
+    DistributedExperiment, Experiment
+)
+from simbricks.orchestration.simulators import (
+    I40eMultiNIC, I40eNIC, MultiSubNIC, NetSim, NICSim, Simulator
+)
+
+
+def _chunks(items: tp.List[NICSim], fan_in: int) -> tp.List[tp.List[NICSim]]:
+    """Split `items` into as few chunks of at most `fan_in` items as possible,
+    with sizes as even as possible."""
+    n = -(-len(items) // fan_in)
+    (size, extra) = divmod(len(items), n)
+    chunks = []
+    start = 0
+    for i in range(n):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def _candidates(
+    e: Experiment
+) -> tp.Dict[tp.Tuple[tp.Optional[int], NetSim, int], tp.List[NICSim]]:
+    """Consolidatable NICs grouped by executor, network and sync mode."""
+    proxied: tp.Set[NICSim] = set()
+    mapping: tp.Dict[Simulator, int] = {}
+    if isinstance(e, DistributedExperiment):
+        for p in e.proxies_listen + e.proxies_connect:
+            proxied.update(nic for (nic, _) in p.nics)
+        mapping = e.host_mapping
+
+    groups: tp.Dict[tp.Tuple[tp.Optional[int], NetSim, int],
+                    tp.List[NICSim]] = {}
+    for dev in e.pcidevs:
+        # subclasses may run different binaries or arguments
+        if type(dev) is not I40eNIC or dev.network is None or dev in proxied:
+            continue
+        if mapping.get(dev) != mapping.get(dev.network):
+            continue
+        key = (mapping.get(dev), dev.network, dev.sync_mode)
+        groups.setdefault(key, []).append(dev)
+    return groups
+
+
+def consolidate_nics(e: Experiment, fan_in: int = 8) -> tp.List[I40eMultiNIC]:
+    """
+    Replace `I40eNIC` instances with sub NICs of `I40eMultiNIC` processes.
+
+    NICs connected to the same network, with the same sync mode and on the
+    same executor are combined into processes of at most `fan_in` NICs. All
+    other configuration of the NICs is kept. References to the NICs from
+    hosts, networks, dependencies and convergence metrics are updated, so
+    this is transparent to the rest of the experiment. NICs whose network
+    channel crosses hosts through a proxy are left alone.
+
+    Returns:
+        The multi-NIC processes added to the experiment.
+    """
+    if fan_in < 2:
+        return []
+
+    subnics: tp.Dict[Simulator, MultiSubNIC] = {}
+    first: tp.Dict[Simulator, I40eMultiNIC] = {}
+    multinics: tp.List[tp.Tuple[I40eMultiNIC, tp.List[NICSim],
+                                tp.Optional[int]]] = []
+    names = {dev.name for dev in e.pcidevs}
+    for ((host, net, _), nics) in _candidates(e).items():
+        for chunk in _chunks(nics, fan_in):
+            if len(chunk) < 2:
+                continue
+            mn = I40eMultiNIC()
+            mn.name = f'{net.name or "net"}.{len(multinics)}'
+            while mn.name in names:
+                mn.name += '_'
+            names.add(mn.name)
+            for nic in chunk:
+                sn = mn.create_subnic()
+                # keep the configuration, including the name for socket paths
+                sn.__dict__.update(nic.__dict__)
+                sn.multinic = mn
+                subnics[nic] = sn
+            # the process takes the place of the first NIC of its chunk
+            first[chunk[0]] = mn
+            multinics.append((mn, chunk, host))
+
+    def sub(sim):
+        return subnics.get(sim, sim)
+
+    e.pcidevs = [
+        first[dev] if dev in first else dev
+        for dev in e.pcidevs
+        if dev in first or dev not in subnics
+    ]
+    for h in e.hosts:
+        h.pcidevs = [sub(dev) for dev in h.pcidevs]
+    for net in e.networks:
+        net.nics = [sub(nic) for nic in net.nics]
+    for sim in e.all_simulators():
+        sim.extra_deps = [sub(d) for d in sim.extra_deps]
+    for metric in e.convergence:
+        metric.sims = [sub(s) for s in metric.sims]
+    if isinstance(e, DistributedExperiment):
+        for (mn, chunk, host) in multinics:
+            for nic in chunk:
+                e.host_mapping.pop(nic, None)
+            if host is not None:
+                e.assign_sim_host(mn, host)
+
+    return [mn for (mn, _, _) in multinics]
@@ -0,0 +1,186 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Early stopping of runs once a metric has converged."""
+
+import math
+import re
+import typing as tp
+
+from simbricks.orchestration.simulators import Simulator
+
+# two-sided 95% quantiles of Student's t-distribution by degrees of freedom
+_T95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042
+]
+
+
+def _t95(df: int) -> float:
+    if df <= len(_T95):
+        return _T95[df - 1]
+    return 1.96
+
+
+IPERF_THROUGHPUT = (
+    r'\[ *\d+\] +(?P<key>[0-9.]+) *- *[0-9.]+ +sec.*Bytes +(?P<value>[0-9.]+) '
+    r'(?P<unit>[KMG])bits/sec'
+)
+"""Pattern for the throughput of iperf interval reports."""
+
+_UNITS = {'K': 1e-6, 'M': 1e-3, 'G': 1.0}
+
+
+class Metric(object):
+    """
+    A metric parsed from the output of simulators while they run.
+
+    Lines of the simulators' stdout matching `pattern` provide a sample in the
+    named group `value`. If `pattern` also has a named group `key`, e.g. the
+    interval of an iperf report, values with the same key are summed across
+    all simulators and across consecutive lines of one simulator, e.g. the
+    streams of `iperf -P`. A sum becomes a sample once every simulator has
+    moved on to a later key. A key that a simulator reports again after a
+    later one, like the start of iperf's final report over the whole run, is
+    ignored. A named group `unit` is converted with K, M and G prefixes
+    relative to G.
+
+    The metric has converged once the 95% confidence interval of the mean of
+    the samples is narrower than `rel_width` times the mean.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        sims: tp.List[Simulator],
+        pattern: str = IPERF_THROUGHPUT,
+        rel_width: float = 0.05,
+        skip: int = 1,
+        min_samples: int = 5,
+        window: tp.Optional[int] = None
+    ) -> None:
+        self.name = name
+        self.sims = sims
+        self.pattern = re.compile(pattern)
+        self.rel_width = rel_width
+        """Maximum width of the confidence interval relative to the mean."""
+        self.skip = skip
+        """Number of initial samples to ignore, e.g. during slow start."""
+        self.min_samples = min_samples
+        self.window = window
+        """Only consider the last `window` samples."""
+        self.samples: tp.List[float] = []
+        self._pending: tp.Dict[str, tp.Dict[Simulator, float]] = {}
+        """Sums per key and simulator of keys not complete yet."""
+        self._complete: tp.Dict[str, tp.Set[Simulator]] = {}
+        """Simulators that moved on from each pending key."""
+        self._current: tp.Dict[Simulator, str] = {}
+        self._seen: tp.Dict[Simulator, tp.Set[str]] = {}
+        self._skipped = 0
+
+    def _add_sample(self, value: float) -> None:
+        if self._skipped < self.skip:
+            self._skipped += 1
+            return
+        self.samples.append(value)
+
+    def feed(self, sim: Simulator, lines: tp.List[str]) -> None:
+        """Parse new output lines of `sim`."""
+        for line in lines:
+            m = self.pattern.search(line)
+            if not m:
+                continue
+            groups = m.groupdict()
+            value = float(groups['value'])
+            if groups.get('unit'):
+                value *= _UNITS.get(groups['unit'], 1.0)
+            if groups.get('key') is None:
+                self._add_sample(value)
+                continue
+            key = groups['key']
+            current = self._current.get(sim)
+            if key != current:
+                seen = self._seen.setdefault(sim, set())
+                if key in seen:
+                    continue
+                if current is not None:
+                    self._key_done(sim, current)
+                self._current[sim] = key
+                seen.add(key)
+            values = self._pending.setdefault(key, {})
+            values[sim] = values.get(sim, 0.0) + value
+
+    def _key_done(self, sim: Simulator, key: str) -> None:
+        done = self._complete.setdefault(key, set())
+        done.add(sim)
+        if len(done) == len(self.sims):
+            self._add_sample(sum(self._pending.pop(key).values()))
+            del self._complete[key]
+
+    def interval(self) -> tp.Optional[tp.Tuple[float, float]]:
+        """Mean and half width of the 95% confidence interval."""
+        xs = self.samples
+        if self.window is not None:
+            xs = xs[-self.window:]
+        n = len(xs)
+        if n < max(self.min_samples, 2):
+            return None
+        mean = sum(xs) / n
+        var = sum((x - mean)**2 for x in xs) / (n - 1)
+        return (mean, _t95(n - 1) * math.sqrt(var / n))
+
+    def converged(self) -> bool:
+        ci = self.interval()
+        if ci is None:
+            return False
+        (mean, half) = ci
+        return mean != 0 and 2 * half <= self.rel_width * abs(mean)
+
+    def summary(self) -> tp.Dict[str, tp.Any]:
+        ci = self.interval()
+        return {
+            'samples': len(self.samples),
+            'mean': ci[0] if ci else None,
+            'ci95': ci[1] if ci else None,
+        }
+
+
+class ConvergenceWatcher(object):
+    """Feeds simulator output to the metrics of an experiment."""
+
+    def __init__(self, metrics: tp.List[Metric]) -> None:
+        self.metrics = metrics
+        self._offsets: tp.Dict[tp.Tuple[Metric, Simulator], int] = {}
+
+    def update(self, outputs: tp.Dict[Simulator, tp.List[str]]) -> None:
+        for metric in self.metrics:
+            for sim in metric.sims:
+                lines = outputs.get(sim)
+                if lines is None:
+                    continue
+                off = self._offsets.get((metric, sim), 0)
+                metric.feed(sim, lines[off:])
+                self._offsets[(metric, sim)] = len(lines)
+
+    def converged(self) -> bool:
+        """Whether all metrics have converged."""
+        return bool(self.metrics) and all(m.converged() for m in self.metrics)
@@ -0,0 +1,322 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Generators for datacenter topologies.
+
+Topologies are described by tiers of switch names, starting with the edge
+tier hosts attach to, and links between switches of adjacent tiers. A
+`DCNetwork` instantiates a topology with each tier either simulated by
+`SwitchNet` instances or by ns-3.
+
+Both the SimBricks switch and the ns-3 switch are learning bridges without a
+spanning tree protocol, so topologies with redundant paths forward broadcasts
+in loops. By default only the links of a spanning tree are instantiated."""
+
+import collections
+import ipaddress
+import typing as tp
+
+import simbricks.orchestration.e2e_components as e2e
+from simbricks.orchestration.e2e_helpers import E2ELinkAssigner, E2ELinkType
+from simbricks.orchestration.experiments import Experiment
+from simbricks.orchestration.simulators import NS3E2ENet, SwitchNet
+
+
+class DCTopology(object):
+    """Tiers of switches and the links between them."""
+
+    def __init__(
+        self,
+        tiers: tp.List[tp.List[str]],
+        links: tp.List[tp.Tuple[str, str]],
+        hosts_per_edge: int
+    ) -> None:
+        self.tiers = tiers
+        """Switch names per tier, starting with the edge tier."""
+        self.links = links
+        """Links as tuples `(lower, upper)` of switch names."""
+        self.hosts_per_edge = hosts_per_edge
+
+    def num_hosts(self) -> int:
+        return len(self.tiers[0]) * self.hosts_per_edge
+
+    def tier_of(self) -> tp.Dict[str, int]:
+        return {s: t for (t, tier) in enumerate(self.tiers) for s in tier}
+
+    def spanning_tree(self) -> 'DCTopology':
+        """
+        Loop-free version of this topology.
+
+        Keeps the links of a breadth-first spanning tree rooted at the first
+        switch of the top tier, which is the tree the spanning tree protocol
+        picks with default priorities. Switches above the edge tier that end
+        up as leaves of the tree forward no traffic and are removed.
+        """
+        adj: tp.Dict[str, tp.List[str]] = collections.defaultdict(list)
+        for (lower, upper) in self.links:
+            adj[lower].append(upper)
+            adj[upper].append(lower)
+        root = self.tiers[-1][0]
+        seen = {root}
+        queue = collections.deque([root])
+        tree = set()
+        while queue:
+            s = queue.popleft()
+            for n in adj[s]:
+                if n not in seen:
+                    seen.add(n)
+                    queue.append(n)
+                    tree.add((s, n))
+                    tree.add((n, s))
+        links = [l for l in self.links if l in tree]
+
+        # prune switches without hosts that only have a single link
+        edges = set(self.tiers[0])
+        tree_adj: tp.Dict[str, tp.Set[str]] = collections.defaultdict(set)
+        for (lower, upper) in links:
+            tree_adj[lower].add(upper)
+            tree_adj[upper].add(lower)
+        removed = set()
+        leaves = [
+            s for s in tree_adj if s not in edges and len(tree_adj[s]) < 2
+        ]
+        while leaves:
+            s = leaves.pop()
+            if s in removed:
+                continue
+            removed.add(s)
+            for n in tree_adj.pop(s):
+                tree_adj[n].discard(s)
+                if n not in edges and len(tree_adj[n]) < 2:
+                    leaves.append(n)
+        links = [(l, u) for (l, u) in links if l in tree_adj and u in tree_adj]
+
+        tiers = [[s for s in tier if s not in removed] for tier in self.tiers]
+        return DCTopology(
+            [tier for tier in tiers if tier], links, self.hosts_per_edge
+        )
+
+
+def fat_tree(
+    k: int,
+    hosts_per_edge: tp.Optional[int] = None,
+    name_prefix: str = ''
+) -> DCTopology:
+    """
+    A `k`-ary fat-tree: `k` pods of `k/2` edge and `k/2` aggregation switches,
+    and `(k/2)^2` core switches.
+
+    Args:
+        hosts_per_edge: Defaults to `k/2`, as in the full fat-tree.
+    """
+    if k < 2 or k % 2 != 0:
+        raise ValueError('k has to be even and at least 2')
+    half = k // 2
+    if hosts_per_edge is None:
+        hosts_per_edge = half
+    edge = [f'{name_prefix}edge{p}_{i}' for p in range(k) for i in range(half)]
+    agg = [f'{name_prefix}agg{p}_{j}' for p in range(k) for j in range(half)]
+    core = [f'{name_prefix}core{c}' for c in range(half * half)]
+    links = []
+    for p in range(k):
+        for i in range(half):
+            for j in range(half):
+                links.append((edge[p * half + i], agg[p * half + j]))
+        for j in range(half):
+            for m in range(half):
+                links.append((agg[p * half + j], core[j * half + m]))
+    return DCTopology([edge, agg, core], links, hosts_per_edge)
+
+
+def leaf_spine(
+    num_leaves: int,
+    num_spines: int,
+    hosts_per_leaf: int,
+    name_prefix: str = ''
+) -> DCTopology:
+    """Leaf switches each connected to every spine switch."""
+    if num_leaves < 1 or num_spines < 1:
+        raise ValueError('need at least one leaf and one spine')
+    leaves = [f'{name_prefix}leaf{i}' for i in range(num_leaves)]
+    spines = [f'{name_prefix}spine{i}' for i in range(num_spines)]
+    links = [(l, s) for l in leaves for s in spines]
+    return DCTopology([leaves, spines], links, hosts_per_leaf)
+
+
+def host_addresses(
+    num: int,
+    subnet: str = '10.0.0.0/8',
+    first_host: int = 1,
+    mac_base: int = 0x020000000000
+) -> tp.List[tp.Tuple[str, int, str]]:
+    """
+    Consecutive addresses for `num` hosts.
+
+    Returns:
+        Tuples `(ip, prefix, mac)`. MACs are locally administered unicast
+        addresses counting up from `mac_base`, with the same offset as the IP
+        address within the subnet.
+    """
+    net = ipaddress.IPv4Network(subnet)
+    if first_host + num > net.num_addresses - 1:
+        raise ValueError(f'subnet {subnet} too small for {num} hosts')
+    base = int(net.network_address)
+    addrs = []
+    for i in range(first_host, first_host + num):
+        ip = str(ipaddress.IPv4Address(base + i))
+        mac = (mac_base + i).to_bytes(6, 'big').hex(':')
+        addrs.append((ip, net.prefixlen, mac))
+    return addrs
+
+
+class DCNetwork(object):
+    """
+    Switches of a `DCTopology` as SimBricks and ns-3 simulators.
+
+    Tiers in `ns3_tiers` are simulated by ns-3, all others by one `SwitchNet`
+    per switch. Attach hosts to the switches returned by `edge_slots()`, then
+    call `add_to_experiment()`.
+    """
+
+    def __init__(
+        self,
+        topo: DCTopology,
+        ns3_tiers: tp.Iterable[int] = (),
+        ns3_instances: int = 1,
+        multipath: bool = False,
+        eth_latency: int = 500,
+        data_rate: str = '10Gbps',
+        sync: bool = True,
+        subnet: str = '10.0.0.0/8'
+    ) -> None:
+        """
+        Args:
+            ns3_instances: Number of ns-3 instances to split the ns-3 tiers
+                into.
+            multipath: Instantiate all links, even if they form loops.
+            eth_latency: Latency of all links in nanoseconds.
+            data_rate: Data rate of links simulated by ns-3.
+            sync: Whether switches synchronize with their peers.
+        """
+        self.topo = topo if multipath else topo.spanning_tree()
+        self.ns3_tiers = set(ns3_tiers)
+        self.ns3_instances = ns3_instances
+        self.eth_latency = eth_latency
+        self.data_rate = data_rate
+        self.sync = sync
+        self.switches: tp.Dict[str, tp.Union[SwitchNet,
+                                             e2e.E2ESwitchNode]] = {}
+        self.switchnets: tp.List[SwitchNet] = []
+        self.ns3_nets: tp.List[NS3E2ENet] = []
+        self.assigner = E2ELinkAssigner()
+        self.addresses = host_addresses(self.topo.num_hosts(), subnet)
+        """Address tuples `(ip, prefix, mac)` for all host slots."""
+
+        for (t, tier) in enumerate(self.topo.tiers):
+            for name in tier:
+                if t in self.ns3_tiers:
+                    self.switches[name] = e2e.E2ESwitchNode(name)
+                else:
+                    net = SwitchNet()
+                    net.name = name
+                    net.sync = sync
+                    net.eth_latency = eth_latency
+                    self.switches[name] = net
+                    self.switchnets.append(net)
+
+        for (lower, upper) in self.topo.links:
+            self._connect(lower, upper)
+
+    def _connect(self, lower: str, upper: str) -> None:
+        (sl, su) = (self.switches[lower], self.switches[upper])
+        delay = f'{self.eth_latency}ns'
+        if isinstance(sl, SwitchNet) and isinstance(su, SwitchNet):
+            su.connect_network(sl)
+        elif isinstance(sl, SwitchNet) or isinstance(su, SwitchNet):
+            # ns-3 connects to the listening SimBricks switch
+            (node, net) = (su, sl) if isinstance(sl, SwitchNet) else (sl, su)
+            adapter = e2e.E2ENetworkSimbricks(f'_{lower}_{upper}_adapter')
+            adapter.listen = False
+            adapter.eth_latency = delay
+            adapter.sync_delay = delay
+            adapter.simbricks_component = net
+            if not self.sync:
+                adapter.sync = e2e.SimbricksSyncMode.SYNC_DISABLED
+            node.add_component(adapter)
+        else:
+            self.assigner.add_link(
+                f'{lower}_{upper}',
+                sl,
+                su,
+                create_link=False,
+                data_rate=self.data_rate,
+                delay=delay
+            )
+
+    def edge_slots(
+        self
+    ) -> tp.List[tp.Tuple[tp.Union[SwitchNet, e2e.E2ESwitchNode],
+                          tp.List[tp.Tuple[str, int, str]]]]:
+        """Each edge switch with the addresses of the hosts to attach to
+        it."""
+        n = self.topo.hosts_per_edge
+        return [(self.switches[s], self.addresses[i * n:(i + 1) * n])
+                for (i, s) in enumerate(self.topo.tiers[0])]
+
+    def add_to_experiment(self, e: Experiment) -> None:
+        """Create the ns-3 instances and add all switches to `e`."""
+        for net in self.switchnets:
+            e.add_network(net)
+        nodes = [
+            s for s in self.switches.values()
+            if isinstance(s, e2e.E2ESwitchNode)
+        ]
+        if not nodes:
+            return
+
+        if self.ns3_instances > 1:
+            self.assigner.split(self.ns3_instances)
+            self.ns3_nets = self.assigner.assign_networks()
+            # switches without links to other ns-3 switches
+            for s in nodes:
+                if s not in self.assigner.switch_links:
+                    net = NS3E2ENet()
+                    net.name = f'_network_{len(self.ns3_nets)}'
+                    net.add_component(s)
+                    self.ns3_nets.append(net)
+        else:
+            for link in self.assigner.links.values():
+                link['type'] = E2ELinkType.NS3_SIMPLE_CHANNEL
+            self.assigner.create_missing_links()
+            net = NS3E2ENet()
+            net.name = '_network_0'
+            for s in nodes:
+                net.add_component(s)
+            for link in self.assigner.links.values():
+                net.add_component(link['ns3link'])
+            self.ns3_nets = [net]
+
+        for net in self.ns3_nets:
+            net.name = f'ns3{net.name}'
+            net.sync_period = self.eth_latency
+            net.eth_latency = self.eth_latency
+            net.init_network()
+            e.add_network(net)
@@ -0,0 +1,155 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Preparation of the per-run disk images of host simulators."""
+
+import asyncio
+import errno
+import hashlib
+import os
+import pathlib
+import shlex
+import shutil
+import typing as tp
+
+from simbricks.orchestration.exectools import Executor, LocalExecutor
+from simbricks.orchestration.experiment.experiment_environment import ExpEnv
+
+
+def disk_image_cmd(env: ExpEnv, base: str, path: str) -> str:
+    """
+    Command to create the disk image `path` from the image `base`.
+
+    Base images and checkpoint disks are qcow2 images, `path` becomes a qcow2
+    copy-on-write overlay on top of `base`.
+    """
+    return (
+        f'{env.qemu_img_path} create -f qcow2 -F qcow2 '
+        f'-b {shlex.quote(base)} {shlex.quote(path)}'
+    )
+
+
+class DiskImagePool(object):
+    """
+    Keeps a pool of ready disk images per base image.
+
+    Images are created ahead of time, for the first runs by `prefill()` and
+    afterwards in the background, and handed out by renaming them to their
+    destination, which is atomic. If the pool is empty, the destination is not
+    on the same file system, or the simulator runs on a remote executor,
+    images are created on demand instead.
+    """
+
+    def __init__(self, pooldir: str, size: int = 2, verbose=False) -> None:
+        self.pooldir = os.path.abspath(pooldir)
+        self.size = size
+        """Number of ready images to keep per base image."""
+        self.verbose = verbose
+        self._ready: tp.Dict[str, tp.List[str]] = {}
+        self._fillers: tp.Dict[str, asyncio.Task] = {}
+        self._disabled: tp.Set[str] = set()
+        """Base images whose pooled images cannot be renamed to their
+        destination."""
+        self._next_id = 0
+        self._executor = LocalExecutor()
+
+    def _key(self, base: str) -> str:
+        # include the modification time to never hand out images based on a
+        # stale version of a rebuilt base image
+        mtime = os.stat(base).st_mtime_ns
+        return hashlib.sha1(f'{base}:{mtime}'.encode()).hexdigest()[:16]
+
+    async def _fill(self, env: ExpEnv, base: str, key: str) -> None:
+        ready = self._ready.setdefault(key, [])
+        keydir = f'{self.pooldir}/{key}'
+        pathlib.Path(keydir).mkdir(parents=True, exist_ok=True)
+        while len(ready) < self.size:
+            path = f'{keydir}/{self._next_id}'
+            self._next_id += 1
+            await self._executor.run_cmdlist(
+                'diskpool', [disk_image_cmd(env, base, path)],
+                verbose=self.verbose
+            )
+            if not os.path.exists(path):
+                # creating the image failed, acquire() creates images on
+                # demand and reports the error
+                break
+            ready.append(path)
+
+    def _refill(self, env: ExpEnv, base: str, key: str) -> None:
+        filler = self._fillers.get(key)
+        if filler is None or filler.done():
+            self._fillers[key] = asyncio.create_task(
+                self._fill(env, base, key)
+            )
+
+    async def prefill(self, env: ExpEnv, bases: tp.Iterable[str]) -> None:
+        """
+        Fill the pool for all of `bases` before the first run starts.
+
+        Base images that do not exist yet, such as checkpoint disks created by
+        an earlier run, are only pooled after their first use.
+        """
+        fills = []
+        for base in set(bases):
+            if os.path.exists(base):
+                key = self._key(base)
+                self._refill(env, base, key)
+                fills.append(self._fillers[key])
+        await asyncio.gather(*fills)
+
+    async def acquire(
+        self, executor: Executor, env: ExpEnv, base: str, path: str
+    ) -> None:
+        """Create disk image `path` from `base`, from the pool if possible."""
+        if isinstance(executor, LocalExecutor) and os.path.exists(base):
+            key = self._key(base)
+            ready = self._ready.setdefault(key, [])
+            while ready and key not in self._disabled:
+                image = ready.pop()
+                try:
+                    os.rename(image, path)
+                except OSError as e:
+                    if e.errno == errno.EXDEV:
+                        # destination on a different file system, pooled
+                        # images for this base can never be used
+                        self._disabled.add(key)
+                    if os.path.exists(image):
+                        os.unlink(image)
+                else:
+                    if self.verbose:
+                        print(f'diskpool: using {image} for {path}')
+                    self._refill(env, base, key)
+                    return
+            if key not in self._disabled:
+                self._refill(env, base, key)
+
+        await executor.run_cmdlist(
+            'diskimage', [disk_image_cmd(env, base, path)], verbose=self.verbose
+        )
+
+    def cleanup(self) -> None:
+        """Cancel pending image creation and remove all pooled images."""
+        for filler in self._fillers.values():
+            filler.cancel()
+        self._fillers = {}
+        self._ready = {}
+        shutil.rmtree(self.pooldir, ignore_errors=True)
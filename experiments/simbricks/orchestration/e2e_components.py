@@ -23,6 +23,8 @@
 # Allow own class to be used as type for a method's argument
 from __future__ import annotations
 
+import io
+import json
 import typing as tp
 from abc import ABC, abstractmethod
 from enum import Enum
@@ -109,19 +111,43 @@ class E2EBase(ABC):
         self.mapping: tp.Dict[str, str] = {}
         self.components: tp.List[E2EComponent] = []
 
-    def ns3_config(self) -> str:
-        config_list = []
-        for key, value in self.mapping.items():
-            if value == '':
-                continue
-            config_list.append(f'{key}:{value}')
-        config = ';'.join(config_list)
-
-        child_configs = ' '.join([
-            child.ns3_config() for child in self.components
-        ])
+    def update_mapping(self) -> None:
+        """Update `mapping` from this component's attributes."""
+        pass
 
-        return f'--{self.category}="{config}" {child_configs}'
+    def ns3_config(self) -> str:
+        out = io.StringIO()
+        self.write_ns3_config(out)
+        return out.getvalue()
+
+    def write_ns3_config(self, out: tp.TextIO) -> None:
+        """Write the ns-3 arguments for this component and its children to
+        `out`, without building intermediate strings for subtrees."""
+        self.update_mapping()
+        config = ';'.join(
+            f'{key}:{value}' for key, value in self.mapping.items()
+            if value != ''
+        )
+        out.write(f'--{self.category}="{config}" ')
+        for i, child in enumerate(self.components):
+            if i > 0:
+                out.write(' ')
+            child.write_ns3_config(out)
+
+    def write_json_config(self, out: tp.TextIO) -> None:
+        """Write this component and its children to `out` as a JSON object
+        with the keys `category`, `attributes` and `components`."""
+        self.update_mapping()
+        attrs = {k: v for k, v in self.mapping.items() if v != ''}
+        out.write(
+            f'{{"category": {json.dumps(self.category)}, '
+            f'"attributes": {json.dumps(attrs)}, "components": ['
+        )
+        for i, child in enumerate(self.components):
+            if i > 0:
+                out.write(', ')
+            child.write_json_config(out)
+        out.write(']}')
 
     @abstractmethod
     def add_component(self, component: E2EComponent) -> None:
@@ -136,11 +162,11 @@ class E2EGlobalConfig(E2EBase):
         self.stop_time = ''
         self.mac_start = 0
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         self.mapping.update({
             'StopTime': self.stop_time, 'MACStart': str(self.mac_start)
         })
-        return super().ns3_config()
+        super().update_mapping()
 
     def add_component(self, component: E2EComponent) -> None:
         raise AttributeError("Can't add a component to the global config")
@@ -153,11 +179,11 @@ class E2ENs3Logging(E2EBase):
         self.category = 'Logging'
         self.logging: tp.Dict[str, tp.List[Ns3LoggingLevel]] = {}
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         for component, levels in self.logging.items():
             levels_str = '|'.join([level.value for level in levels])
             self.mapping.update([(component, levels_str)])
-        return super().ns3_config()
+        super().update_mapping()
 
     def add_component(self, component: E2EComponent) -> None:
         raise AttributeError("Can't add a component to the global config")
@@ -178,12 +204,12 @@ class E2EComponent(E2EBase):
         self.has_path = False
         self.type = ''
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         if self.id == '' or self.type == '':
             raise AttributeError('Id or Type cannot be empty')
         self.mapping.update({'Id': self.id, 'Type': self.type})
 
-        return super().ns3_config()
+        super().update_mapping()
 
     def add_component(self, component: E2EComponent) -> None:
         self.components.append(component)
@@ -217,11 +243,11 @@ class E2ESwitchNode(E2ETopologyNode):
         self.type = 'Switch'
         self.mtu = ''
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         self.mapping.update({
             'Mtu': self.mtu,
         })
-        return super().ns3_config()
+        super().update_mapping()
 
 
 class E2ETopologyChannel(E2EComponent):
@@ -244,7 +270,7 @@ class E2ESimpleChannel(E2ETopologyChannel):
         self.left_node: E2ETopologyNode
         self.right_node: E2ETopologyNode
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         if self.left_node is None or self.right_node is None:
             raise AttributeError(f'Not all nodes for channel {self.id} given')
         self.mapping.update({
@@ -256,7 +282,7 @@ class E2ESimpleChannel(E2ETopologyChannel):
             'LeftNode': self.left_node.id,
             'RightNode': self.right_node.id,
         })
-        return super().ns3_config()
+        super().update_mapping()
 
     def add_device_attr(self, key: str, value: str) -> None:
         if not key.startswith('Device-'):
@@ -302,7 +328,7 @@ class E2ENetworkSimbricks(E2ENetwork):
 
         self.simbricks_component = None
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         if self.listen is None:
             raise AttributeError(
                 f'Listen mode not specified for simbricks adapter {self.id}'
@@ -316,7 +342,7 @@ class E2ENetworkSimbricks(E2ENetwork):
             'ShmPath': self.shm_path,
             'Sync': '' if self.sync is None else f'{self.sync.value}',
         })
-        return super().ns3_config()
+        super().update_mapping()
 
 
 class E2EHost(E2EComponent):
@@ -340,7 +366,7 @@ class E2ESimbricksHost(E2EHost):
 
         self.simbricks_component = None
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         self.mapping.update({
             'UnixSocket': self.unix_socket,
             'SyncDelay': self.sync_delay,
@@ -348,7 +374,7 @@ class E2ESimbricksHost(E2EHost):
             'EthLatency': self.eth_latency,
             'Sync': '' if self.sync is None else f'{self.sync.value}',
         })
-        return super().ns3_config()
+        super().update_mapping()
 
 
 class E2ESimpleNs3Host(E2EHost):
@@ -364,7 +390,7 @@ class E2ESimpleNs3Host(E2EHost):
         self.congestion_control: CongestionControl = None
         self.ip = ''
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         if self.congestion_control is None:
             cc = ''
         else:
@@ -378,7 +404,7 @@ class E2ESimpleNs3Host(E2EHost):
             'CongestionControl': cc,
             'Ip': self.ip,
         })
-        return super().ns3_config()
+        super().update_mapping()
 
     def add_device_attr(self, key: str, value: str) -> None:
         if not key.startswith('Device-'):
@@ -404,12 +430,12 @@ class E2EApplication(E2EComponent):
         self.start_time = ''
         self.stop_time = ''
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         self.mapping.update({
             'StartTime': self.start_time,
             'StopTime': self.stop_time,
         })
-        return super().ns3_config()
+        super().update_mapping()
 
 
 class E2EPacketSinkApplication(E2EApplication):
@@ -420,12 +446,12 @@ class E2EPacketSinkApplication(E2EApplication):
         self.protocol = 'ns3::TcpSocketFactory'
         self.local_ip = ''
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         self.mapping.update({
             'Protocol': self.protocol,
             'Local': self.local_ip,
         })
-        return super().ns3_config()
+        super().update_mapping()
 
 
 class E2EBulkSendApplication(E2EApplication):
@@ -436,12 +462,12 @@ class E2EBulkSendApplication(E2EApplication):
         self.protocol = 'ns3::TcpSocketFactory'
         self.remote_ip = ''
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         self.mapping.update({
             'Protocol': self.protocol,
             'Remote': self.remote_ip,
         })
-        return super().ns3_config()
+        super().update_mapping()
 
 
 class E2ENs3RandomVariable(ABC):
@@ -542,7 +568,7 @@ class E2EOnOffApplication(E2EApplication):
         self.on_time: tp.Optional[E2ENs3RandomVariable] = None
         self.off_time: tp.Optional[E2ENs3RandomVariable] = None
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         if self.on_time:
             on = self.on_time.get_config()
         else:
@@ -560,7 +586,7 @@ class E2EOnOffApplication(E2EApplication):
             'OnTime': on,
             'OffTime': off,
         })
-        return super().ns3_config()
+        super().update_mapping()
 
 
 class E2EProbe(E2EComponent):
@@ -581,7 +607,7 @@ class E2EPeriodicSampleProbe(E2EProbe):
         self.start = ''
         self.interval = ''
 
-    def ns3_config(self) -> str:
+    def update_mapping(self) -> None:
         self.mapping.update({
             'File': self.file,
             'Header': self.header,
@@ -589,4 +615,4 @@ class E2EPeriodicSampleProbe(E2EProbe):
             'Start': self.start,
             'Interval': self.interval
         })
-        return super().ns3_config()
+        super().update_mapping()
@@ -23,10 +23,13 @@
 # Allow own class to be used as type for a method's argument
 from __future__ import annotations
 
+import collections
+import re
 import typing as tp
 from enum import Enum
 
 import simbricks.orchestration.e2e_components as e2e
+from simbricks.orchestration.partition import growth_order
 from simbricks.orchestration.simulators import NS3E2ENet
 
 
@@ -35,12 +38,88 @@ class E2ELinkType(Enum):
     NS3_SIMPLE_CHANNEL = 1
 
 
+DEFAULT_DATA_RATE = 1e9
+"""Data rate in bit/s assumed for links and hosts without one when estimating
+load."""
+DEFAULT_DELAY = 1000.0
+"""Delay in nanoseconds assumed for links without one."""
+PACKET_SIZE = 1500
+"""Packet size in bytes assumed for estimating message rates."""
+
+_QUANTITY_RE = re.compile(r'^\s*([0-9.]+(?:[eE][+-]?[0-9]+)?)\s*(\S*)\s*$')
+_RATE_UNITS = {
+    '': 1,
+    'bps': 1,
+    'b/s': 1,
+    'kbps': 1e3,
+    'Kbps': 1e3,
+    'kb/s': 1e3,
+    'Kb/s': 1e3,
+    'Mbps': 1e6,
+    'Mb/s': 1e6,
+    'Gbps': 1e9,
+    'Gb/s': 1e9,
+    'Bps': 8,
+    'KBps': 8e3,
+    'MBps': 8e6,
+    'GBps': 8e9,
+}
+_TIME_UNITS = {'': 1e9, 's': 1e9, 'ms': 1e6, 'us': 1e3, 'ns': 1, 'ps': 1e-3}
+
+
+def _parse_quantity(value: str, units: tp.Dict[str,
+                                               float]) -> tp.Optional[float]:
+    m = _QUANTITY_RE.match(value)
+    if not m or m.group(2) not in units:
+        return None
+    return float(m.group(1)) * units[m.group(2)]
+
+
+def parse_data_rate(rate: str) -> tp.Optional[float]:
+    """Parse an ns-3 data rate like `10Gbps` into bit/s, `None` if empty or
+    invalid."""
+    return _parse_quantity(rate, _RATE_UNITS)
+
+
+def parse_time(time: str) -> tp.Optional[float]:
+    """Parse an ns-3 time like `500ns` into nanoseconds, `None` if empty or
+    invalid."""
+    return _parse_quantity(time, _TIME_UNITS)
+
+
+def _count_apps(component: e2e.E2EComponent) -> int:
+    n = 1 if isinstance(component, e2e.E2EApplication) else 0
+    return n + sum(_count_apps(c) for c in component.components)
+
+
+def host_load(host: e2e.E2EHost) -> float:
+    """Estimated event load of an E2E host: its data rate in Gbit/s for the
+    host itself and for each application (flow) it runs."""
+    rate = parse_data_rate(getattr(host, 'data_rate', '')) or DEFAULT_DATA_RATE
+    return rate / 1e9 * (1 + _count_apps(host))
+
+
+class _Group():
+
+    def __init__(self, gid: int) -> None:
+        self.gid = gid
+        self.nodes: tp.List[e2e.E2ETopologyNode] = []
+        self.load = 0.0
+        self.edges: tp.Dict[int, float] = collections.defaultdict(float)
+        """Weight of links to other groups that can be cut by group ID."""
+        self.apart: tp.Set[int] = set()
+        """Groups connected by links fixed to SimBricks, which have to be
+        simulated by a different instance."""
+
+
 class E2ELinkAssigner():
 
     def __init__(self):
         self.links = {}
         self.connected_switches = set()
         self.switch_links = {}
+        self.parts: tp.Optional[tp.Dict[e2e.E2ETopologyNode, int]] = None
+        """ns-3 instance of each switch if chosen by `split()`."""
 
     def add_link(
         self,
@@ -48,7 +127,9 @@ class E2ELinkAssigner():
         left_switch: e2e.E2ETopologyNode,
         right_switch: e2e.E2ETopologyNode,
         link_type: tp.Optional[E2ELinkType] = None,
-        create_link: bool = True
+        create_link: bool = True,
+        data_rate: str = '',
+        delay: str = ''
     ):
         if create_link and link_type is None:
             raise RuntimeError('Cannot create a link without link type')
@@ -58,7 +139,9 @@ class E2ELinkAssigner():
             'left': left_switch,
             'right': right_switch,
             'type': link_type,
-            'created': create_link
+            'created': create_link,
+            'data_rate': data_rate,
+            'delay': delay
         }
         if create_link:
             self._create_link(idd, link)
@@ -74,7 +157,6 @@ class E2ELinkAssigner():
         else:
             self.switch_links[right_switch] = [link]
 
-    # TODO: set properties like latency
     def _create_link(self, idd: str, link):
         left_switch = link['left']
         right_switch = link['right']
@@ -88,10 +170,15 @@ class E2ELinkAssigner():
             right_adapter.listen = True
             right_switch.add_component(right_adapter)
             link['right_adapter'] = right_adapter
+            if link['delay']:
+                left_adapter.eth_latency = link['delay']
+                right_adapter.eth_latency = link['delay']
         elif link_type == E2ELinkType.NS3_SIMPLE_CHANNEL:
             ns3link = e2e.E2ESimpleChannel(f'_{idd}_link')
             ns3link.left_node = left_switch
             ns3link.right_node = right_switch
+            ns3link.data_rate = link['data_rate']
+            ns3link.delay = link['delay']
             link['ns3link'] = ns3link
 
     def set_link_type(self, idd: str, link_type: E2ELinkType):
@@ -111,7 +198,227 @@ class E2ELinkAssigner():
             self._create_link(idd, link)
             link['created'] = True
 
+    def _nodes(self) -> tp.List[e2e.E2ETopologyNode]:
+        """All switches in the order they were first linked."""
+        nodes = {}
+        for link in self.links.values():
+            nodes[link['left']] = None
+            nodes[link['right']] = None
+        return list(nodes)
+
+    def node_load(self, node: e2e.E2ETopologyNode) -> float:
+        """Estimated event load of simulating `node`: a constant for the
+        switch itself, the load of attached hosts, and half the data rate in
+        Gbit/s of each link, whose other half is attributed to the other
+        end."""
+        load = 1.0
+        for c in node.components:
+            if isinstance(c, e2e.E2EHost):
+                load += host_load(c)
+        for link in self.switch_links.get(node, []):
+            load += self.link_rate(link) / 2
+        return load
+
+    @staticmethod
+    def link_rate(link) -> float:
+        """Data rate of a link in Gbit/s."""
+        return (parse_data_rate(link['data_rate']) or DEFAULT_DATA_RATE) / 1e9
+
+    @classmethod
+    def link_weight(cls, link) -> float:
+        """
+        Cost of turning a link into a SimBricks link, the estimated number of
+        messages per microsecond it carries in both directions.
+
+        At full load, each packet becomes a message. In addition, both
+        adapters send a sync message at least once per link delay.
+        """
+        packets = cls.link_rate(link) * 1e3 / (8 * PACKET_SIZE)
+        delay = parse_time(link['delay']) or DEFAULT_DELAY
+        return 2 * packets + 2 * 1e3 / delay
+
+    def split(
+        self,
+        num_networks: int,
+        min_latency: tp.Optional[str] = None,
+        imbalance: float = 0.1,
+        passes: int = 8
+    ) -> tp.Dict[e2e.E2ETopologyNode, int]:
+        """
+        Choose the type of all links without one to split the topology into
+        `num_networks` ns-3 instances.
+
+        Switches are assigned such that the estimated event load of the
+        instances is balanced and the data rate of links between instances,
+        which become SimBricks links, is minimized. Links that already have a
+        type keep it. All links not created yet are created, so
+        `assign_networks()` can be called right away to create one network
+        per instance.
+
+        Args:
+            min_latency: Only links with at least this delay, e.g. `1us`, are
+                turned into SimBricks links. The delay bounds the sync period
+                of the adapters, so small ones slow down simulation.
+            imbalance: How much the load of an instance may exceed the
+                average, at least by half the load of the largest set of
+                switches that has to be simulated together.
+            passes: Maximum number of refinement passes.
+
+        Returns:
+            Mapping from switch to ns-3 instance.
+        """
+        if num_networks < 1:
+            raise ValueError('need at least one network')
+        min_lat = None
+        if min_latency is not None:
+            min_lat = parse_time(min_latency)
+            if min_lat is None:
+                raise ValueError(f'invalid latency {min_latency}')
+
+        nodes = self._nodes()
+        parent = {n: n for n in nodes}
+
+        def find(n):
+            while parent[n] is not n:
+                parent[n] = parent[parent[n]]
+                n = parent[n]
+            return n
+
+        def cuttable(link) -> bool:
+            if link['type'] is not None:
+                return link['type'] == E2ELinkType.SIMBRICKS
+            if min_lat is None:
+                return True
+            lat = parse_time(link['delay'])
+            return lat is not None and lat >= min_lat
+
+        # contract switches connected by links that cannot be cut
+        for link in self.links.values():
+            if not cuttable(link):
+                parent[find(link['left'])] = find(link['right'])
+
+        groups: tp.List[_Group] = []
+        of_node: tp.Dict[e2e.E2ETopologyNode, _Group] = {}
+        by_root: tp.Dict[e2e.E2ETopologyNode, _Group] = {}
+        for n in nodes:
+            r = find(n)
+            if r not in by_root:
+                by_root[r] = _Group(len(groups))
+                groups.append(by_root[r])
+            g = by_root[r]
+            g.nodes.append(n)
+            g.load += self.node_load(n)
+            of_node[n] = g
+
+        for (idd, link) in self.links.items():
+            (ga, gb) = (of_node[link['left']], of_node[link['right']])
+            if link['type'] == E2ELinkType.SIMBRICKS:
+                if ga is gb:
+                    raise RuntimeError(
+                        f'SimBricks link {idd} connects switches that have to '
+                        'be simulated by the same ns-3 instance'
+                    )
+                ga.apart.add(gb.gid)
+                gb.apart.add(ga.gid)
+            elif link['type'] is None and ga is not gb:
+                w = self.link_weight(link)
+                ga.edges[gb.gid] += w
+                gb.edges[ga.gid] += w
+
+        total = sum(g.load for g in groups)
+        avg = total / num_networks
+        max_group = max((g.load for g in groups), default=0)
+        target = max(avg + max(avg * imbalance, max_group / 2), max_group)
+        loads = [0.0] * num_networks
+        part: tp.Dict[int, int] = {}
+
+        def allowed(g: _Group, p: int) -> bool:
+            return all(part.get(gid) != p for gid in g.apart)
+
+        def conn(g: _Group, p: int) -> float:
+            return sum(w for (gid, w) in g.edges.items() if part.get(gid) == p)
+
+        # greedy graph growing: place each group with the groups it is most
+        # connected to, otherwise keep filling the fullest instance with room
+        order = growth_order([g.edges for g in groups],
+                             [g.load for g in groups])
+        for g in (groups[i] for i in order):
+            cands = [
+                p for p in range(num_networks)
+                if allowed(g, p) and loads[p] + g.load <= target
+            ]
+            if not cands:
+                cands = [p for p in range(num_networks) if allowed(g, p)]
+                if not cands:
+                    raise RuntimeError(
+                        f'cannot split topology into {num_networks} networks '
+                        'with the given SimBricks links'
+                    )
+                cands = [min(cands, key=lambda p: loads[p])]
+            best = max(cands, key=lambda p: (conn(g, p), loads[p], -p))
+            part[g.gid] = best
+            loads[best] += g.load
+
+        # refinement: move groups to instances they have more links to
+        for _ in range(passes):
+            moved = False
+            for g in groups:
+                cur = part.pop(g.gid)
+                loads[cur] -= g.load
+                gains = [(conn(g, p) - conn(g, cur), p)
+                         for p in range(num_networks)
+                         if p != cur and allowed(g, p) and
+                         loads[p] + g.load <= target]
+                (gain, best) = max(gains, default=(0, cur))
+                if gain <= 0:
+                    best = cur
+                part[g.gid] = best
+                loads[best] += g.load
+                moved = moved or best != cur
+            if not moved:
+                break
+
+        # number instances in order of first use
+        ids: tp.Dict[int, int] = {}
+        self.parts = {}
+        for n in nodes:
+            p = part[of_node[n].gid]
+            self.parts[n] = ids.setdefault(p, len(ids))
+
+        for link in self.links.values():
+            if link['type'] is None:
+                if self.parts[link['left']] != self.parts[link['right']]:
+                    link['type'] = E2ELinkType.SIMBRICKS
+                else:
+                    link['type'] = E2ELinkType.NS3_SIMPLE_CHANNEL
+        self.create_missing_links()
+        return self.parts
+
+    def _assign_split_networks(self) -> tp.List[NS3E2ENet]:
+        assert self.parts is not None
+        networks = []
+        for i in range(max(self.parts.values(), default=-1) + 1):
+            net = NS3E2ENet()
+            net.name = f'_network_{i}'
+            networks.append(net)
+        for (switch, p) in self.parts.items():
+            networks[p].add_component(switch)
+            self.connected_switches.discard(switch)
+        for (idd, link) in self.links.items():
+            if not link['created']:
+                raise RuntimeError(f'Link {idd} has not been created')
+            left_net = networks[self.parts[link['left']]]
+            right_net = networks[self.parts[link['right']]]
+            if link['type'] == E2ELinkType.SIMBRICKS:
+                link['right_adapter'].simbricks_component = left_net
+                link['left_adapter'].simbricks_component = right_net
+            else:
+                left_net.add_component(link['ns3link'])
+        return networks
+
     def assign_networks(self) -> tp.List[NS3E2ENet]:
+        if self.parts is not None:
+            return self._assign_split_networks()
         networks = []
         # walk over all connected switches
         while len(self.connected_switches) > 0:
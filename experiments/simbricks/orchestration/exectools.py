@@ -22,15 +22,21 @@
 
 import abc
 import asyncio
+import itertools
 import os
 import pathlib
 import re
 import shlex
 import shutil
 import signal
+import threading
+import time
 import typing as tp
 from asyncio.subprocess import Process
 
+from simbricks.orchestration import instrumentation as instr
+from simbricks.orchestration.utils import procfs
+
 
 class Component(object):
 
@@ -40,6 +46,8 @@ class Component(object):
         self.stdout_buf = bytearray()
         self.stderr: tp.List[str] = []
         self.stderr_buf = bytearray()
+        self.bytes_read = 0
+        """Bytes of output read from stdout and stderr."""
         self.cmd_parts = cmd_parts
         #print(cmd_parts)
         self.with_stdin = with_stdin
@@ -65,16 +73,24 @@ class Component(object):
 
     async def _consume_out(self, data: bytes) -> None:
         eof = len(data) == 0
+        self.bytes_read += len(data)
+        t = instr.now()
         ls = self._parse_buf(self.stdout_buf, data)
+        t = instr.lap('parse_buf', t)
         if len(ls) > 0 or eof:
             await self.process_out(ls, eof=eof)
+            instr.lap('process_out', t)
             self.stdout.extend(ls)
 
     async def _consume_err(self, data: bytes) -> None:
         eof = len(data) == 0
+        self.bytes_read += len(data)
+        t = instr.now()
         ls = self._parse_buf(self.stderr_buf, data)
+        t = instr.lap('parse_buf', t)
         if len(ls) > 0 or eof:
             await self.process_err(ls, eof=eof)
+            instr.lap('process_err', t)
             self.stderr.extend(ls)
 
     async def _read_stream(self, stream: asyncio.StreamReader, fn):
@@ -115,6 +131,7 @@ class Component(object):
             stdin=stdin,
         )
         self._terminate_future = asyncio.create_task(self._waiter())
+        instr.track(self)
         await self.started()
 
     async def wait(self) -> None:
@@ -169,6 +186,10 @@ class Component(object):
             await self.kill()
         await self._proc.wait()
 
+    def pid(self) -> tp.Optional[int]:
+        """Pid of the started process."""
+        return self._proc.pid
+
     async def sigusr1(self) -> None:
         """Sends an interrupt signal."""
         if self._proc.returncode is None:
@@ -294,6 +315,13 @@ class SimpleRemoteComponent(SimpleComponent):
                 self._pid_fut.cancel()
         await super().process_out(lines, eof)
 
+    def pid(self) -> tp.Optional[int]:
+        """Pid of the command on the remote host, `None` if not known."""
+        if self._pid_fut is None or not self._pid_fut.done() or \
+                self._pid_fut.cancelled():
+            return None
+        return self._pid_fut.result()
+
     async def _kill_cmd(self, sig: str) -> None:
         """Send signal to command by running ssh kill -$sig $PID."""
         cmd_parts = self._ssh_cmd([
@@ -316,6 +344,10 @@ class Executor(abc.ABC):
 
     def __init__(self) -> None:
         self.ip = None
+        self.cores: tp.Optional[int] = None
+        """Cores available for simulators on this host, if limited."""
+        self.mem: tp.Optional[int] = None
+        """Memory in MB available for simulators on this host, if limited."""
 
     @abc.abstractmethod
     def create_component(
@@ -339,6 +371,14 @@ class Executor(abc.ABC):
     async def rmtree(self, path: str, verbose=False) -> None:
         pass
 
+    @abc.abstractmethod
+    async def proc_stats(
+        self, pids: tp.List[int]
+    ) -> tp.Dict[int, tp.Dict[str, int]]:
+        """Resource usage of the process trees rooted at `pids`, see
+        `procfs.tree_stats()`."""
+        pass
+
     # runs the list of commands as strings sequentially
     async def run_cmdlist(
         self, label: str, cmds: tp.List[str], verbose=True
@@ -360,8 +400,47 @@ class Executor(abc.ABC):
         await asyncio.gather(*xs)
 
 
+class CleanupStats(object):
+    """Directories deleted by local executors in worker threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._time = 0.0
+        self._count = 0
+        self._pending: tp.Set[asyncio.Future] = set()
+
+    def add(self, duration: float) -> None:
+        """Record a deletion that took `duration` seconds."""
+        with self._lock:
+            self._time += duration
+            self._count += 1
+
+    def totals(self) -> tp.Tuple[int, float]:
+        """Number of deleted directories and total time in seconds."""
+        with self._lock:
+            return (self._count, self._time)
+
+    def track(self, fut: asyncio.Future) -> None:
+        self._pending.add(fut)
+        fut.add_done_callback(self._pending.discard)
+
+    async def wait(self) -> None:
+        """Wait for all pending deletions to complete."""
+        if self._pending:
+            await asyncio.gather(*self._pending)
+
+
+cleanup_stats = CleanupStats()
+"""Deletions of all local executors, which share the event loop's default
+thread pool."""
+
+
 class LocalExecutor(Executor):
 
+    def __init__(self) -> None:
+        super().__init__()
+        self._reap_ids = itertools.count()
+
     def create_component(
         self, label: str, parts: tp.List[str], **kwargs
     ) -> SimpleComponent:
@@ -373,11 +452,15 @@ class LocalExecutor(Executor):
         if verbose:
             print(f'await_file({path})')
         t = 0
-        while not os.path.exists(path):
-            if t >= timeout:
-                raise TimeoutError()
-            await asyncio.sleep(delay)
-            t += delay
+        instr.gauge('pending_polls', 1)
+        try:
+            while not os.path.exists(path):
+                if t >= timeout:
+                    raise TimeoutError()
+                await asyncio.sleep(delay)
+                t += delay
+        finally:
+            instr.gauge('pending_polls', -1)
 
     async def send_file(self, path: str, verbose=False) -> None:
         # locally we do not need to do anything
@@ -386,12 +469,48 @@ class LocalExecutor(Executor):
     async def mkdir(self, path: str, verbose=False) -> None:
         pathlib.Path(path).mkdir(parents=True, exist_ok=True)
 
+    def _rmtree_timed(self, path: str, verbose: bool) -> None:
+        start = time.perf_counter()
+        shutil.rmtree(path, ignore_errors=True)
+        duration = time.perf_counter() - start
+        cleanup_stats.add(duration)
+        if verbose:
+            print(f'rmtree({path}) took {duration:.2f}s', flush=True)
+
     async def rmtree(self, path: str, verbose=False) -> None:
+        """
+        Remove `path`.
+
+        Directories are first renamed, so `path` can be re-created right away,
+        and then deleted in a background thread without blocking the event
+        loop. Use `cleanup_stats.wait()` to wait for pending deletions.
+        """
         if os.path.isdir(path):
-            shutil.rmtree(path, ignore_errors=True)
+            loop = asyncio.get_running_loop()
+            tmp_path = f'{path}.rmtree.{os.getpid()}.{next(self._reap_ids)}'
+            try:
+                os.rename(path, tmp_path)
+            except OSError:
+                # cannot rename, delete in place but still off the event loop
+                await loop.run_in_executor(
+                    None, self._rmtree_timed, path, verbose
+                )
+                return
+            fut = loop.run_in_executor(
+                None, self._rmtree_timed, tmp_path, verbose
+            )
+            cleanup_stats.track(fut)
         elif os.path.exists(path):
             os.unlink(path)
 
+    async def proc_stats(
+        self, pids: tp.List[int]
+    ) -> tp.Dict[int, tp.Dict[str, int]]:
+        files = await asyncio.get_running_loop().run_in_executor(
+            None, procfs.read_local, pids
+        )
+        return procfs.tree_stats(files, pids)
+
 
 class RemoteExecutor(Executor):
 
@@ -435,8 +554,12 @@ class RemoteExecutor(Executor):
             canfail=False,
             verbose=verbose
         )
-        await sc.start()
-        await sc.wait()
+        instr.gauge('pending_polls', 1)
+        try:
+            await sc.start()
+            await sc.wait()
+        finally:
+            instr.gauge('pending_polls', -1)
 
     # TODO: Implement opitimized await_files()
 
@@ -474,3 +597,16 @@ class RemoteExecutor(Executor):
         )
         await sc.start()
         await sc.wait()
+
+    async def proc_stats(
+        self, pids: tp.List[int]
+    ) -> tp.Dict[int, tp.Dict[str, int]]:
+        sc = self.create_component(
+            f'{self.host_name}.proc_stats',
+            ['sh', '-c', procfs.SNAPSHOT_SCRIPT],
+            canfail=True,
+            verbose=False
+        )
+        await sc.start()
+        await sc.wait()
+        return procfs.tree_stats(procfs.parse_grep(sc.stdout), pids)
@@ -0,0 +1,86 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Cache of the experiment names defined by experiment modules."""
+
+import json
+import os
+import typing as tp
+
+
+class ExperimentIndex(object):
+    """
+    Experiment names per module file, stored as JSON at `path`.
+
+    Entries are keyed by the module's modification time and size, so listing
+    and filtering experiments doesn't need to execute unchanged modules. An
+    entry is not invalidated when only a module imported by the experiment
+    module changes, pass `--no-index-cache` to `run.py` in that case.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries: tp.Dict[str, tp.Dict[str, tp.Any]] = {}
+        self._dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.entries = data['modules']
+        except (OSError, ValueError, KeyError, AttributeError):
+            # missing or corrupt index, rebuilt as modules are loaded
+            pass
+
+    @staticmethod
+    def _key(module: str) -> tp.Tuple[str, tp.List[int]]:
+        st = os.stat(module)
+        return (os.path.realpath(module), [st.st_mtime_ns, st.st_size])
+
+    def names(self, module: str) -> tp.Optional[tp.List[str]]:
+        """Cached experiment names of `module`, or `None` if the module
+        changed since they were recorded."""
+        (path, stamp) = self._key(module)
+        entry = self.entries.get(path)
+        if entry is None or entry['stamp'] != stamp:
+            return None
+        return entry['names']
+
+    def update(self, module: str, names: tp.Iterable[str]) -> None:
+        (path, stamp) = self._key(module)
+        self.entries[path] = {'stamp': stamp, 'names': list(names)}
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'modules': self.entries}, f)
+            # atomic, so concurrent invocations never see a partial index
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError:
+            # the index is only a cache
+            pass
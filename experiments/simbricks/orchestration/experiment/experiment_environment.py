@@ -36,6 +36,17 @@ class ExpEnv(object):
         self.restore_cp = False
         """Whether to restore from a checkpoint."""
         self.pcap_file = ''
+        """Path prefix for pcap files of network simulators. Captures are
+        disabled if empty, except for simulators with their own settings."""
+        self.pcap_sims: tp.Optional[tp.List[str]] = None
+        """Name patterns of network simulators to capture, all if `None`."""
+        self.pcap_rotate_bytes = 0
+        """Default size in bytes after which capture files are rotated."""
+        self.pcap_rotate_interval = 0
+        """Default interval of virtual time in nanoseconds after which capture
+        files are rotated."""
+        self.pcap_keep = 0
+        """Default number of rotated capture files to keep, 0 keeps all."""
         self.repodir = os.path.abspath(repo_path)
         self.workdir = os.path.abspath(workdir)
         self.cpdir = os.path.abspath(cpdir)
@@ -115,11 +126,16 @@ class ExpEnv(object):
     def net2host_shm_path(
         self, sim_n: 'simulators.Simulator', sim_h: 'simulators.Simulator'
     ) -> str:
-        return f'{self.workdir}/n2h.shm.{sim_n.name}.{sim_h.name}'
+        return f'{self.shm_base}/n2h.shm.{sim_n.name}.{sim_h.name}'
 
     def proxy_shm_path(self, sim: 'simulators.Simulator') -> str:
         return f'{self.shm_base}/proxy.shm.{sim.name}'
 
+    def listen_shm_path(self, sock_path: str) -> str:
+        """Shm region of a port listening on `sock_path`, as created by
+        simulators started with `-H {shm_base}`."""
+        return f'{self.shm_base}/{os.path.basename(sock_path)}-shm'
+
     def gem5_outdir(self, sim: 'simulators.Simulator') -> str:
         return f'{self.workdir}/gem5-out.{sim.name}'
 
@@ -129,5 +145,22 @@ class ExpEnv(object):
     def simics_cpfile(self, sim: 'simulators.Simulator') -> str:
         return f'{self.cpdir}/simics-cp.{sim.name}'
 
+    def qemu_cpfile(self, sim: 'simulators.Simulator') -> str:
+        return f'{self.cpdir}/qemu-cp.{sim.name}'
+
+    def qemu_cp_hd_path(self, sim: 'simulators.Simulator') -> str:
+        return f'{self.cpdir}/qemu-hd.{sim.name}'
+
+    def qemu_qmp_path(self, sim: 'simulators.Simulator') -> str:
+        return f'{self.workdir}/qemu-qmp.{sim.name}'
+
+    def pcap_path(self, sim: 'simulators.NetSim') -> str:
+        """Capture file of `sim`, rotated files get a numeric suffix."""
+        prefix = self.pcap_file or f'{self.workdir}/pcap'
+        return f'{prefix}.{sim.name}.pcap'
+
     def ns3_e2e_params_file(self, sim: 'simulators.NS3E2ENet') -> str:
         return f'{self.workdir}/ns3_e2e_params.{sim.name}'
+
+    def ns3_e2e_json_file(self, sim: 'simulators.NS3E2ENet') -> str:
+        return f'{self.workdir}/ns3_e2e_config.{sim.name}.json'
@@ -25,10 +25,11 @@ import pathlib
 import time
 import typing as tp
 
+from simbricks.orchestration import instrumentation as instr
 from simbricks.orchestration.experiments import Experiment
 
 if tp.TYPE_CHECKING:  # prevent cyclic import
-    from simbricks.orchestration import exectools, simulators
+    from simbricks.orchestration import exectools, proxy, simulators
 
 
 class ExpOutput(object):
@@ -40,8 +41,25 @@ class ExpOutput(object):
         self.end_time = None
         self.success = True
         self.interrupted = False
+        self.stalled = False
+        self.timed_out = False
+        self.abort_reason: tp.Optional[str] = None
+        """Why the run was aborted by a watchdog."""
         self.metadata = exp.metadata
-        self.sims: tp.Dict[str, tp.Dict[str, tp.Union[str, tp.List[str]]]] = {}
+        self.sims: tp.Dict[str, tp.Dict[str, tp.Any]] = {}
+        self.shm_regions: tp.Dict[str, int] = {}
+        self.proxies: tp.Dict[str, tp.Dict[str, tp.Any]] = {}
+        self.profile: tp.Dict[str, tp.Dict[str, tp.Any]] = {}
+        """Time series of profiling samples per simulator."""
+        self.progress: tp.Optional[tp.Dict[str, tp.Any]] = None
+        """Latest progress summary."""
+        self.early_stop: tp.Optional[tp.Dict[str, tp.Any]] = None
+        """Why the run ended before the simulators terminated, with a summary
+        of each converged metric."""
+        self.pcaps: tp.Dict[str, tp.Dict[str, tp.Any]] = {}
+        """Packet capture files per network simulator."""
+        self.resources: tp.Dict[str, tp.Dict[str, tp.Any]] = {}
+        """Time series of host resource usage per simulator."""
 
     def set_start(self) -> None:
         self.start_time = time.time()
@@ -49,9 +67,105 @@ class ExpOutput(object):
     def set_end(self) -> None:
         self.end_time = time.time()
 
+    def set_shm_regions(self, regions: tp.Dict[str, int]) -> None:
+        self.shm_regions = regions
+
+    def add_proxy(
+        self,
+        listener: 'proxy.NetProxyListener',
+        listener_host: int,
+        connecter_host: int
+    ) -> None:
+        """Record which channels a proxy pair carries."""
+        self.proxies[listener.name] = {
+            'listener': listener_host,
+            'connecter': connecter_host,
+            'port': listener.port,
+            'channels': listener.channel_names(),
+        }
+
+    def add_profile_sample(
+        self,
+        sim_name: str,
+        t: float,
+        sample: tp.Dict[str, tp.Any],
+        sync_period: tp.Optional[int] = None
+    ) -> None:
+        """Append a parsed profiling sample taken at wall-clock time `t`."""
+        series = self.profile.setdefault(
+            sim_name, {
+                'sync_period': sync_period,
+                'time': [],
+                'main_time': [],
+                'channels': {},
+            }
+        )
+        n = len(series['time'])
+        series['time'].append(t)
+        series['main_time'].append(sample['main_time'])
+        for (chan, ts) in sample['channels'].items():
+            if chan not in series['channels']:
+                series['channels'][chan] = {'in': [None] * n, 'out': [None] * n}
+        for (chan, cs) in series['channels'].items():
+            ts = sample['channels'].get(chan, {})
+            cs['in'].append(ts.get('in'))
+            cs['out'].append(ts.get('out'))
+
+    def set_profile_counters(
+        self, sim_name: str, counters: tp.Dict[str, int]
+    ) -> None:
+        """Store the counters a simulator printed on exit."""
+        self.profile.setdefault(sim_name, {})['counters'] = counters
+
+    def add_resource_sample(
+        self, sim_name: str, t: float, sample: tp.Dict[str, tp.Any]
+    ) -> None:
+        """Append a resource usage sample taken at wall-clock time `t`."""
+        series = self.resources.setdefault(
+            sim_name, {
+                'time': [],
+                'cpu': [],
+                'rss': [],
+                'threads': [],
+                'wait': [],
+                'vcsw': [],
+                'ivcsw': [],
+                'read_bytes': [],
+                'write_bytes': [],
+            }
+        )
+        for (key, xs) in series.items():
+            if key == 'time':
+                xs.append(t)
+            elif key != 'summary':
+                xs.append(sample.get(key))
+
+    def set_resource_summary(
+        self, sim_name: str, summary: tp.Dict[str, tp.Any]
+    ) -> None:
+        self.resources[sim_name]['summary'] = summary
+
     def set_failed(self) -> None:
         self.success = False
 
+    def set_stalled(self, reason: tp.Optional[str] = None) -> None:
+        self.success = False
+        self.stalled = True
+        self.abort_reason = reason
+
+    def set_timed_out(self, reason: tp.Optional[str] = None) -> None:
+        self.success = False
+        self.timed_out = True
+        self.abort_reason = reason
+
+    def set_early_stop(
+        self, reason: str, metrics: tp.Dict[str, tp.Dict[str, tp.Any]]
+    ) -> None:
+        self.early_stop = {'reason': reason, 'metrics': metrics}
+
+    def set_progress(self, summary: tp.Dict[str, tp.Any]) -> None:
+        self.progress = summary
+
     def set_interrupted(self) -> None:
         self.success = False
         self.interrupted = True
@@ -65,12 +179,37 @@ class ExpOutput(object):
             'stdout': comp.stdout,
             'stderr': comp.stderr,
         }
+        counters = sim.counters(comp.stdout, comp.stderr)
+        if counters:
+            obj['counters'] = counters
         self.sims[sim.full_name()] = obj
 
+    def add_pcap(
+        self,
+        sim: 'simulators.NetSim',
+        path: str,
+        cap: 'simulators.PcapCapture',
+        files: tp.Optional[tp.List[str]]
+    ) -> None:
+        """
+        Args:
+            files: Capture files in the order they were written, `None` if
+                they are on a remote host.
+        """
+        self.pcaps[sim.full_name()] = {
+            'path': path,
+            'files': files,
+            'rotate_bytes': cap.rotate_bytes,
+            'rotate_interval': cap.rotate_interval,
+            'keep': cap.keep,
+        }
+
     def dump(self, outpath: str) -> None:
+        t = instr.now()
         pathlib.Path(outpath).parent.mkdir(parents=True, exist_ok=True)
         with open(outpath, 'w', encoding='utf-8') as file:
             json.dump(self.__dict__, file, indent=4)
+        instr.lap('dump', t)
 
     def load(self, file: str) -> None:
         with open(file, 'r', encoding='utf-8') as fp:
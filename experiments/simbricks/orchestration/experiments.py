@@ -24,6 +24,7 @@ import itertools
 import typing as tp
 
 from simbricks.orchestration import simulators
+from simbricks.orchestration.convergence import Metric
 from simbricks.orchestration.proxy import NetProxyConnecter, NetProxyListener
 from simbricks.orchestration.simulators import (
     HostSim, I40eMultiNIC, NetSim, NICSim, PCIDevSim, Simulator
@@ -45,6 +46,20 @@ class Experiment(object):
         """
         self.timeout: tp.Optional[int] = None
         """Timeout for experiment in seconds."""
+        self.virtual_duration: tp.Optional[float] = None
+        """Expected amount of simulated time in seconds. Used to estimate the
+        remaining time of runs."""
+        self.warmup_duration: tp.Optional[int] = None
+        """Virtual time in nanoseconds at which the synchronized measurement
+        phase starts. Device simulators start at this time, so hosts run
+        ahead without waiting for them until then."""
+        self.warmup_marker: tp.Optional[str] = None
+        """Guest console line ending the warm-up phase. The warm-up runs
+        unsynchronized in a checkpoint run and the measurement phase is
+        restored from the checkpoint taken at the marker."""
+        self.convergence: tp.List[Metric] = []
+        """Metrics parsed from simulator output while running. Once all of
+        them have converged, the run ends early."""
         self.checkpoint = False
         """Whether to use checkpoint and restore for simulators.
 
@@ -66,6 +81,33 @@ class Experiment(object):
         """The network simulators to run."""
         self.metadata: tp.Dict[str, tp.Any] = {}
 
+    def set_phases(
+        self,
+        warmup_duration: tp.Optional[int] = None,
+        warmup_marker: tp.Optional[str] = None,
+        measure_duration: tp.Optional[int] = None
+    ) -> None:
+        """
+        Split the experiment into an unsynchronized warm-up phase and a
+        synchronized measurement phase.
+
+        The orchestrator applies the phases with
+        `simbricks.orchestration.phases.apply_phases()` before running the
+        experiment.
+
+        Args:
+            warmup_duration: See `warmup_duration`.
+            warmup_marker: See `warmup_marker`.
+            measure_duration: Virtual time in nanoseconds of the measurement
+                phase, used to estimate the remaining time of runs.
+        """
+        self.warmup_duration = warmup_duration
+        self.warmup_marker = warmup_marker
+        if measure_duration is not None:
+            self.virtual_duration = (
+                (warmup_duration or 0) + measure_duration
+            ) / 1e9
+
     @property
     def nics(self):
         return filter(lambda pcidev: pcidev.is_nic(), self.pcidevs)
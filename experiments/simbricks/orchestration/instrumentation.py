@@ -0,0 +1,209 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Self-instrumentation of the orchestrator.
+
+All simulators' output streams, watchdogs and file polls of a batch are
+handled by a single asyncio event loop. When enabled, hot paths record how
+long they take, and a monitor measures how late the event loop wakes up
+sleeping tasks, which is the delay every stream and poll sees when the
+orchestrator itself is the bottleneck."""
+
+import asyncio
+import collections
+import json
+import sys
+import time
+import typing as tp
+import weakref
+
+if tp.TYPE_CHECKING:  # prevent cyclic import
+    from simbricks.orchestration import exectools
+
+enabled = False
+"""Whether hot paths record timings. Off by default so they only pay for a
+check of this flag."""
+
+
+class Timer(object):
+    """Number of calls and time spent in a code path."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, secs: float) -> None:
+        self.count += 1
+        self.total += secs
+        self.max = max(self.max, secs)
+
+    def summary(self) -> tp.Dict[str, tp.Any]:
+        return {
+            'count': self.count,
+            'total': round(self.total, 6),
+            'mean': round(self.total / self.count, 6) if self.count else None,
+            'max': round(self.max, 6),
+        }
+
+
+timers: tp.Dict[str, Timer] = collections.defaultdict(Timer)
+gauges: tp.Dict[str, int] = collections.defaultdict(int)
+components: 'weakref.WeakSet[exectools.Component]' = weakref.WeakSet()
+"""Started components that are still referenced, and hold their output."""
+
+
+def now() -> float:
+    return time.perf_counter() if enabled else 0.0
+
+
+def lap(name: str, start: float) -> float:
+    """Record the time since `start`, as returned by `now()`, under `name`
+    and return the current time."""
+    if not enabled:
+        return 0.0
+    t = time.perf_counter()
+    timers[name].add(t - start)
+    return t
+
+
+def gauge(name: str, delta: int) -> None:
+    if enabled:
+        gauges[name] += delta
+
+
+def track(comp: 'exectools.Component') -> None:
+    if enabled:
+        components.add(comp)
+
+
+def _percentile(xs: tp.List[float], p: float) -> tp.Optional[float]:
+    if not xs:
+        return None
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(p * len(xs)))], 6)
+
+
+class LoopMonitor(object):
+    """
+    Periodically exports event-loop lag, hot-path timers, the number of live
+    tasks and pending file polls, and the bytes of simulator output held in
+    memory.
+
+    Loop lag is how much later than requested a task sleeping for `tick`
+    seconds wakes up. Lag statistics cover the last interval, timers are
+    cumulative.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        path: tp.Optional[str] = None,
+        tick: float = 0.1,
+        verbose: bool = True
+    ) -> None:
+        self.interval = interval
+        self.path = path
+        """File to append one JSON object per export to."""
+        self.tick = tick
+        self.verbose = verbose
+        """Print a summary to stderr for each export."""
+        self._lags: tp.List[float] = []
+        self._lag_max = 0.0
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.tick)
+            lag = max(0.0, loop.time() - start - self.tick)
+            self._lags.append(lag)
+            self._lag_max = max(self._lag_max, lag)
+
+    def snapshot(self, final: bool = False) -> tp.Dict[str, tp.Any]:
+        lags = self._lags
+        self._lags = []
+        comps = list(components)
+        return {
+            'time': time.time(),
+            'final': final,
+            'loop_lag': {
+                'samples': len(lags),
+                'mean': round(sum(lags) / len(lags), 6) if lags else None,
+                'p99': _percentile(lags, 0.99),
+                'max': round(max(lags), 6) if lags else None,
+                'max_total': round(self._lag_max, 6),
+            },
+            'timers': {name: t.summary() for (name, t) in timers.items()},
+            'tasks': len(asyncio.all_tasks()),
+            'pending_polls': gauges['pending_polls'],
+            'components': len(comps),
+            'output_bytes': sum(c.bytes_read for c in comps),
+            'partial_bytes': sum(
+                len(c.stdout_buf) + len(c.stderr_buf) for c in comps
+            ),
+        }
+
+    def format(self, snap: tp.Dict[str, tp.Any]) -> str:
+        lag = snap['loop_lag']
+        msg = 'orchestrator: '
+        if lag['mean'] is not None:
+            msg += (
+                f'loop lag mean {lag["mean"] * 1e3:.1f}ms max '
+                f'{lag["max"] * 1e3:.1f}ms, '
+            )
+        msg += (
+            f'{snap["tasks"]} tasks, {snap["pending_polls"]} polls, '
+            f'{snap["output_bytes"] / 1e6:.1f}MB output buffered'
+        )
+        for (name, t) in snap['timers'].items():
+            msg += f', {name} {t["total"]:.2f}s'
+        return msg
+
+    def export(self, final: bool = False) -> None:
+        snap = self.snapshot(final)
+        if self.path is not None:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(snap) + '\n')
+        if self.verbose:
+            print(self.format(snap), file=sys.stderr, flush=True)
+
+    async def run(self) -> None:
+        probe = asyncio.create_task(self._probe())
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                self.export()
+        finally:
+            probe.cancel()
+
+
+async def instrumented(aw: tp.Awaitable, monitor: LoopMonitor) -> tp.Any:
+    """Enable instrumentation and await `aw` while `monitor` runs, with a
+    final export at the end."""
+    global enabled  # pylint: disable=global-statement
+    enabled = True
+    task = asyncio.create_task(monitor.run())
+    try:
+        return await aw
+    finally:
+        task.cancel()
+        monitor.export(final=True)
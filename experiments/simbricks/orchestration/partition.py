@@ -0,0 +1,480 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Partitioning of experiments across multiple hosts.
+
+The simulators of an experiment and the SimBricks channels between them form a
+graph. Only Ethernet channels between NICs and networks and channels between
+networks can be carried across hosts by proxies, all other channels use shared
+memory and force both simulators onto the same host. The partitioner assigns
+groups of simulators to hosts such that the load is balanced, per-host
+resource limits are respected, and the weight of channels crossing hosts is
+minimized."""
+
+import collections
+import heapq
+import itertools
+import math
+import typing as tp
+
+from simbricks.orchestration import proxy
+from simbricks.orchestration.experiments import (
+    DistributedExperiment, Experiment
+)
+from simbricks.orchestration.simulators import (
+    CHANNEL_SHM_SIZE, HostSim, I40eMultiNIC, MultiSubNIC, NetSim, NICSim,
+    Simulator
+)
+
+PROXY_CAPACITY = 32.0
+"""Channel weight one proxy pair can carry before it becomes a bottleneck.
+Corresponds to about 32 unsynchronized or 10 synchronized channels."""
+
+
+class Channel(object):
+    """A SimBricks channel between two simulators."""
+
+    def __init__(
+        self, kind: str, a: Simulator, b: Simulator, weight: float
+    ) -> None:
+        self.kind = kind
+        """One of `pcie`, `mem`, `n2h`, `multinic`, `eth` or `n2n`."""
+        self.a = a
+        """For `eth` channels the NIC, for `n2n` channels the connecting
+        network."""
+        self.b = b
+        """For `eth` channels the network, for `n2n` channels the listening
+        network."""
+        self.weight = weight
+        """Estimated cost of carrying this channel across hosts."""
+
+    def proxyable(self) -> bool:
+        """Whether this channel can be carried across hosts by a proxy."""
+        return self.kind in ('eth', 'n2n')
+
+
+def _synchronized(sim: Simulator) -> bool:
+    # QemuHost and some networks are switched with `sync` instead
+    if isinstance(getattr(sim, 'sync', None), bool):
+        return sim.sync
+    return getattr(sim, 'sync_mode', 0) != 0
+
+
+def channel_weight(a: Simulator, b: Simulator) -> float:
+    """
+    Estimate the cost of carrying the channel between `a` and `b` across hosts.
+
+    Synchronized simulators send a synchronization message every sync period
+    even when idle, so the weight grows with the rate of these messages. Data
+    traffic is not known ahead of time and accounted for by a constant base
+    weight per channel.
+    """
+    w = 1.0
+    for s in (a, b):
+        if _synchronized(s):
+            w += 500 / max(getattr(s, 'sync_period', 500), 1)
+    return w
+
+
+def all_simulators(exp: Experiment) -> tp.List[Simulator]:
+    """All simulators of `exp` including the sub NICs of multi NICs, which are
+    not started separately but still need a host."""
+    sims = []
+    seen = set()
+    for s in exp.all_simulators():
+        if s not in seen:
+            seen.add(s)
+            sims.append(s)
+        if isinstance(s, I40eMultiNIC):
+            for sn in s.subnics:
+                if sn not in seen:
+                    seen.add(sn)
+                    sims.append(sn)
+    return sims
+
+
+def channels(exp: Experiment) -> tp.List[Channel]:
+    """All channels between the simulators of `exp`."""
+    chans = []
+    for s in all_simulators(exp):
+        if isinstance(s, HostSim):
+            for dev in s.pcidevs:
+                chans.append(Channel('pcie', s, dev, channel_weight(s, dev)))
+            for dev in s.memdevs:
+                chans.append(Channel('mem', s, dev, channel_weight(s, dev)))
+            for net in s.net_directs:
+                chans.append(Channel('n2h', s, net, channel_weight(s, net)))
+        elif isinstance(s, MultiSubNIC):
+            chans.append(
+                Channel('multinic', s, s.multinic, channel_weight(s, s))
+            )
+        elif isinstance(s, NetSim):
+            for nic in s.nics:
+                chans.append(Channel('eth', nic, s, channel_weight(nic, s)))
+            for (net_l, _) in s.net_connect:
+                chans.append(Channel('n2n', s, net_l, channel_weight(s, net_l)))
+    return chans
+
+
+def _cores(sim: Simulator) -> int:
+    # sub NICs run as part of the multi NIC process
+    if isinstance(sim, MultiSubNIC):
+        return 0
+    return sim.resreq_cores()
+
+
+def _mem(sim: Simulator) -> int:
+    if isinstance(sim, MultiSubNIC):
+        return 0
+    return sim.resreq_mem()
+
+
+class _Group(object):
+
+    def __init__(self, gid: int) -> None:
+        self.gid = gid
+        self.sims: tp.List[Simulator] = []
+        self.cores = 0
+        self.mem = 0
+        self.edges: tp.Dict[int, float] = collections.defaultdict(float)
+        """Weight of proxyable channels to other groups by group ID."""
+
+
+def _groups(sims: tp.List[Simulator],
+            chans: tp.List[Channel]) -> tp.List[_Group]:
+    """Contract simulators connected by channels that cannot be proxied."""
+    parent = {s: s for s in sims}
+
+    def find(s):
+        while parent[s] is not s:
+            parent[s] = parent[parent[s]]
+            s = parent[s]
+        return s
+
+    for c in chans:
+        if not c.proxyable() and c.a in parent and c.b in parent:
+            parent[find(c.a)] = find(c.b)
+
+    groups: tp.List[_Group] = []
+    by_root: tp.Dict[Simulator, _Group] = {}
+    of_sim: tp.Dict[Simulator, _Group] = {}
+    for s in sims:
+        r = find(s)
+        if r not in by_root:
+            by_root[r] = _Group(len(groups))
+            groups.append(by_root[r])
+        g = by_root[r]
+        g.sims.append(s)
+        g.cores += _cores(s)
+        g.mem += _mem(s)
+        of_sim[s] = g
+
+    for c in chans:
+        if not c.proxyable() or c.a not in of_sim or c.b not in of_sim:
+            continue
+        (ga, gb) = (of_sim[c.a], of_sim[c.b])
+        if ga is not gb:
+            ga.edges[gb.gid] += c.weight
+            gb.edges[ga.gid] += c.weight
+    return groups
+
+
+def growth_order(edges: tp.List[tp.Dict[int, float]],
+                 sizes: tp.List[float]) -> tp.List[int]:
+    """
+    Order groups such that connected groups are close to each other.
+
+    Starting from the most connected group, always continue with the group
+    most strongly connected to the groups ordered so far, preferring the most
+    recently reached ones. This keeps e.g. the hosts behind a switch together.
+
+    Args:
+        edges: Weight of the edges to other groups by index, per group.
+        sizes: Size of each group, breaking ties between seeds.
+
+    Returns:
+        Indices of the groups in order.
+    """
+    order = []
+    done = set()
+    conn = [0.0] * len(edges)
+    tick = itertools.count()
+    seeds = sorted(
+        range(len(edges)),
+        key=lambda i: (sum(edges[i].values()), sizes[i]),
+        reverse=True
+    )
+    for seed in seeds:
+        if seed in done:
+            continue
+        heap = [(0.0, 0, seed)]
+        while heap:
+            (_, _, i) = heapq.heappop(heap)
+            if i in done:
+                continue
+            done.add(i)
+            order.append(i)
+            for (other, w) in edges[i].items():
+                if other not in done:
+                    conn[other] += w
+                    heapq.heappush(heap, (-conn[other], -next(tick), other))
+    return order
+
+
+def partition(
+    exp: Experiment,
+    num_parts: int,
+    cores: tp.Optional[tp.List[tp.Optional[int]]] = None,
+    mem: tp.Optional[tp.List[tp.Optional[int]]] = None,
+    imbalance: float = 0.1,
+    passes: int = 8
+) -> tp.Dict[Simulator, int]:
+    """
+    Assign the simulators of `exp` to `num_parts` hosts.
+
+    Args:
+        cores: Cores available on each host, `None` for unlimited.
+        mem: Memory in MB available on each host, `None` for unlimited.
+        imbalance: How much the cores required on a host may exceed the
+            average, unless a single group of simulators that has to run on
+            the same host is larger.
+        passes: Maximum number of refinement passes.
+
+    Returns:
+        Mapping from simulator to host ID.
+    """
+    if num_parts < 1:
+        raise ValueError('need at least one part')
+    sims = all_simulators(exp)
+    groups = _groups(sims, channels(exp))
+
+    def limits(caps):
+        if caps is None:
+            return [math.inf] * num_parts
+        if len(caps) != num_parts:
+            raise ValueError('need one limit per part')
+        return [math.inf if c is None else c for c in caps]
+
+    core_caps = limits(cores)
+    mem_caps = limits(mem)
+    total_cores = sum(g.cores for g in groups)
+    total_mem = sum(g.mem for g in groups)
+    if total_cores > sum(core_caps) or total_mem > sum(mem_caps):
+        raise RuntimeError(
+            f'experiment {exp.name} needs {total_cores} cores and '
+            f'{total_mem} MB of memory, more than the hosts provide'
+        )
+
+    # balance proportional to host size if limits are known
+    if all(c != math.inf for c in core_caps):
+        shares = [c / sum(core_caps) for c in core_caps]
+    else:
+        shares = [1 / num_parts] * num_parts
+    max_group = max((g.cores for g in groups), default=0)
+    balanced = [
+        min(
+            core_caps[p],
+            max(math.ceil(total_cores * shares[p] * (1 + imbalance)),
+                max_group)
+        ) for p in range(num_parts)
+    ]
+
+    load_cores = [0] * num_parts
+    load_mem = [0] * num_parts
+    part: tp.Dict[int, int] = {}
+
+    def fits(g: _Group, p: int, core_limits: tp.List[float]) -> bool:
+        return (
+            load_cores[p] + g.cores <= core_limits[p] and
+            load_mem[p] + g.mem <= mem_caps[p]
+        )
+
+    def conn(g: _Group, p: int) -> float:
+        return sum(w for (gid, w) in g.edges.items() if part.get(gid) == p)
+
+    def assign(g: _Group, p: int) -> None:
+        part[g.gid] = p
+        load_cores[p] += g.cores
+        load_mem[p] += g.mem
+
+    def unassign(g: _Group) -> None:
+        p = part.pop(g.gid)
+        load_cores[p] -= g.cores
+        load_mem[p] -= g.mem
+
+    # greedy graph growing: place each group with the groups it is most
+    # connected to, otherwise keep filling the fullest host that still has
+    # room so consecutive groups end up together
+    order = growth_order([g.edges for g in groups], [g.cores for g in groups])
+    for g in (groups[i] for i in order):
+        cands = [p for p in range(num_parts) if fits(g, p, balanced)]
+        if not cands:
+            cands = [p for p in range(num_parts) if fits(g, p, core_caps)]
+        if not cands:
+            raise RuntimeError(
+                f'cannot place {", ".join(s.full_name() for s in g.sims)}: '
+                'not enough resources on any host'
+            )
+        best = max(
+            cands,
+            key=lambda p: (conn(g, p), load_cores[p] / max(balanced[p], 1), -p)
+        )
+        assign(g, best)
+
+    # refinement: move groups to hosts they have more channels to
+    for _ in range(passes):
+        moved = False
+        for g in groups:
+            cur = part[g.gid]
+            unassign(g)
+            gains = [(conn(g, p) - conn(g, cur), p)
+                     for p in range(num_parts)
+                     if p != cur and fits(g, p, balanced)]
+            best_gain = max(gains, default=(0, cur))
+            if best_gain[0] > 0:
+                assign(g, best_gain[1])
+                moved = True
+            else:
+                assign(g, cur)
+        if not moved:
+            break
+
+    mapping = {}
+    for g in groups:
+        for s in g.sims:
+            mapping[s] = part[g.gid]
+    return mapping
+
+
+def cut_channels(exp: Experiment, mapping: tp.Dict[Simulator,
+                                                  int]) -> tp.List[Channel]:
+    """Channels of `exp` connecting simulators on different hosts."""
+    return [
+        c for c in channels(exp)
+        if c.a in mapping and c.b in mapping and mapping[c.a] != mapping[c.b]
+    ]
+
+
+def cut_weight(exp: Experiment, mapping: tp.Dict[Simulator, int]) -> float:
+    """Total weight of channels crossing hosts."""
+    return sum(c.weight for c in cut_channels(exp, mapping))
+
+
+def shard_channels(weights: tp.List[float], num_shards: int) -> tp.List[int]:
+    """Balance channels with the given weights across `num_shards` shards.
+    Returns the shard index for each channel."""
+    loads = [0.0] * num_shards
+    shards = [0] * len(weights)
+    heaviest = sorted(range(len(weights)), key=lambda i: weights[i])
+    for i in reversed(heaviest):
+        shard = loads.index(min(loads))
+        shards[i] = shard
+        loads[shard] += weights[i]
+    return shards
+
+
+def num_proxy_pairs(weights: tp.List[float]) -> int:
+    """Number of proxy pairs needed to carry channels with the given
+    weights."""
+    if not weights:
+        return 0
+    return min(len(weights), math.ceil(sum(weights) / PROXY_CAPACITY))
+
+
+def add_proxy_pairs(
+    exp: DistributedExperiment,
+    host_l: int,
+    host_c: int,
+    nics: tp.Iterable[NICSim] = (),
+    n2ns: tp.Iterable[tp.Tuple[NetSim, NetSim]] = (),
+    num_pairs: tp.Optional[int] = None,
+    proxy_type: str = 'sockets'
+) -> tp.List[proxy.NetProxyListener]:
+    """
+    Carry channels between two hosts over one or more proxy pairs.
+
+    The NICs and networks have to be assigned to `host_l` or `host_c`
+    already, with the network on the other host than the peer.
+
+    Args:
+        host_l: Host to run the listening proxies on.
+        host_c: Host to run the connecting proxies on.
+        nics: NICs whose channel to their network crosses the hosts.
+        n2ns: Tuples `(net_c, net_l)` of connecting and listening network.
+        num_pairs: Number of proxy pairs to spread the channels across. By
+            default derived from the estimated channel weights.
+
+    Returns:
+        The listening proxies, with the channel assignment as their `nics`
+        and `n2ns`.
+    """
+    chans = [Channel('eth', nic, nic.network, channel_weight(nic, nic.network))
+             for nic in nics]
+    chans += [
+        Channel('n2n', net_c, net_l, channel_weight(net_c, net_l))
+        for (net_c, net_l) in n2ns
+    ]
+    weights = [c.weight for c in chans]
+    if num_pairs is None:
+        num_pairs = num_proxy_pairs(weights)
+    num_pairs = min(num_pairs, len(chans))
+    (listener_c, connecter_c) = proxy.proxy_classes(proxy_type)
+
+    # continue after the ports of listeners already on this host
+    port = 12345
+    for lp in exp.proxies_listen:
+        if exp.host_mapping.get(lp) == host_l:
+            port = max(port, lp.port + 1)
+
+    listeners = []
+    for i in range(num_pairs):
+        suffix = f'-{i}' if num_pairs > 1 else ''
+        lp = listener_c()
+        lp.name = f'listener-{host_l}-{host_c}{suffix}'
+        lp.port = port + i
+        exp.add_proxy(lp)
+        exp.assign_sim_host(lp, host_l)
+
+        cp = connecter_c(lp)
+        cp.name = f'connecter-{host_l}-{host_c}{suffix}'
+        exp.add_proxy(cp)
+        exp.assign_sim_host(cp, host_c)
+        listeners.append(lp)
+
+    for (c, shard) in zip(chans, shard_channels(weights, num_pairs)):
+        lp = listeners[shard]
+        if c.kind == 'eth':
+            # the proxy on the NIC's host connects to the NIC
+            p = lp if exp.host_mapping[c.a] == host_l else lp.connecter
+            p.add_nic(tp.cast(NICSim, c.a))
+        else:
+            # the proxy on the listening network's host connects to it
+            p = lp if exp.host_mapping[c.b] == host_l else lp.connecter
+            p.add_n2n(c.a, c.b)
+
+    # size shared memory for the channels actually carried instead of the
+    # default for a single proxy carrying everything
+    if num_pairs > 1:
+        for lp in listeners:
+            n = len(lp.nics) + len(lp.n2ns)
+            lp.shm_size = max(256, n * CHANNEL_SHM_SIZE // (1024 * 1024))
+            lp.connecter.shm_size = lp.shm_size
+    return listeners
@@ -0,0 +1,134 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Warm-up and measurement phases of experiments.
+
+Only the measurement phase of an experiment needs accurate synchronization.
+Two mechanisms skip the expensive synchronized simulation of the warm-up:
+
+- With a warm-up duration, device simulators start at the end of the warm-up.
+  Hosts then run without waiting for their devices until they reach that
+  time, and networks connected to the devices start there as well.
+- With a warm-up marker, the warm-up runs unsynchronized in a checkpoint run,
+  e.g. with KVM, until the guest prints the marker. The measurement phase is
+  restored from the checkpoint. QEMU resumes at the virtual time of the
+  checkpoint, so if that is known, also set it as the warm-up duration."""
+
+import typing as tp
+
+from simbricks.orchestration import partition
+from simbricks.orchestration.experiments import Experiment
+from simbricks.orchestration.simulators import (
+    Gem5Host, HostSim, PCIDevSim, QemuHost, Simulator
+)
+
+
+def host_synchronized(host: HostSim) -> bool:
+    if isinstance(host, QemuHost):
+        return host.sync
+    if isinstance(host, Gem5Host):
+        # the adapters only synchronize with this CPU model
+        return host.cpu_type == 'TimingSimpleCPU'
+    return host.sync_mode != 0
+
+
+def set_synchronized(sim: Simulator, sync: bool) -> bool:
+    """Switch synchronization of a device or network simulator, returns
+    whether it changed."""
+    if isinstance(getattr(sim, 'sync', None), bool):
+        changed = sim.sync != sync
+        sim.sync = sync
+        return changed
+    if not hasattr(sim, 'sync_mode'):
+        return False
+    if (sim.sync_mode != 0) == sync:
+        return False
+    sim.sync_mode = 1 if sync else 0
+    return True
+
+
+def connected_components(exp: Experiment) -> tp.List[tp.List[Simulator]]:
+    """Groups of simulators connected through channels, including the sub
+    NICs of multi NICs."""
+    sims = partition.all_simulators(exp)
+    parent = {s: s for s in sims}
+
+    def find(s):
+        while parent[s] is not s:
+            parent[s] = parent[parent[s]]
+            s = parent[s]
+        return s
+
+    for c in partition.channels(exp):
+        if c.a in parent and c.b in parent:
+            parent[find(c.a)] = find(c.b)
+    comps: tp.Dict[Simulator, tp.List[Simulator]] = {}
+    for s in sims:
+        comps.setdefault(find(s), []).append(s)
+    return list(comps.values())
+
+
+def apply_phases(exp: Experiment) -> tp.List[str]:
+    """
+    Configure the simulators of `exp` for its warm-up and measurement phases.
+
+    Devices and networks connected to hosts are synchronized in the
+    measurement phase if any of these hosts is. With a warm-up duration, all
+    device simulators start at its end. With a warm-up marker, the experiment
+    takes a checkpoint at the marker.
+
+    Returns:
+        Descriptions of the changed settings.
+    """
+    changes = []
+    if exp.warmup_duration is None and exp.warmup_marker is None:
+        return changes
+
+    for comp in connected_components(exp):
+        hosts = [s for s in comp if isinstance(s, HostSim)]
+        if not hosts:
+            continue
+        sync = any(host_synchronized(h) for h in hosts)
+        for s in comp:
+            if not isinstance(s, HostSim) and set_synchronized(s, sync):
+                changes.append(
+                    f'{s.full_name()} {"" if sync else "un"}synchronized'
+                )
+
+        if exp.warmup_duration is not None and sync:
+            tick = exp.warmup_duration * 1000
+            for s in comp:
+                if isinstance(s, PCIDevSim) and s.start_tick != tick:
+                    s.start_tick = tick
+                    changes.append(f'{s.full_name()} starts at {tick} ps')
+
+    if exp.warmup_marker is not None:
+        for h in exp.hosts:
+            if isinstance(h, Gem5Host):
+                raise ValueError(
+                    f'{exp.name}: gem5 host {h.name} cannot take checkpoints '
+                    'at warm-up markers'
+                )
+            h.checkpoint_marker = exp.warmup_marker
+        if not exp.checkpoint:
+            exp.checkpoint = True
+            changes.append('checkpoint at warm-up marker')
+    return changes
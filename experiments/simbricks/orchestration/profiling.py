@@ -0,0 +1,210 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Collection of the profiling output simulators print on SIGUSR1.
+
+On SIGUSR1, simulators print their current virtual time and, depending on the
+simulator, the timestamps of the last message received and sent on each
+channel. The collector parses the output produced after each signal into one
+sample per simulator and stores the samples as time series in the experiment
+output."""
+
+import re
+import time
+import typing as tp
+
+from simbricks.orchestration import simulators
+from simbricks.orchestration.exectools import Component
+from simbricks.orchestration.experiment.experiment_environment import ExpEnv
+from simbricks.orchestration.experiment.experiment_output import ExpOutput
+
+Sample = tp.Dict[str, tp.Any]
+"""Parsed profiling output: `main_time` in picoseconds and for each channel
+name the `in` and `out` timestamps."""
+
+_MAIN_TIME_RE = re.compile(r'(?:\[Runner \S+\] )?main_time = (\d+)')
+_NICBM_TS_RE = re.compile(r'(net|pci)_(in|out)_timestamp = (\d+)')
+_PORT_TS_RE = re.compile(r'\[Port (\d+) \]: (in|out)_timestamp == (\d+)')
+_POLL_RE = re.compile(r'^\s*(\w+): +(\d+) +(\w+): +(\d+) ')
+_SYNC_RE = re.compile(r'^\s*(\w+): +(\d+)  sync_rate')
+
+
+class ProfileParser(object):
+    """Parser for simulators that only print their virtual time."""
+
+    def parse(self, lines: tp.List[str]) -> tp.Optional[Sample]:
+        """Parse the output since the last signal, keeping the most recent
+        values if it contains multiple dumps."""
+        sample: Sample = {'main_time': None, 'channels': {}}
+        for line in lines:
+            self.parse_line(line, sample)
+        if sample['main_time'] is None:
+            return None
+        return sample
+
+    def parse_line(self, line: str, sample: Sample) -> None:
+        m = _MAIN_TIME_RE.search(line)
+        if m:
+            sample['main_time'] = int(m.group(1))
+
+
+class NicBmProfileParser(ProfileParser):
+    """Parser for behavioral NIC models, which print PCIe and Ethernet channel
+    timestamps for each device they simulate."""
+
+    def __init__(self, devs: tp.Optional[tp.List[str]] = None) -> None:
+        self.devs = devs
+        """Channel name prefix for each device if multiple are simulated."""
+        self._dev = -1
+
+    def parse(self, lines: tp.List[str]) -> tp.Optional[Sample]:
+        self._dev = -1
+        return super().parse(lines)
+
+    def parse_line(self, line: str, sample: Sample) -> None:
+        m = _MAIN_TIME_RE.search(line)
+        if m:
+            # one dump per device, all devices share the same virtual time
+            self._dev += 1
+            sample['main_time'] = int(m.group(1))
+            return
+        m = _NICBM_TS_RE.search(line)
+        if m:
+            chan = 'eth' if m.group(1) == 'net' else 'pci'
+            if self.devs:
+                dev = self.devs[max(self._dev, 0) % len(self.devs)]
+                chan = f'{dev}.{chan}'
+            sample['channels'].setdefault(chan,
+                                          {})[m.group(2)] = int(m.group(3))
+
+
+class SwitchProfileParser(ProfileParser):
+    """Parser for the switch, which prints timestamps for each port."""
+
+    def __init__(self, ports: tp.List[str]) -> None:
+        self.ports = ports
+        """Channel name for each port index."""
+
+    def parse_line(self, line: str, sample: Sample) -> None:
+        super().parse_line(line, sample)
+        m = _PORT_TS_RE.search(line)
+        if m:
+            port = int(m.group(1))
+            chan = self.ports[port] if port < len(self.ports) else f'{port}'
+            sample['channels'].setdefault(chan,
+                                          {})[m.group(2)] = int(m.group(3))
+
+
+def parser_for(sim: simulators.Simulator,
+               env: ExpEnv) -> tp.Optional[ProfileParser]:
+    """Profiling output parser for `sim`, `None` if it does not print any."""
+    if isinstance(sim, simulators.SwitchNet):
+        peers = [s for (s, _) in sim.connect_sockets(env)]
+        peers += [s for (s, _) in sim.listen_sockets(env)]
+        return SwitchProfileParser([p.full_name() for p in peers])
+    if isinstance(sim, simulators.I40eMultiNIC):
+        return NicBmProfileParser([sn.full_name() for sn in sim.subnics])
+    if isinstance(
+        sim,
+        (
+            simulators.I40eNIC,
+            simulators.CorundumBMNIC,
+            simulators.E1000NIC
+        )
+    ):
+        return NicBmProfileParser()
+    if isinstance(
+        sim,
+        (
+            simulators.WireNet,
+            simulators.MemSwitchNet,
+            simulators.PktGenHost,
+            simulators.MenshenNet,
+            simulators.CorundumVerilatorNIC,
+            simulators.MemDevSim,
+            simulators.NetMemSim
+        )
+    ):
+        return ProfileParser()
+    return None
+
+
+def parse_counters(lines: tp.List[str]) -> tp.Dict[str, int]:
+    """Poll and sync message counters simulators built with statistics print
+    on exit."""
+    counters = {}
+    for line in lines:
+        m = _POLL_RE.match(line)
+        if m:
+            counters[m.group(1)] = int(m.group(2))
+            counters[m.group(3)] = int(m.group(4))
+            continue
+        m = _SYNC_RE.match(line)
+        if m:
+            counters[m.group(1)] = int(m.group(2))
+    return counters
+
+
+class ProfileCollector(object):
+    """Collects profiling samples of running simulators into an
+    `ExpOutput`."""
+
+    def __init__(self, out: ExpOutput, env: ExpEnv) -> None:
+        self.out = out
+        self.env = env
+        self._parsers: tp.Dict[Component, tp.Optional[ProfileParser]] = {}
+        self._offsets: tp.Dict[Component, int] = {}
+        self._signal_time: tp.Optional[float] = None
+
+    def signaled(self) -> None:
+        """Record that SIGUSR1 was just sent to all simulators."""
+        self._signal_time = time.time()
+
+    def collect(
+        self, running: tp.List[tp.Tuple[simulators.Simulator, Component]]
+    ) -> None:
+        """Parse the output produced since the last signal."""
+        for (sim, sc) in running:
+            if sc not in self._parsers:
+                self._parsers[sc] = parser_for(sim, self.env)
+                self._offsets[sc] = 0
+            parser = self._parsers[sc]
+            lines = sc.stderr[self._offsets[sc]:]
+            self._offsets[sc] = len(sc.stderr)
+            if parser is None or self._signal_time is None:
+                continue
+            sample = parser.parse(lines)
+            if sample is not None:
+                self.out.add_profile_sample(
+                    sim.full_name(),
+                    self._signal_time,
+                    sample,
+                    getattr(sim, 'sync_period', None)
+                )
+
+    def collect_counters(
+        self, running: tp.List[tp.Tuple[simulators.Simulator, Component]]
+    ) -> None:
+        """Parse the counters printed on exit."""
+        for (sim, sc) in running:
+            counters = parse_counters(sc.stderr)
+            if counters:
+                self.out.set_profile_counters(sim.full_name(), counters)
@@ -0,0 +1,179 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Monitoring of the virtual-time progress of running experiments."""
+
+import re
+import time
+import typing as tp
+
+from simbricks.orchestration.exectools import Component
+from simbricks.orchestration.experiment.experiment_output import ExpOutput
+from simbricks.orchestration.experiments import Experiment
+from simbricks.orchestration.simulators import HostSim, Simulator
+
+GUEST_MARKERS = [
+    # iperf interval reports
+    re.compile(r'\[ *\d+\] +[0-9.]+ *- *([0-9.]+) +sec'),
+]
+"""Patterns for guest console lines whose first group is the number of seconds
+of virtual time elapsed since the guest application started."""
+
+
+def _fmt_duration(secs: float) -> str:
+    if secs >= 3600:
+        return f'{secs / 3600:.1f}h'
+    if secs >= 60:
+        return f'{secs / 60:.1f}m'
+    return f'{secs:.0f}s'
+
+
+class ProgressMonitor(object):
+    """
+    Tracks the virtual time of simulators between profiling intervals.
+
+    Virtual time is taken from the profiling samples simulators print on
+    SIGUSR1, and for hosts, which don't, from guest console markers.
+    """
+
+    def __init__(
+        self,
+        exp: Experiment,
+        out: ExpOutput,
+        stall_intervals: tp.Optional[int] = None,
+        markers: tp.Optional[tp.List[tp.Pattern]] = None
+    ) -> None:
+        self.exp = exp
+        self.out = out
+        self.stall_intervals = stall_intervals
+        """Number of consecutive intervals without progress of any simulator
+        after which the run is considered stalled."""
+        self.markers = GUEST_MARKERS if markers is None else markers
+        self.stalled = False
+        self.idle_intervals = 0
+        self._last: tp.Dict[str, tp.Tuple[float, float]] = {}
+        """Last wall-clock time and virtual time in seconds per simulator."""
+        self._marker_offsets: tp.Dict[Component, int] = {}
+        self._marker_times: tp.Dict[str, float] = {}
+        self._profiled: tp.Set[str] = set()
+        """Simulators with absolute virtual times from profiling output, guest
+        markers are relative to the start of the application."""
+
+    def _marker_time(self, sim: Simulator,
+                     sc: Component) -> tp.Optional[float]:
+        lines = sc.stdout[self._marker_offsets.get(sc, 0):]
+        self._marker_offsets[sc] = len(sc.stdout)
+        for line in lines:
+            for pat in self.markers:
+                m = pat.search(line)
+                if m:
+                    self._marker_times[sim.full_name()] = float(m.group(1))
+        return self._marker_times.get(sim.full_name())
+
+    def virtual_times(
+        self, running: tp.List[tp.Tuple[Simulator, Component]]
+    ) -> tp.Dict[str, float]:
+        """Current virtual time in seconds of each simulator it is known
+        for."""
+        vts = {}
+        for (sim, sc) in running:
+            name = sim.full_name()
+            series = self.out.profile.get(name)
+            if series and series.get('main_time'):
+                vts[name] = series['main_time'][-1] / 1e12
+                self._profiled.add(name)
+            elif isinstance(sim, HostSim):
+                vt = self._marker_time(sim, sc)
+                if vt is not None:
+                    vts[name] = vt
+        return vts
+
+    def update(
+        self, running: tp.List[tp.Tuple[Simulator, Component]]
+    ) -> tp.Dict[str, tp.Any]:
+        """Compute progress since the last update and check for stalls."""
+        now = time.time()
+        vts = self.virtual_times(running)
+        slowdowns: tp.Dict[str, tp.Optional[float]] = {}
+        progressed = False
+        for (name, vt) in vts.items():
+            if name in self._last:
+                (last_wall, last_vt) = self._last[name]
+                if vt > last_vt:
+                    progressed = True
+                    slowdowns[name] = (now - last_wall) / (vt - last_vt)
+                else:
+                    slowdowns[name] = None
+            self._last[name] = (now, vt)
+
+        if slowdowns:
+            self.idle_intervals = 0 if progressed else self.idle_intervals + 1
+        if (
+            self.stall_intervals is not None and
+            self.idle_intervals >= self.stall_intervals
+        ):
+            self.stalled = True
+
+        absolute = [vt for (n, vt) in vts.items() if n in self._profiled]
+        summary: tp.Dict[str, tp.Any] = {
+            'time': now,
+            'virtual_time': min(absolute or vts.values()) if vts else None,
+            'slowdown': None,
+            'slowest': None,
+            'eta': None,
+            'idle_intervals': self.idle_intervals,
+        }
+        if slowdowns:
+            # a simulator without progress is the slowest one
+            slowest = max(
+                slowdowns,
+                key=lambda n: (slowdowns[n] is None, slowdowns[n] or 0)
+            )
+            summary['slowest'] = slowest
+            summary['slowdown'] = slowdowns[slowest]
+            if (
+                self.exp.virtual_duration is not None and
+                slowdowns[slowest] is not None
+            ):
+                remaining = (
+                    self.exp.virtual_duration - summary['virtual_time']
+                )
+                summary['eta'] = max(0.0, remaining * slowdowns[slowest])
+        self.out.set_progress(summary)
+        return summary
+
+    def format(self, summary: tp.Dict[str, tp.Any]) -> str:
+        msg = f'{self.exp.name}: '
+        if summary['virtual_time'] is None:
+            return msg + 'no progress information yet'
+        msg += f'virtual time {summary["virtual_time"] * 1e3:.3f}ms'
+        if summary['slowdown'] is not None:
+            msg += (
+                f', slowdown {summary["slowdown"]:.0f}x'
+                f' (slowest {summary["slowest"]})'
+            )
+        elif summary['slowest'] is not None:
+            msg += f', {summary["slowest"]} made no progress'
+        if summary['eta'] is not None:
+            msg += f', ETA {_fmt_duration(summary["eta"])}'
+        if self.stalled:
+            msg += f', STALLED for {summary["idle_intervals"]} intervals'
+        return msg
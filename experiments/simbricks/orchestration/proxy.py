@@ -51,11 +51,23 @@ class NetProxy(SimProxy):
         self.n2ns: tp.List[tp.Tuple[tp.Tuple[Simulator, Simulator], bool]] = []
         """List of tuples ((netL,netC), with_listener)"""
         self.shm_size = 2048
-        """Shared memory size in GB"""
+        """Shared memory size in MB"""
 
     def start_delay(self) -> int:
         return 10
 
+    def shm_regions(self,
+                    env: 'experiment_environment.ExpEnv'
+                   ) -> tp.List[tp.Tuple[str, int]]:
+        return [(env.proxy_shm_path(self), self.shm_size * 1024 * 1024)]
+
+    def channel_names(self) -> tp.List[str]:
+        """Names of the channels carried by this proxy."""
+        names = [nic.full_name() for (nic, _) in self.nics]
+        for ((net_c, net_l), _) in self.n2ns:
+            names.append(f'{net_c.full_name()}->{net_l.full_name()}')
+        return names
+
 
 class NetProxyListener(NetProxy):
 
@@ -69,14 +81,16 @@ class NetProxyListener(NetProxy):
         self.nics.append((nic, True))
 
         # the network this nic connects to now also depends on the peer
-        nic.network.extra_deps.append(self.connecter)
+        if self.connecter not in nic.network.extra_deps:
+            nic.network.extra_deps.append(self.connecter)
 
     # add net2net connection with listening network on the listener side
     def add_n2n(self, net_c: Simulator, net_l: Simulator) -> None:
         self.n2ns.append(((net_c, net_l), True))
 
         # the connecting network depends on our peer
-        net_c.extra_deps.append(self.connecter)
+        if self.connecter not in net_c.extra_deps:
+            net_c.extra_deps.append(self.connecter)
 
     def dependencies(self) -> tp.List[Simulator]:
         deps = []
@@ -139,13 +153,15 @@ class NetProxyConnecter(NetProxy):
         self.nics.append((nic, False))
 
         # the network this nic connects to now also depends on the proxy
-        nic.network.extra_deps.append(self.listener)
+        if self.listener not in nic.network.extra_deps:
+            nic.network.extra_deps.append(self.listener)
 
     # add net2net connection with listening network on the connection side
     def add_n2n(self, net_c: Simulator, net_l: Simulator) -> None:
         self.n2ns.append(((net_c, net_l), False))
         # the connecting network depends on our peer
-        net_c.extra_deps.append(self.listener)
+        if self.listener not in net_c.extra_deps:
+            net_c.extra_deps.append(self.listener)
 
     def dependencies(self) -> tp.List[Simulator]:
         deps = [self.listener]
@@ -225,3 +241,14 @@ class SocketsNetProxyConnecter(NetProxyConnecter):
         cmd = f'{env.repodir}/dist/sockets/net_sockets '
         cmd += super().run_cmd_base(env)
         return cmd
+
+
+def proxy_classes(
+    proxy_type: str
+) -> tp.Tuple[tp.Type[NetProxyListener], tp.Type[NetProxyConnecter]]:
+    """Listener and connecter class for proxy type `sockets` or `rdma`."""
+    if proxy_type == 'sockets':
+        return (SocketsNetProxyListener, SocketsNetProxyConnecter)
+    elif proxy_type == 'rdma':
+        return (RDMANetProxyListener, RDMANetProxyConnecter)
+    raise RuntimeError('Unknown proxy type specified')
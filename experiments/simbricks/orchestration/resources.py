@@ -0,0 +1,144 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Sampling of the host resources used by running simulators."""
+
+import asyncio
+import time
+import typing as tp
+
+from simbricks.orchestration.exectools import Component, Executor
+from simbricks.orchestration.experiment.experiment_output import ExpOutput
+from simbricks.orchestration.simulators import Simulator
+from simbricks.orchestration.utils import procfs
+
+COUNTERS = ['vcsw', 'ivcsw', 'read_bytes', 'write_bytes']
+"""Cumulative counters stored as the increase per interval."""
+
+
+def _mean(xs: tp.List[tp.Optional[float]]) -> tp.Optional[float]:
+    xs = [x for x in xs if x is not None]
+    return round(sum(xs) / len(xs), 3) if xs else None
+
+
+def _max(xs: tp.List[tp.Optional[float]]) -> tp.Optional[float]:
+    xs = [x for x in xs if x is not None]
+    return max(xs) if xs else None
+
+
+class ResourceSampler(object):
+    """
+    Periodically reads the CPU, memory, context switch and I/O statistics of
+    each simulator's process tree through its executor.
+
+    Per simulator, each sample stores the CPU utilization in cores, RSS in kB,
+    the number of threads, the context switches and bytes read and written
+    since the previous sample, and the fraction of the interval threads spent
+    waiting for a CPU, summed over threads.
+    """
+
+    def __init__(self, out: ExpOutput) -> None:
+        self.out = out
+        self._last: tp.Dict[str, tp.Tuple[float, tp.Dict[str, int]]] = {}
+        """Wall-clock time and statistics of the last sample per
+        simulator."""
+
+    async def sample(
+        self,
+        running: tp.List[tp.Tuple[Simulator, Component]],
+        sim_executor: tp.Callable[[Simulator], Executor]
+    ) -> None:
+        by_executor: tp.Dict[Executor, tp.List[tp.Tuple[Simulator, int]]] = {}
+        for (sim, sc) in list(running):
+            pid = sc.pid()
+            if pid is not None:
+                by_executor.setdefault(sim_executor(sim), []).append((sim, pid))
+        if not by_executor:
+            return
+
+        executors = list(by_executor)
+        results = await asyncio.gather(
+            *[
+                ex.proc_stats([pid for (_, pid) in by_executor[ex]])
+                for ex in executors
+            ]
+        )
+        t = time.time()
+        for (ex, stats) in zip(executors, results):
+            for (sim, pid) in by_executor[ex]:
+                if pid in stats:
+                    self._add(sim.full_name(), t, stats[pid])
+
+    def _add(self, name: str, t: float, stats: tp.Dict[str, int]) -> None:
+        last = self._last.get(name)
+        if last is not None and last[1]['starttime'] != stats['starttime']:
+            # pid was reused by another process
+            return
+        self._last[name] = (t, stats)
+        if last is None:
+            self.out.add_resource_sample(
+                name,
+                t, {
+                    'rss': stats.get('rss'),
+                    'threads': stats.get('threads'),
+                }
+            )
+            return
+
+        (last_t, last_stats) = last
+        dt = t - last_t
+
+        def delta(key: str) -> tp.Optional[int]:
+            if key not in stats or key not in last_stats:
+                return None
+            # processes in the tree that exited take their counters with them
+            return max(0, stats[key] - last_stats[key])
+
+        sample: tp.Dict[str, tp.Any] = {
+            'rss': stats.get('rss'),
+            'threads': stats.get('threads'),
+        }
+        ticks = delta('cpu_ticks')
+        if ticks is not None and dt > 0:
+            sample['cpu'] = round(ticks / procfs.CLK_TCK / dt, 3)
+        run_delay = delta('run_delay')
+        if run_delay is not None and dt > 0:
+            sample['wait'] = round(run_delay / 1e9 / dt, 3)
+        for key in COUNTERS:
+            sample[key] = delta(key)
+        self.out.add_resource_sample(name, t, sample)
+
+    def summarize(self) -> None:
+        """Store summary statistics of all simulators in the output."""
+        for name in self._last:
+            series = self.out.resources[name]
+            summary: tp.Dict[str, tp.Any] = {
+                'samples': len(series['time']),
+                'cpu_mean': _mean(series['cpu']),
+                'cpu_max': _max(series['cpu']),
+                'rss_mean': _mean(series['rss']),
+                'rss_max': _max(series['rss']),
+                'threads_max': _max(series['threads']),
+                'wait_mean': _mean(series['wait']),
+            }
+            for key in COUNTERS:
+                summary[key] = sum(x for x in series[key] if x is not None)
+            self.out.set_resource_summary(name, summary)
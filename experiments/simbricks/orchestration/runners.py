@@ -22,23 +22,50 @@
 
 import asyncio
 import itertools
+import os
 import shlex
+import sys
+import time
 import traceback
 import typing as tp
 from abc import ABC, abstractmethod
 
+from simbricks.orchestration.convergence import ConvergenceWatcher
+from simbricks.orchestration.disk_images import (
+    DiskImagePool, disk_image_cmd
+)
 from simbricks.orchestration.exectools import (
-    Component, Executor, SimpleComponent
+    Component, Executor, LocalExecutor, SimpleComponent
 )
 from simbricks.orchestration.experiment.experiment_environment import ExpEnv
 from simbricks.orchestration.experiment.experiment_output import ExpOutput
 from simbricks.orchestration.experiments import (
     DistributedExperiment, Experiment
 )
+from simbricks.orchestration.profiling import ProfileCollector
+from simbricks.orchestration.progress import ProgressMonitor
+from simbricks.orchestration.resources import ResourceSampler
+from simbricks.orchestration.shm import shm_regions
 from simbricks.orchestration.simulators import Simulator
 from simbricks.orchestration.utils import graphlib
 
 
+def pcap_files(path: str) -> tp.List[str]:
+    """Capture files written to `path`, rotated ones in the order they were
+    written."""
+    if os.path.exists(path):
+        return [path]
+    (dirname, base) = os.path.split(path)
+    if not os.path.isdir(dirname):
+        return []
+    rotated = []
+    for name in os.listdir(dirname):
+        (stem, _, idx) = name.rpartition('.')
+        if stem == base and idx.isdigit():
+            rotated.append((int(idx), os.path.join(dirname, name)))
+    return [p for (_, p) in sorted(rotated)]
+
+
 class ExperimentBaseRunner(ABC):
 
     def __init__(self, exp: Experiment, env: ExpEnv, verbose: bool) -> None:
@@ -46,6 +73,20 @@ class ExperimentBaseRunner(ABC):
         self.env = env
         self.verbose = verbose
         self.profile_int: tp.Optional[int] = None
+        self.profile: tp.Optional[ProfileCollector] = None
+        self.progress = False
+        """Print a progress summary every profiling interval."""
+        self.stall_intervals: tp.Optional[int] = None
+        """Abort the run after this many profiling intervals without
+        progress."""
+        self.inactivity_timeout: tp.Optional[int] = None
+        """Abort the run if no simulator produces output for this many
+        seconds."""
+        self.sample_int: tp.Optional[float] = None
+        """Sample the host resource usage of simulators every this many
+        seconds."""
+        self.resources: tp.Optional[ResourceSampler] = None
+        self.disk_pool: tp.Optional[DiskImagePool] = None
         self.out = ExpOutput(exp)
         self.running: tp.List[tp.Tuple[Simulator, SimpleComponent]] = []
         self.sockets: tp.List[tp.Tuple[Executor, str]] = []
@@ -131,19 +172,50 @@ class ExperimentBaseRunner(ABC):
             copies.append(task)
         await asyncio.gather(*copies)
 
+        # create directories for packet captures, and remove captures of
+        # previous runs that could otherwise be mistaken for rotated files
+        dirs = []
+        for net in self.exp.networks:
+            if net.pcap_capture(self.env) is None:
+                continue
+            path = self.env.pcap_path(net)
+            executor = self.sim_executor(net)
+            if isinstance(executor, LocalExecutor):
+                for f in pcap_files(path):
+                    os.unlink(f)
+            dirs.append(
+                asyncio.create_task(executor.mkdir(os.path.dirname(path)))
+            )
+        await asyncio.gather(*dirs)
+
         # prepare all simulators in parallel
         sims = []
         for sim in self.exp.all_simulators():
-            prep_cmds = list(sim.prep_cmds(self.env))
-            executor = self.sim_executor(sim)
-            task = asyncio.create_task(
-                executor.run_cmdlist(
-                    'prepare_' + self.exp.name, prep_cmds, verbose=self.verbose
-                )
-            )
+            task = asyncio.create_task(self.prepare_sim(sim))
             sims.append(task)
         await asyncio.gather(*sims)
 
+    async def prepare_sim(self, sim: Simulator) -> None:
+        """Create disk images and run the prepare commands of a simulator."""
+        executor = self.sim_executor(sim)
+        disks = []
+        for (base, path) in sim.disk_images(self.env):
+            if self.disk_pool is not None:
+                task = self.disk_pool.acquire(executor, self.env, base, path)
+            else:
+                task = executor.run_cmdlist(
+                    'prepare_' + self.exp.name,
+                    [disk_image_cmd(self.env, base, path)],
+                    verbose=self.verbose
+                )
+            disks.append(asyncio.create_task(task))
+        await asyncio.gather(*disks)
+
+        prep_cmds = list(sim.prep_cmds(self.env))
+        await executor.run_cmdlist(
+            'prepare_' + self.exp.name, prep_cmds, verbose=self.verbose
+        )
+
     async def wait_for_sims(self) -> None:
         """Wait for simulators to terminate (the ones marked to wait on)."""
         if self.verbose:
@@ -169,6 +241,25 @@ class ExperimentBaseRunner(ABC):
         for _, sc in self.running:
             await sc.wait()
 
+        # parse profiling output of the last signal and exit statistics
+        if self.profile is not None:
+            self.profile.collect(self.running)
+            self.profile.collect_counters(self.running)
+        if self.resources is not None:
+            self.resources.summarize()
+
+        # register packet captures, they are complete once the simulators
+        # terminated
+        for net in self.exp.networks:
+            cap = net.pcap_capture(self.env)
+            if cap is None:
+                continue
+            path = self.env.pcap_path(net)
+            files = None
+            if isinstance(self.sim_executor(net), LocalExecutor):
+                files = pcap_files(path)
+            self.out.add_pcap(net, path, cap, files)
+
         # remove all sockets
         scs = []
         for (executor, sock) in self.sockets:
@@ -183,39 +274,183 @@ class ExperimentBaseRunner(ABC):
         await self.after_cleanup()
         return self.out
 
-    async def profiler(self):
+    async def profiler(self) -> str:
+        """Periodically signal simulators to dump profiling output. Returns if
+        the run stalls."""
         assert self.profile_int
+        self.profile = ProfileCollector(self.out, self.env)
+        monitor = ProgressMonitor(self.exp, self.out, self.stall_intervals)
         while True:
             await asyncio.sleep(self.profile_int)
+            # output of the previous signal should be complete by now
+            self.profile.collect(self.running)
+            summary = monitor.update(self.running)
+            if self.progress or monitor.stalled:
+                print(monitor.format(summary), flush=True)
+            if monitor.stalled:
+                return (
+                    f'no virtual-time progress for {monitor.idle_intervals} '
+                    'profiling intervals'
+                )
+
+            self.profile.signaled()
             for (_, sc) in self.running:
                 await sc.sigusr1()
 
+    async def resource_sampler(self) -> None:
+        """Periodically sample the host resource usage of simulators."""
+        assert self.sample_int
+        self.resources = ResourceSampler(self.out)
+        while True:
+            await self.resources.sample(self.running, self.sim_executor)
+            await asyncio.sleep(self.sample_int)
+
+    async def timeout_watchdog(self) -> str:
+        """Returns once the experiment's timeout has expired."""
+        assert self.exp.timeout is not None and self.out.start_time is not None
+        elapsed = time.time() - self.out.start_time
+        await asyncio.sleep(max(0, self.exp.timeout - elapsed))
+        return f'timeout of {self.exp.timeout} s expired'
+
+    async def inactivity_watchdog(self) -> str:
+        """Returns once no simulator has produced output for
+        `inactivity_timeout` seconds."""
+        assert self.inactivity_timeout is not None
+        last_total = -1
+        last_change = time.time()
+        while True:
+            await asyncio.sleep(min(self.inactivity_timeout, 5))
+            total = 0
+            for (_, sc) in self.running:
+                total += len(sc.stdout) + len(sc.stdout_buf)
+                total += len(sc.stderr) + len(sc.stderr_buf)
+            now = time.time()
+            if total != last_total:
+                last_total = total
+                last_change = now
+            elif now - last_change >= self.inactivity_timeout:
+                return f'no output for {self.inactivity_timeout} s'
+
+    async def convergence_watchdog(self) -> str:
+        """Returns once all metrics of the experiment have converged."""
+        watcher = ConvergenceWatcher(self.exp.convergence)
+        while True:
+            await asyncio.sleep(1)
+            watcher.update({sim: sc.stdout for (sim, sc) in self.running})
+            if watcher.converged():
+                return 'converged: ' + ', '.join(
+                    m.name for m in self.exp.convergence
+                )
+
+    async def start_sims(self) -> None:
+        """Start all simulators in dependency order."""
+        graph = self.sim_graph()
+        ts = graphlib.TopologicalSorter(graph)
+        ts.prepare()
+        while ts.is_active():
+            # start ready simulators in parallel
+            starting = []
+            sims = []
+            for sim in ts.get_ready():
+                starting.append(asyncio.create_task(self.start_sim(sim)))
+                sims.append(sim)
+
+            # wait for starts to complete
+            await asyncio.gather(*starting)
+
+            for sim in sims:
+                ts.done(sim)
+
+    async def wait_or_abort(
+        self,
+        watchers: tp.List[asyncio.Task],
+        aw: tp.Optional[tp.Awaitable] = None,
+        cancel_watchers: bool = True
+    ) -> tp.Optional[asyncio.Task]:
+        """
+        Wait for `aw`, by default for simulators to terminate, unless one of
+        `watchers` completes first.
+
+        Args:
+            cancel_watchers: Cancel the watchers that did not complete, keep
+                them running otherwise.
+
+        Returns the watcher that completed first, `None` if `aw` completed.
+        """
+        if aw is None:
+            aw = self.wait_for_sims()
+        wait_task = asyncio.ensure_future(aw)
+        try:
+            done, _ = await asyncio.wait(
+                [wait_task] + watchers, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            tasks = [wait_task] + (watchers if cancel_watchers else [])
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        # propagate exceptions
+        for task in done:
+            task.result()
+        if wait_task in done:
+            return None
+        return next(iter(done))
+
     async def run(self) -> ExpOutput:
         profiler_task = None
+        sampler_task = None
+        timeout_task = None
 
         try:
             self.out.set_start()
-            graph = self.sim_graph()
-            ts = graphlib.TopologicalSorter(graph)
-            ts.prepare()
-            while ts.is_active():
-                # start ready simulators in parallel
-                starting = []
-                sims = []
-                for sim in ts.get_ready():
-                    starting.append(asyncio.create_task(self.start_sim(sim)))
-                    sims.append(sim)
-
-                # wait for starts to complete
-                await asyncio.gather(*starting)
-
-                for sim in sims:
-                    ts.done(sim)
-
-            if self.profile_int:
-                profiler_task = asyncio.create_task(self.profiler())
-            await self.before_wait()
-            await self.wait_for_sims()
+            self.out.set_shm_regions(shm_regions(self.exp, self.env))
+            if self.sample_int:
+                # also covers the start-up of simulators
+                sampler_task = asyncio.create_task(self.resource_sampler())
+
+            watchers = []
+            convergence_task = None
+            if self.exp.timeout is not None:
+                # started before the simulators so that simulators hanging
+                # during start-up are timed out as well
+                timeout_task = asyncio.create_task(self.timeout_watchdog())
+                watchers.append(timeout_task)
+            aborted_by = await self.wait_or_abort(
+                list(watchers), self.start_sims(), cancel_watchers=False
+            )
+
+            if aborted_by is None:
+                if self.profile_int:
+                    profiler_task = asyncio.create_task(self.profiler())
+                    watchers.append(profiler_task)
+                if self.inactivity_timeout is not None:
+                    watchers.append(
+                        asyncio.create_task(self.inactivity_watchdog())
+                    )
+                if self.exp.convergence:
+                    convergence_task = asyncio.create_task(
+                        self.convergence_watchdog()
+                    )
+                    watchers.append(convergence_task)
+                await self.before_wait()
+                aborted_by = await self.wait_or_abort(watchers)
+            if aborted_by is not None and aborted_by is convergence_task:
+                reason = aborted_by.result()
+                if self.verbose:
+                    print(f'{self.exp.name}: stopping early: {reason}')
+                self.out.set_early_stop(
+                    reason,
+                    {m.name: m.summary() for m in self.exp.convergence}
+                )
+            elif aborted_by is not None:
+                reason = aborted_by.result()
+                print(
+                    f'{self.exp.name}: aborting run: {reason}', file=sys.stderr
+                )
+                if aborted_by is timeout_task:
+                    self.out.set_timed_out(reason)
+                else:
+                    self.out.set_stalled(reason)
         except asyncio.CancelledError:
             if self.verbose:
                 print(f'{self.exp.name}: interrupted')
@@ -224,11 +459,12 @@ class ExperimentBaseRunner(ABC):
             self.out.set_failed()
             traceback.print_exc()
 
-        if profiler_task:
-            try:
-                profiler_task.cancel()
-            except asyncio.CancelledError:
-                pass
+        for task in (profiler_task, sampler_task, timeout_task):
+            if task:
+                try:
+                    task.cancel()
+                except asyncio.CancelledError:
+                    pass
         # The bare except above guarantees that we always execute the following
         # code, which terminates all simulators and produces a proper output
         # file.
@@ -281,4 +517,16 @@ class ExperimentDistributedRunner(ExperimentBaseRunner):
             executor = self.sim_executor(p)
             p.ip = executor.ip
 
+        for lp in self.exp.proxies_listen:
+            self.out.add_proxy(
+                lp,
+                self.exp.host_mapping[lp],
+                self.exp.host_mapping[lp.connecter]
+            )
+            if self.verbose:
+                print(
+                    f'{self.exp.name}: {lp.name} port {lp.port} carries '
+                    f'{", ".join(lp.channel_names())}'
+                )
+
         await super().prepare()
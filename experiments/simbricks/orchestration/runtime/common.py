@@ -23,15 +23,21 @@
 # Allow own class to be used as type for a method's argument
 from __future__ import annotations
 
-import pathlib
-import shutil
+import asyncio
 import typing as tp
 from abc import ABCMeta, abstractmethod
 
-from simbricks.orchestration.exectools import LocalExecutor
+from simbricks.orchestration.disk_images import DiskImagePool
+from simbricks.orchestration.exectools import (
+    CleanupStats, LocalExecutor, cleanup_stats
+)
 from simbricks.orchestration.experiment.experiment_environment import ExpEnv
 from simbricks.orchestration.experiment.experiment_output import ExpOutput
 from simbricks.orchestration.experiments import Experiment
+from simbricks.orchestration.runners import ExperimentBaseRunner
+from simbricks.orchestration.shm import ShmManager
+
+_local_executor = LocalExecutor()
 
 
 class Run(object):
@@ -57,22 +63,21 @@ class Run(object):
     def name(self) -> str:
         return self.experiment.name + '.' + str(self.index)
 
-    async def prep_dirs(self, executor=LocalExecutor()) -> None:
-        shutil.rmtree(self.env.workdir, ignore_errors=True)
-        await executor.rmtree(self.env.workdir)
-        shutil.rmtree(self.env.shm_base, ignore_errors=True)
-        await executor.rmtree(self.env.shm_base)
+    async def prep_dirs(self, executor=_local_executor) -> None:
+        executors = [executor]
+        if not isinstance(executor, LocalExecutor):
+            # config tars and other inputs are prepared locally
+            executors.append(_local_executor)
 
-        if self.env.create_cp:
-            shutil.rmtree(self.env.cpdir, ignore_errors=True)
-            await executor.rmtree(self.env.cpdir)
+        for ex in executors:
+            await ex.rmtree(self.env.workdir)
+            await ex.rmtree(self.env.shm_base)
+            if self.env.create_cp:
+                await ex.rmtree(self.env.cpdir)
 
-        pathlib.Path(self.env.workdir).mkdir(parents=True, exist_ok=True)
-        await executor.mkdir(self.env.workdir)
-        pathlib.Path(self.env.cpdir).mkdir(parents=True, exist_ok=True)
-        await executor.mkdir(self.env.cpdir)
-        pathlib.Path(self.env.shm_base).mkdir(parents=True, exist_ok=True)
-        await executor.mkdir(self.env.shm_base)
+            await ex.mkdir(self.env.workdir)
+            await ex.mkdir(self.env.cpdir)
+            await ex.mkdir(self.env.shm_base)
 
 
 class Runtime(metaclass=ABCMeta):
@@ -82,6 +87,14 @@ class Runtime(metaclass=ABCMeta):
         self._interrupted = False
         """Indicates whether interrupt has been signaled."""
         self.profile_int: tp.Optional[int] = None
+        self.progress = False
+        self.stall_intervals: tp.Optional[int] = None
+        self.inactivity_timeout: tp.Optional[int] = None
+        self.sample_int: tp.Optional[float] = None
+        self.disk_pool: tp.Optional[DiskImagePool] = None
+        self.shm_manager: tp.Optional[ShmManager] = None
+        self.cleanup_stats: CleanupStats = cleanup_stats
+        """Directories deleted in the background by local executors."""
 
     @abstractmethod
     def add_run(self, run: Run) -> None:
@@ -110,5 +123,217 @@ class Runtime(metaclass=ABCMeta):
             self._interrupted = True
             self.interrupt_handler()
 
-    def enable_profiler(self, profile_int: int) -> None:
+    def enable_profiler(
+        self,
+        profile_int: int,
+        progress: bool = False,
+        stall_intervals: tp.Optional[int] = None
+    ) -> None:
+        """
+        Periodically signal simulators to dump profiling output.
+
+        Args:
+            progress: Print a progress summary every interval.
+            stall_intervals: Abort runs after this many intervals without
+                progress.
+        """
         self.profile_int = profile_int
+        self.progress = progress
+        self.stall_intervals = stall_intervals
+
+    def enable_inactivity_timeout(self, timeout: int) -> None:
+        """Abort runs if no simulator produces output for `timeout`
+        seconds."""
+        self.inactivity_timeout = timeout
+
+    def enable_resource_sampler(self, interval: float) -> None:
+        """Sample the CPU, memory, context switch and I/O statistics of
+        simulators every `interval` seconds."""
+        self.sample_int = interval
+
+    def setup_runner(self, runner: ExperimentBaseRunner) -> None:
+        """Pass options to a newly created runner."""
+        if self.profile_int:
+            runner.profile_int = self.profile_int
+            runner.progress = self.progress
+            runner.stall_intervals = self.stall_intervals
+        runner.inactivity_timeout = self.inactivity_timeout
+        runner.sample_int = self.sample_int
+        runner.disk_pool = self.disk_pool
+
+    async def finish_cleanup(self) -> None:
+        """Wait for directories still being deleted in the background and
+        report the time spent deleting directories."""
+        await self.cleanup_stats.wait()
+        (count, secs) = self.cleanup_stats.totals()
+        if count:
+            print(f'removed {count} directories in {secs:.2f}s')
+
+    def enable_disk_pool(self, disk_pool: DiskImagePool) -> None:
+        self.disk_pool = disk_pool
+
+    async def prefill_disk_pool(self, runs: tp.List[Run]) -> None:
+        """Fill the disk image pool with images for `runs` before starting
+        them, so that the first runs also get pooled images."""
+        if self.disk_pool is None or not runs:
+            return
+        bases = [
+            base for run in runs for sim in run.experiment.all_simulators()
+            for (base, _) in sim.disk_images(run.env)
+        ]
+        await self.disk_pool.prefill(runs[0].env, bases)
+
+    def enable_shm_manager(self, shm_manager: ShmManager) -> None:
+        self.shm_manager = shm_manager
+
+
+class SequentialRuntime(Runtime):
+    """
+    Base class for runtimes executing runs one after another.
+
+    In pipelined mode, the next run is prepared while the current one is
+    simulating and the output of finished runs is written in the background.
+    At most one run is prepared ahead of time and at most one run is being
+    finished at any time.
+    """
+
+    def __init__(self, verbose=False, pipeline=False, cleanup=False) -> None:
+        super().__init__()
+        self.runnable: tp.List[Run] = []
+        self.complete: tp.List[Run] = []
+        self.verbose = verbose
+        self.pipeline = pipeline
+        """Overlap preparation and output collection with simulation."""
+        self.cleanup = cleanup
+        """Remove the workdir of a run after its output has been written."""
+        self._running: tp.Optional[asyncio.Task] = None
+
+    def add_run(self, run: Run) -> None:
+        self.runnable.append(run)
+
+    @abstractmethod
+    def create_runner(self, run: Run) -> ExperimentBaseRunner:
+        pass
+
+    @abstractmethod
+    async def prep_dirs(self, run: Run) -> None:
+        pass
+
+    @abstractmethod
+    async def cleanup_dirs(self, run: Run) -> None:
+        pass
+
+    async def prepare_run(self, run: Run) -> ExperimentBaseRunner:
+        if self.shm_manager is not None and not self.shm_manager.fits(
+            run.experiment, run.env
+        ):
+            raise RuntimeError(
+                f'Not enough shared memory available for run {run.name()}'
+            )
+        runner = self.create_runner(run)
+        self.setup_runner(runner)
+        await self.prep_dirs(run)
+        await runner.prepare()
+        return runner
+
+    async def finish_run(self, run: Run) -> None:
+        # if the log is huge, this step takes some time
+        if self.verbose:
+            print(
+                f'Writing collected output of run {run.name()} to JSON file ...'
+            )
+        await asyncio.get_running_loop().run_in_executor(
+            None, run.output.dump, run.outpath
+        )
+        if self.cleanup:
+            await self.cleanup_dirs(run)
+
+    async def do_run(self, run: Run) -> bool:
+        """Actually executes `run`."""
+        try:
+            runner = await self.prepare_run(run)
+        except asyncio.CancelledError:
+            # it is safe to just exit here because we are not running any
+            # simulators yet
+            return False
+
+        await self.execute_run(run, runner)
+        return True
+
+    async def execute_run(self, run: Run, runner: ExperimentBaseRunner) -> None:
+        run.output = await runner.run()  # handles CancelledError
+        self.complete.append(run)
+
+    def can_prepare(self, run: Run) -> bool:
+        """Check whether `run` can be prepared before the current run
+        completes."""
+        return run.prereq is None or run.prereq in self.complete
+
+    async def start(self) -> None:
+        """Execute the runs defined in `self.runnable`."""
+        await self.prefill_disk_pool(self.runnable)
+        if self.pipeline:
+            await self.start_pipelined()
+        else:
+            for run in self.runnable:
+                if self._interrupted:
+                    break
+
+                self._running = asyncio.create_task(self.do_run(run))
+                if await self._running:
+                    await self.finish_run(run)
+        await self.finish_cleanup()
+
+    async def start_pipelined(self) -> None:
+        prepared: tp.Optional[tp.Tuple[Run, asyncio.Task]] = None
+        finishing: tp.Optional[asyncio.Task] = None
+        for (i, run) in enumerate(self.runnable):
+            if self._interrupted:
+                break
+
+            if prepared is not None and prepared[0] is run:
+                self._running = prepared[1]
+            else:
+                self._running = asyncio.create_task(self.prepare_run(run))
+            prepared = None
+            try:
+                runner = await self._running
+            except asyncio.CancelledError:
+                # no simulators running yet, safe to stop here
+                continue
+            if self._interrupted:
+                break
+
+            # prepare the next run while this one is simulating
+            if i + 1 < len(self.runnable):
+                next_run = self.runnable[i + 1]
+                if self.can_prepare(next_run):
+                    prepared = (
+                        next_run,
+                        asyncio.create_task(self.prepare_run(next_run))
+                    )
+
+            self._running = asyncio.create_task(self.execute_run(run, runner))
+            try:
+                await self._running
+            except asyncio.CancelledError:
+                # cancelled before any simulator was started
+                continue
+
+            # write output in the background, waiting for the previous run
+            if finishing is not None:
+                await finishing
+            finishing = asyncio.create_task(self.finish_run(run))
+
+        if prepared is not None:
+            prepared[1].cancel()
+            try:
+                await prepared[1]
+            except asyncio.CancelledError:
+                pass
+        if finishing is not None:
+            await finishing
+
+    def interrupt_handler(self) -> None:
+        if self._running:
+            self._running.cancel()
@@ -23,138 +23,128 @@
 import asyncio
 import typing as tp
 
-from simbricks.orchestration import proxy
-from simbricks.orchestration.exectools import Executor
+from simbricks.orchestration import partition
+from simbricks.orchestration.exectools import Executor, LocalExecutor
 from simbricks.orchestration.experiments import (
     DistributedExperiment, Experiment
 )
 from simbricks.orchestration.runners import ExperimentDistributedRunner
-from simbricks.orchestration.runtime.common import Run, Runtime
+from simbricks.orchestration.runtime.common import Run, SequentialRuntime
+from simbricks.orchestration.simulators import NetSim, NICSim
 
 
-class DistributedSimpleRuntime(Runtime):
+class DistributedSimpleRuntime(SequentialRuntime):
 
-    def __init__(self, executors, verbose=False) -> None:
-        super().__init__()
-        self.runnable: tp.List[Run] = []
-        self.complete: tp.List[Run] = []
-        self.verbose = verbose
+    def __init__(
+        self, executors, verbose=False, pipeline=False, cleanup=False
+    ) -> None:
+        super().__init__(verbose, pipeline, cleanup)
         self.executors = executors
 
-        self._running: asyncio.Task
-
     def add_run(self, run: Run) -> None:
         if not isinstance(run.experiment, DistributedExperiment):
             raise RuntimeError('Only distributed experiments supported')
 
-        self.runnable.append(run)
+        super().add_run(run)
 
-    async def do_run(self, run: Run) -> None:
-        runner = ExperimentDistributedRunner(
+    def create_runner(self, run: Run) -> ExperimentDistributedRunner:
+        return ExperimentDistributedRunner(
             self.executors,
             # we ensure the correct type in add_run()
             tp.cast(DistributedExperiment, run.experiment),
             run.env,
             self.verbose
         )
-        if self.profile_int:
-            runner.profile_int = self.profile_int
-
-        try:
-            for executor in self.executors:
-                await run.prep_dirs(executor)
-            await runner.prepare()
-        except asyncio.CancelledError:
-            # it is safe to just exit here because we are not running any
-            # simulators yet
-            return
-
-        run.output = await runner.run()  # already handles CancelledError
-        self.complete.append(run)
-
-        # if the log is huge, this step takes some time
-        if self.verbose:
-            print(
-                f'Writing collected output of run {run.name()} to JSON file ...'
-            )
-        run.output.dump(run.outpath)
-
-    async def start(self) -> None:
-        for run in self.runnable:
-            if self._interrupted:
-                return
 
-            self._running = asyncio.create_task(self.do_run(run))
-            await self._running
+    async def prep_dirs(self, run: Run) -> None:
+        await asyncio.gather(
+            *[run.prep_dirs(executor) for executor in self.executors]
+        )
 
-    def interrupt_handler(self) -> None:
-        if self._running:
-            self._running.cancel()
+    async def cleanup_dirs(self, run: Run) -> None:
+        # config tars are generated locally
+        await LocalExecutor().rmtree(run.env.workdir)
+        await asyncio.gather(
+            *[executor.rmtree(run.env.workdir) for executor in self.executors]
+        )
+        await asyncio.gather(
+            *[executor.rmtree(run.env.shm_base) for executor in self.executors]
+        )
 
 
 def auto_dist(
     e: Experiment,
     execs: tp.List[Executor],
-    proxy_type: str = 'sockets'
+    proxy_type: str = 'sockets',
+    proxy_pairs: tp.Optional[int] = None
 ) -> DistributedExperiment:
     """
     Converts an Experiment into a DistributedExperiment.
 
-    Assigns network to executor zero, and then round-robin assignment of hosts
-    to executors, while also assigning all nics for a host to the same executor.
+    Partitions the simulators across all executors such that the load is
+    balanced, the cores and memory configured for each executor are not
+    exceeded, and as few channels as possible cross hosts. Then connects each
+    pair of hosts with channels between them through proxy pairs. Unless
+    `proxy_pairs` is specified, the number of proxy pairs per host pair is
+    chosen based on the estimated weight of the channels.
     """
 
     if len(execs) < 2:
         raise RuntimeError('auto_dist needs at least two hosts')
-    elif len(execs) > 2:
-        print('Warning: currently auto_dist only uses the first two hosts')
-
-    if proxy_type == 'sockets':
-        proxy_listener_c = proxy.SocketsNetProxyListener
-        proxy_connecter_c = proxy.SocketsNetProxyConnecter
-    elif proxy_type == 'rdma':
-        proxy_listener_c = proxy.RDMANetProxyListener
-        proxy_connecter_c = proxy.RDMANetProxyConnecter
-    else:
-        raise RuntimeError('Unknown proxy type specified')
+
+    mapping = partition.partition(
+        e,
+        len(execs),
+        cores=[ex.cores for ex in execs],
+        mem=[ex.mem for ex in execs]
+    )
 
     # Create the distributed experiment
-    de = DistributedExperiment(e.name, 2)
+    de = DistributedExperiment(e.name, len(execs))
     de.timeout = e.timeout
+    de.virtual_duration = e.virtual_duration
+    de.warmup_duration = e.warmup_duration
+    de.warmup_marker = e.warmup_marker
+    de.convergence = e.convergence
     de.checkpoint = e.checkpoint
     de.no_simbricks = e.no_simbricks
     de.metadata = e.metadata.copy()
 
-    # create listening proxy on host 0
-    lp = proxy_listener_c()
-    lp.name = 'listener'
-    de.add_proxy(lp)
-    de.assign_sim_host(lp, 0)
-
-    # assign networks to first host
-    for net in e.networks:
-        de.add_network(net)
-        de.assign_sim_host(net, 0)
-
-    # create connecting proxy on host 1
-    cp = proxy_connecter_c(lp)
-    cp.name = 'connecter'
-    de.add_proxy(cp)
-    de.assign_sim_host(cp, 1)
-
-    # round-robin assignment for hosts
-    k = 0
     for h in e.hosts:
         de.add_host(h)
-        de.assign_sim_host(h, k)
-        for nic in h.nics:
-            de.assign_sim_host(nic, k)
-
-            if k != 0:
-                cp.add_nic(nic)
-        k = (k + 1) % 2
-
-    for nic in e.nics:
-        de.add_nic(nic)
+    for dev in e.pcidevs:
+        de.add_pcidev(dev)
+    for dev in e.memdevs:
+        de.add_memdev(dev)
+    for dev in e.netmems:
+        de.add_netmem(dev)
+    for net in e.networks:
+        de.add_network(net)
+    for (sim, host) in mapping.items():
+        de.assign_sim_host(sim, host)
+
+    # group channels by host pair, listening on the lower host ID
+    nics: tp.Dict[tp.Tuple[int, int], tp.List[NICSim]] = {}
+    n2ns: tp.Dict[tp.Tuple[int, int], tp.List[tp.Tuple[NetSim, NetSim]]] = {}
+    for c in partition.cut_channels(e, mapping):
+        (ha, hb) = (mapping[c.a], mapping[c.b])
+        pair = (min(ha, hb), max(ha, hb))
+        nics.setdefault(pair, [])
+        n2ns.setdefault(pair, [])
+        if c.kind == 'eth':
+            nics[pair].append(tp.cast(NICSim, c.a))
+        else:
+            n2ns[pair].append((tp.cast(NetSim, c.a), tp.cast(NetSim, c.b)))
+
+    for (hl, hc) in sorted(nics.keys()):
+        partition.add_proxy_pairs(
+            de,
+            hl,
+            hc,
+            nics[(hl, hc)],
+            n2ns[(hl, hc)],
+            num_pairs=proxy_pairs,
+            proxy_type=proxy_type
+        )
 
     return de
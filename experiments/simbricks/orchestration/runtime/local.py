@@ -25,64 +25,35 @@ import typing as tp
 
 from simbricks.orchestration import exectools
 from simbricks.orchestration.runners import ExperimentSimpleRunner
-from simbricks.orchestration.runtime.common import Run, Runtime
+from simbricks.orchestration.runtime.common import (
+    Run, Runtime, SequentialRuntime
+)
 
 
-class LocalSimpleRuntime(Runtime):
+class LocalSimpleRuntime(SequentialRuntime):
     """Execute runs locally in sequence."""
 
     def __init__(
         self,
         verbose=False,
-        executor: exectools.Executor = exectools.LocalExecutor()
+        executor: exectools.Executor = exectools.LocalExecutor(),
+        pipeline=False,
+        cleanup=False
     ):
-        super().__init__()
-        self.runnable: tp.List[Run] = []
-        self.complete: tp.List[Run] = []
-        self.verbose = verbose
+        super().__init__(verbose, pipeline, cleanup)
         self.executor = executor
-        self._running: tp.Optional[asyncio.Task] = None
-
-    def add_run(self, run: Run) -> None:
-        self.runnable.append(run)
-
-    async def do_run(self, run: Run) -> None:
-        """Actually executes `run`."""
-        try:
-            runner = ExperimentSimpleRunner(
-                self.executor, run.experiment, run.env, self.verbose
-            )
-            if self.profile_int:
-                runner.profile_int = self.profile_int
-            await run.prep_dirs(self.executor)
-            await runner.prepare()
-        except asyncio.CancelledError:
-            # it is safe to just exit here because we are not running any
-            # simulators yet
-            return
 
-        run.output = await runner.run()  # handles CancelledError
-        self.complete.append(run)
-
-        # if the log is huge, this step takes some time
-        if self.verbose:
-            print(
-                f'Writing collected output of run {run.name()} to JSON file ...'
-            )
-        run.output.dump(run.outpath)
-
-    async def start(self) -> None:
-        """Execute the runs defined in `self.runnable`."""
-        for run in self.runnable:
-            if self._interrupted:
-                return
+    def create_runner(self, run: Run) -> ExperimentSimpleRunner:
+        return ExperimentSimpleRunner(
+            self.executor, run.experiment, run.env, self.verbose
+        )
 
-            self._running = asyncio.create_task(self.do_run(run))
-            await self._running
+    async def prep_dirs(self, run: Run) -> None:
+        await run.prep_dirs(self.executor)
 
-    def interrupt_handler(self) -> None:
-        if self._running:
-            self._running.cancel()
+    async def cleanup_dirs(self, run: Run) -> None:
+        await self.executor.rmtree(run.env.workdir)
+        await self.executor.rmtree(run.env.shm_base)
 
 
 class LocalParallelRuntime(Runtime):
@@ -116,6 +87,11 @@ class LocalParallelRuntime(Runtime):
         if self.mem is not None and run.experiment.resreq_mem() > self.mem:
             raise RuntimeError('Not enough memory available for run')
 
+        if self.shm_manager is not None and not self.shm_manager.fits(
+            run.experiment, run.env
+        ):
+            raise RuntimeError('Not enough shared memory available for run')
+
         if run.prereq is None:
             self.runs_noprereq.append(run)
         else:
@@ -127,8 +103,7 @@ class LocalParallelRuntime(Runtime):
             runner = ExperimentSimpleRunner(
                 self.executor, run.experiment, run.env, self.verbose
             )
-            if self.profile_int:
-                runner.profile_int = self.profile_int
+            self.setup_runner(runner)
             await run.prep_dirs(executor=self.executor)
             await runner.prepare()
         except asyncio.CancelledError:
@@ -144,7 +119,9 @@ class LocalParallelRuntime(Runtime):
             print(
                 f'Writing collected output of run {run.name()} to JSON file ...'
             )
-        run.output.dump(run.outpath)
+        await asyncio.get_running_loop().run_in_executor(
+            None, run.output.dump, run.outpath
+        )
         print('finished run ', run.name())
         return run
 
@@ -161,6 +138,8 @@ class LocalParallelRuntime(Runtime):
             self.complete.add(run)
             self.cores_used -= run.experiment.resreq_cores()
             self.mem_used -= run.experiment.resreq_mem()
+            if self.shm_manager is not None:
+                self.shm_manager.release(run.experiment, run.env)
 
     def enough_resources(self, run: Run) -> bool:
         """Check if enough cores and mem are available for the run."""
@@ -176,7 +155,12 @@ class LocalParallelRuntime(Runtime):
         else:
             enough_mem = True
 
-        return enough_cores and enough_mem
+        if self.shm_manager is not None:
+            enough_shm = self.shm_manager.fits(exp, run.env)
+        else:
+            enough_shm = True
+
+        return enough_cores and enough_mem and enough_shm
 
     def prereq_ready(self, run: Run) -> bool:
         """Check if the prerequesite run for `run` has completed."""
@@ -193,6 +177,7 @@ class LocalParallelRuntime(Runtime):
         self.mem_used = 0
 
         runs = self.runs_noprereq + self.runs_prereq
+        await self.prefill_disk_pool(runs)
         for run in runs:
             # if necessary, wait for enough memory or cores
             while not self.enough_resources(run):
@@ -206,6 +191,8 @@ class LocalParallelRuntime(Runtime):
 
             self.cores_used += run.experiment.resreq_cores()
             self.mem_used += run.experiment.resreq_mem()
+            if self.shm_manager is not None:
+                self.shm_manager.reserve(run.experiment, run.env)
 
             job = asyncio.create_task(self.do_run(run))
             self._pending_jobs.add(job)
@@ -223,6 +210,7 @@ class LocalParallelRuntime(Runtime):
                 job.cancel()
             # wait for all runs to finish
             await asyncio.gather(*self._pending_jobs)
+        await self.finish_cleanup()
 
     def interrupt_handler(self) -> None:
         self._starter_task.cancel()
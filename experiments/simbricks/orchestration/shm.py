@@ -0,0 +1,176 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Placement and capacity management of the shared memory regions used by
+SimBricks channels."""
+
+import os
+import typing as tp
+
+from simbricks.orchestration.experiment.experiment_environment import ExpEnv
+from simbricks.orchestration.experiments import Experiment
+
+
+def shm_regions(exp: Experiment, env: ExpEnv) -> tp.Dict[str, int]:
+    """Shared memory regions of all simulators in `exp` with their size in
+    bytes."""
+    regions = {}
+    for sim in exp.all_simulators():
+        for (path, size) in sim.shm_regions(env):
+            regions[path] = size
+    return regions
+
+
+def shm_size(exp: Experiment, env: ExpEnv) -> int:
+    """Total size in bytes of the shared memory regions of `exp`."""
+    return sum(shm_regions(exp, env).values())
+
+
+class ShmMount(object):
+    """A file system that shared memory regions can be placed on."""
+
+    def __init__(self, path: str, fs_type: str, page_size: int) -> None:
+        self.path = path
+        self.fs_type = fs_type
+        self.page_size = page_size
+        """Regions need to be a multiple of this size."""
+        st = os.statvfs(path)
+        self.capacity = st.f_bavail * st.f_frsize
+        """Free space in bytes when the mount was detected."""
+        self.used = 0
+        """Bytes reserved by running experiments."""
+
+    def available(self) -> int:
+        return self.capacity - self.used
+
+    def fits(self, regions: tp.Dict[str, int]) -> bool:
+        if any(size % self.page_size != 0 for size in regions.values()):
+            return False
+        return sum(regions.values()) <= self.available()
+
+
+def _default_hugepage_size() -> int:
+    try:
+        with open('/proc/meminfo', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('Hugepagesize:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 2 * 1024 * 1024
+
+
+def _parse_size(s: str) -> int:
+    units = {'k': 1024, 'm': 1024**2, 'g': 1024**3}
+    if s[-1].lower() in units:
+        return int(s[:-1]) * units[s[-1].lower()]
+    return int(s)
+
+
+def detect_mounts() -> tp.List[ShmMount]:
+    """Writable hugetlbfs mounts and `/dev/shm`, in order of preference."""
+    hugetlb = []
+    tmpfs = []
+    try:
+        with open('/proc/mounts', 'r', encoding='utf-8') as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        mounts = []
+    seen = set()
+    for m in mounts:
+        if len(m) < 4 or m[1] in seen or not os.access(m[1], os.W_OK):
+            continue
+        seen.add(m[1])
+        (path, fs_type, opts) = (m[1], m[2], m[3].split(','))
+        if fs_type == 'hugetlbfs':
+            page_size = _default_hugepage_size()
+            for o in opts:
+                if o.startswith('pagesize='):
+                    page_size = _parse_size(o[len('pagesize='):])
+            hugetlb.append(ShmMount(path, fs_type, page_size))
+        elif fs_type == 'tmpfs' and path == '/dev/shm':
+            tmpfs.append(ShmMount(path, fs_type, 1))
+    return hugetlb + tmpfs
+
+
+class ShmManager(object):
+    """
+    Places the shared memory regions of runs on memory-backed file systems and
+    tracks how much space running experiments use.
+    """
+
+    def __init__(self, mounts: tp.Optional[tp.List[ShmMount]] = None) -> None:
+        if mounts is None:
+            mounts = detect_mounts()
+        self.mounts = mounts
+
+    def mount_for(self, path: str) -> tp.Optional[ShmMount]:
+        """The managed mount containing `path`, if any."""
+        path = os.path.abspath(path)
+        best = None
+        for m in self.mounts:
+            if path == m.path or path.startswith(m.path.rstrip('/') + '/'):
+                if best is None or len(m.path) > len(best.path):
+                    best = m
+        return best
+
+    def usage(self, exp: Experiment,
+              env: ExpEnv) -> tp.Dict[ShmMount, tp.Dict[str, int]]:
+        """Regions of `exp` grouped by the managed mount they are placed
+        on."""
+        usage: tp.Dict[ShmMount, tp.Dict[str, int]] = {}
+        for (path, size) in shm_regions(exp, env).items():
+            m = self.mount_for(path)
+            if m is not None:
+                usage.setdefault(m, {})[path] = size
+        return usage
+
+    def place(self, exp: Experiment, env: ExpEnv, subdir: str) -> bool:
+        """
+        Set `env.shm_base` to a directory on the first mount all regions of
+        `exp` fit on.
+
+        Returns `False` and leaves `env` unchanged if no suitable mount is
+        available.
+        """
+        orig_base = env.shm_base
+        for m in self.mounts:
+            env.shm_base = os.path.join(m.path, 'simbricks', subdir)
+            if m.fits(self.usage(exp, env).get(m, {})):
+                return True
+        env.shm_base = orig_base
+        return False
+
+    def fits(self, exp: Experiment, env: ExpEnv) -> bool:
+        """Check whether the regions of `exp` currently fit on their
+        mounts."""
+        for (m, regions) in self.usage(exp, env).items():
+            if sum(regions.values()) > m.available():
+                return False
+        return True
+
+    def reserve(self, exp: Experiment, env: ExpEnv) -> None:
+        for (m, regions) in self.usage(exp, env).items():
+            m.used += sum(regions.values())
+
+    def release(self, exp: Experiment, env: ExpEnv) -> None:
+        for (m, regions) in self.usage(exp, env).items():
+            m.used -= sum(regions.values())
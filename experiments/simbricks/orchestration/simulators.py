@@ -23,7 +23,11 @@
 # Allow own class to be used as type for a method's argument
 from __future__ import annotations
 
+import fnmatch
+import io
+import json
 import math
+import shlex
 import typing as tp
 
 from simbricks.orchestration import e2e_components as e2e
@@ -31,6 +35,10 @@ from simbricks.orchestration.e2e_topologies import E2ETopology
 from simbricks.orchestration.experiment.experiment_environment import ExpEnv
 from simbricks.orchestration.nodeconfig import NodeConfig
 
+CHANNEL_SHM_SIZE = 2 * 8192 * 2048
+"""Size in bytes of the shared memory queues of one SimBricks channel with
+default parameters (8192 entries of 2048 bytes in each direction)."""
+
 
 class Simulator(object):
     """Base class for all simulators."""
@@ -64,6 +72,16 @@ class Simulator(object):
         """Commands to prepare execution of this simulator."""
         return []
 
+    # pylint: disable=unused-argument
+    def disk_images(self, env: ExpEnv) -> tp.List[tp.Tuple[str, str]]:
+        """
+        Disk images to create before executing this simulator.
+
+        Specified as tuples `(base_image, path)`. `path` is created as a qcow2
+        copy-on-write overlay of the qcow2 image `base_image`.
+        """
+        return []
+
     # pylint: disable=unused-argument
     def run_cmd(self, env: ExpEnv) -> tp.Optional[str]:
         """Command to execute this simulator."""
@@ -83,9 +101,21 @@ class Simulator(object):
     def sockets_wait(self, env: ExpEnv) -> tp.List[str]:
         return []
 
+    # pylint: disable=unused-argument
+    def shm_regions(self, env: ExpEnv) -> tp.List[tp.Tuple[str, int]]:
+        """Shared memory regions this simulator creates as tuples `(path,
+        size_in_bytes)`."""
+        return []
+
     def start_delay(self) -> int:
         return 5
 
+    # pylint: disable=unused-argument
+    def counters(self, stdout: tp.List[str],
+                 stderr: tp.List[str]) -> tp.Dict[str, int]:
+        """Counters parsed from the output of the terminated simulator."""
+        return {}
+
     def wait_terminate(self) -> bool:
         return False
 
@@ -124,6 +154,9 @@ class PCIDevSim(Simulator):
     def sockets_wait(self, env: ExpEnv) -> tp.List[str]:
         return [env.dev_pci_path(self)]
 
+    def shm_regions(self, env: ExpEnv) -> tp.List[tp.Tuple[str, int]]:
+        return [(env.dev_shm_path(self), CHANNEL_SHM_SIZE)]
+
 
 class NICSim(PCIDevSim):
     """Base class for NIC simulators."""
@@ -173,6 +206,39 @@ class NICSim(PCIDevSim):
     def sockets_wait(self, env: ExpEnv) -> tp.List[str]:
         return super().sockets_wait(env) + [env.nic_eth_path(self)]
 
+    def shm_regions(self, env: ExpEnv) -> tp.List[tp.Tuple[str, int]]:
+        # one region for both the PCIe and the Ethernet channel
+        return [(env.dev_shm_path(self), 2 * CHANNEL_SHM_SIZE)]
+
+
+class PcapCapture(object):
+    """Packet capture settings of a network simulator."""
+
+    def __init__(
+        self,
+        ports: tp.Optional[tp.List[tp.Union[int, Simulator]]] = None,
+        rotate_bytes: int = 0,
+        rotate_interval: int = 0,
+        keep: int = 0
+    ) -> None:
+        self.ports = ports
+        """Ports to capture packets of, all if `None`. Either port indices or
+        connected simulators. Switches capture packets sent or received on the
+        port, ports are numbered in the order of `connect_sockets()` followed by
+        `listen_sockets()`. Wires capture packets received on the port, i.e.
+        port 0 captures the direction from the first to the second peer."""
+        self.rotate_bytes = rotate_bytes
+        """Start a new file once the current one exceeds this size in bytes, 0
+        disables size-based rotation."""
+        self.rotate_interval = rotate_interval
+        """Start a new file every interval of virtual time in nanoseconds, 0
+        disables time-based rotation."""
+        self.keep = keep
+        """Only keep the last `keep` files when rotating, 0 keeps all."""
+
+    def rotating(self) -> bool:
+        return self.rotate_bytes > 0 or self.rotate_interval > 0
+
 
 class NetSim(Simulator):
     """Base class for network simulators."""
@@ -195,6 +261,10 @@ class NetSim(Simulator):
         self.net_listen: tp.List[tp.Tuple[NetSim, str]] = []
         self.net_connect: tp.List[tp.Tuple[NetSim, str]] = []
         self.wait = False
+        self.pcap: tp.Optional[PcapCapture] = None
+        """Packet capture settings of this network. Overrides the defaults of
+        the environment and captures packets even if capturing isn't enabled
+        there."""
 
     def full_name(self) -> str:
         return 'net.' + self.name
@@ -238,6 +308,60 @@ class NetSim(Simulator):
     def init_network(self) -> None:
         pass
 
+    def supports_pcap(self) -> bool:
+        return False
+
+    def pcap_capture(self, env: ExpEnv) -> tp.Optional[PcapCapture]:
+        """Effective packet capture settings, `None` if this network doesn't
+        capture packets."""
+        if not self.supports_pcap():
+            return None
+        if self.pcap is not None:
+            return self.pcap
+        if not env.pcap_file:
+            return None
+        if env.pcap_sims is not None and not any(
+            fnmatch.fnmatchcase(self.name, pat) for pat in env.pcap_sims
+        ):
+            return None
+        return PcapCapture(
+            rotate_bytes=env.pcap_rotate_bytes,
+            rotate_interval=env.pcap_rotate_interval,
+            keep=env.pcap_keep
+        )
+
+    def pcap_ports(self, env: ExpEnv, cap: PcapCapture) -> tp.List[int]:
+        """Indices of the ports to capture, empty for all."""
+        if cap.ports is None:
+            return []
+        peers = [s for (s, _) in self.connect_sockets(env)]
+        peers += [s for (s, _) in self.listen_sockets(env)]
+        ports = []
+        for p in cap.ports:
+            if isinstance(p, int):
+                ports.append(p)
+                continue
+            indices = [i for (i, s) in enumerate(peers) if s is p]
+            if not indices:
+                raise ValueError(
+                    f'{self.name}: cannot capture {p.name}, not connected'
+                )
+            ports += indices
+        return ports
+
+    def pcap_args(self, env: ExpEnv, cap: PcapCapture) -> str:
+        """Command line options for capture settings other than the file."""
+        args = ''
+        for p in self.pcap_ports(env, cap):
+            args += f' -P {p}'
+        if cap.rotate_bytes > 0:
+            args += f' -r {cap.rotate_bytes}'
+        if cap.rotate_interval > 0:
+            args += f' -R {cap.rotate_interval}'
+        if cap.keep > 0 and cap.rotating():
+            args += f' -k {cap.keep}'
+        return args
+
 
 # FIXME: Class hierarchy is broken here as an ugly hack
 class MemDevSim(NICSim):
@@ -260,6 +384,9 @@ class MemDevSim(NICSim):
     def sockets_wait(self, env: ExpEnv) -> tp.List[str]:
         return [env.dev_mem_path(self)]
 
+    def shm_regions(self, env: ExpEnv) -> tp.List[tp.Tuple[str, int]]:
+        return [(env.dev_shm_path(self), CHANNEL_SHM_SIZE)]
+
 
 class NetMemSim(NICSim):
     """Base class for netork memory simulators."""
@@ -280,6 +407,9 @@ class NetMemSim(NICSim):
     def sockets_wait(self, env: ExpEnv) -> tp.List[str]:
         return [env.nic_eth_path(self)]
 
+    def shm_regions(self, env: ExpEnv) -> tp.List[tp.Tuple[str, int]]:
+        return [(env.dev_shm_path(self), CHANNEL_SHM_SIZE)]
+
 
 class HostSim(Simulator):
     """Base class for host simulators."""
@@ -296,6 +426,9 @@ class HostSim(Simulator):
         """
         self.sleep = 0
         self.cpu_freq = '4GHz'
+        self.checkpoint_marker = 'ready to checkpoint'
+        """Guest console line at which the checkpoint is taken. Not supported
+        by gem5, which checkpoints with `m5 checkpoint`."""
 
         self.sync_mode = 0
         """Synchronization mode. 0 is running unsynchronized, 1 synchronized.
@@ -356,6 +489,10 @@ class HostSim(Simulator):
     def wait_terminate(self) -> bool:
         return self.wait
 
+    def shm_regions(self, env: ExpEnv) -> tp.List[tp.Tuple[str, int]]:
+        return [(env.net2host_shm_path(net, self), CHANNEL_SHM_SIZE)
+                for net in self.net_directs]
+
 
 class QemuHost(HostSim):
     """Qemu host simulator."""
@@ -375,25 +512,40 @@ class QemuHost(HostSim):
     def resreq_mem(self) -> int:
         return 8192
 
-    def prep_cmds(self, env: ExpEnv) -> tp.List[str]:
-        return [
-            f'{env.qemu_img_path} create -f qcow2 -o '
-            f'backing_file="{env.hd_path(self.node_config.disk_image)}" '
-            f'{env.hdcopy_path(self)}'
-        ]
+    def disk_images(self, env: ExpEnv) -> tp.List[tp.Tuple[str, str]]:
+        if env.create_cp:
+            # the disk state belongs to the checkpoint, so keep it in cpdir
+            return [(
+                env.hd_path(self.node_config.disk_image),
+                env.qemu_cp_hd_path(self)
+            )]
+        if env.restore_cp:
+            return [(env.qemu_cp_hd_path(self), env.hdcopy_path(self))]
+        return [(
+            env.hd_path(self.node_config.disk_image), env.hdcopy_path(self)
+        )]
 
     def run_cmd(self, env: ExpEnv) -> str:
-        accel = ',accel=kvm:tcg' if not self.sync else ''
+        # when creating a checkpoint, boot as fast as possible with KVM and
+        # without instruction counting, the checkpoint is then restored with
+        # the configured synchronization
+        sync = self.sync and not env.create_cp
+        accel = ',accel=kvm:tcg' if not sync else ''
         if self.node_config.kcmd_append:
             kcmd_append = ' ' + self.node_config.kcmd_append
         else:
             kcmd_append = ''
 
+        if env.create_cp:
+            hd_path = env.qemu_cp_hd_path(self)
+        else:
+            hd_path = env.hdcopy_path(self)
+
         cmd = (
             f'{env.qemu_path} -machine q35{accel} -serial mon:stdio '
             '-cpu Skylake-Server -display none -nic none '
             f'-kernel {env.qemu_kernel_path} '
-            f'-drive file={env.hdcopy_path(self)},if=ide,index=0,media=disk '
+            f'-drive file={hd_path},if=ide,index=0,media=disk '
             f'-drive file={env.cfgtar_path(self)},if=ide,index=1,media=disk,'
             'driver=raw '
             '-append "earlyprintk=ttyS0 console=ttyS0 root=/dev/sda1 '
@@ -401,7 +553,7 @@ class QemuHost(HostSim):
             f'-m {self.node_config.memory} -smp {self.node_config.cores} '
         )
 
-        if self.sync:
+        if sync:
             unit = self.cpu_freq[-3:]
             if unit.lower() == 'ghz':
                 base = 0
@@ -416,7 +568,7 @@ class QemuHost(HostSim):
 
         for dev in self.pcidevs:
             cmd += f'-device simbricks-pci,socket={env.dev_pci_path(dev)}'
-            if self.sync:
+            if sync:
                 cmd += ',sync=on'
                 cmd += f',pci-latency={self.pci_latency}'
                 cmd += f',sync-period={self.sync_period}'
@@ -428,6 +580,19 @@ class QemuHost(HostSim):
         assert len(self.net_directs) == 0
         # qemu does not currently support mem device ports
         assert len(self.memdevs) == 0
+
+        if env.restore_cp:
+            cmd += f'-incoming "exec:cat {env.qemu_cpfile(self)}" '
+        elif env.create_cp:
+            # wrapper stops the VM once the guest reaches the checkpoint marker
+            # and migrates its state into the checkpoint file
+            cmd += f'-qmp unix:{env.qemu_qmp_path(self)},server,nowait '
+            cmd = (
+                f'python3 {env.utilsdir}/qemu_checkpoint.py '
+                f'--qmp {env.qemu_qmp_path(self)} '
+                f'--cpfile {env.qemu_cpfile(self)} '
+                f'--marker {shlex.quote(self.checkpoint_marker)} -- {cmd}'
+            )
         return cmd
 
 
@@ -599,7 +764,7 @@ class SimicsHost(HostSim):
             # serial console
             cmd += (
                 '-e \'bp.console_string.break board.serconsole.con '
-                '"ready to checkpoint"\' '
+                f'"{self.checkpoint_marker}"\' '
             )
             # run simulation
             cmd += '-e run '
@@ -771,6 +936,9 @@ class I40eMultiNIC(Simulator):
     def full_name(self) -> str:
         return 'multinic.' + self.name
 
+    def resreq_mem(self) -> int:
+        return sum(sn.resreq_mem() for sn in self.subnics)
+
     def run_cmd(self, env: ExpEnv) -> str:
         args = ''
         first = True
@@ -793,21 +961,111 @@ class I40eMultiNIC(Simulator):
             ss += sn.sockets_wait(env)
         return ss
 
+    def shm_regions(self, env: ExpEnv) -> tp.List[tp.Tuple[str, int]]:
+        regions = []
+        for sn in self.subnics:
+            regions += sn.shm_regions(env)
+        return regions
+
+
+class PktGenHost(NICSim):
+    """
+    Packet generator standing in for a host and its NIC, to benchmark networks
+    without booting hosts.
+
+    Sends UDP packets at a constant rate from IP `10.0.0.<gen_id>` and MAC
+    `00:00:00:00:00:<gen_id>` to the generators in `flows`, and counts the
+    packets it receives. Connect it with `set_network()` and add it to the
+    experiment with `add_nic()`.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.gen_id = 1
+        """Number between 1 and 254 identifying this generator in packet
+        addresses."""
+        self.rate = 10.0
+        """Sending rate in Gbps, 0 to only receive."""
+        self.packet_size = 1500
+        """Size in bytes of the Ethernet frames without FCS."""
+        self.flows: tp.List[tp.Tuple[tp.Union[PktGenHost, int], int]] = []
+        """Destinations as tuples `(generator or gen_id, weight)`. Packets are
+        spread across destinations in proportion to their weight. If empty,
+        packets go to the generator with `gen_id ^ 1`."""
+        self.duration = 1000000000
+        """Virtual time in nanoseconds after which the generator exits."""
+        self.sync = True
+        self.wait = True
+
+    def add_flow(
+        self, dest: tp.Union[PktGenHost, int], weight: int = 1
+    ) -> None:
+        self.flows.append((dest, weight))
+
+    def run_cmd(self, env: ExpEnv) -> str:
+        cmd = f'{env.repodir}/sims/net/pktgen/pktgen'
+        cmd += (
+            f' -S {self.sync_period} -E {self.eth_latency} -n {self.gen_id}'
+            f' -b {self.rate} -l {self.packet_size} -T {self.duration}'
+        )
+        for (dest, weight) in self.flows:
+            if isinstance(dest, PktGenHost):
+                dest = dest.gen_id
+            cmd += f' -d {dest}:{weight}'
+        if not self.sync:
+            cmd += ' -u'
+        # listens like a NIC, options affecting the port have to come first
+        cmd += f' -H {env.shm_base} -h {env.nic_eth_path(self)}'
+        return cmd
+
+    def sockets_cleanup(self, env: ExpEnv) -> tp.List[str]:
+        sock = env.nic_eth_path(self)
+        return [sock, env.listen_shm_path(sock)]
+
+    def sockets_wait(self, env: ExpEnv) -> tp.List[str]:
+        return [env.nic_eth_path(self)]
+
+    def shm_regions(self, env: ExpEnv) -> tp.List[tp.Tuple[str, int]]:
+        sock = env.nic_eth_path(self)
+        return [(env.listen_shm_path(sock), CHANNEL_SHM_SIZE)]
+
+    def wait_terminate(self) -> bool:
+        return self.wait
+
+    def start_delay(self) -> int:
+        return 0
+
+    def counters(self, stdout: tp.List[str],
+                 stderr: tp.List[str]) -> tp.Dict[str, int]:
+        counters = {}
+        for line in stderr:
+            if line.startswith('pktgen: '):
+                (name, _, value) = line[len('pktgen: '):].partition(' = ')
+                if value.strip().isdigit():
+                    counters[name] = int(value)
+        return counters
+
 
 class WireNet(NetSim):
 
     def run_cmd(self, env: ExpEnv) -> str:
         connects = self.connect_sockets(env)
         assert len(connects) == 2
-        cmd = (
-            f'{env.repodir}/sims/net/wire/net_wire {connects[0][1]}'
-            f' {connects[1][1]} {self.sync_mode} {self.sync_period}'
-            f' {self.eth_latency}'
+        cap = self.pcap_capture(env)
+        cmd = f'{env.repodir}/sims/net/wire/net_wire'
+        if cap is not None:
+            cmd += self.pcap_args(env, cap)
+        cmd += (
+            f' {connects[0][1]} {connects[1][1]} {self.sync_mode}'
+            f' {self.sync_period} {self.eth_latency}'
         )
-        if len(env.pcap_file) > 0:
-            cmd += ' ' + env.pcap_file
+        if cap is not None:
+            cmd += ' ' + env.pcap_path(self)
         return cmd
 
+    def supports_pcap(self) -> bool:
+        return True
+
 
 class SwitchNet(NetSim):
 
@@ -823,23 +1081,33 @@ class SwitchNet(NetSim):
         if not self.sync:
             cmd += ' -u'
 
-        if len(env.pcap_file) > 0:
-            cmd += ' -p ' + env.pcap_file
+        cap = self.pcap_capture(env)
+        if cap is not None:
+            cmd += ' -p ' + env.pcap_path(self) + self.pcap_args(env, cap)
         for (_, n) in self.connect_sockets(env):
             cmd += ' -s ' + n
+        if self.listen_sockets(env):
+            cmd += ' -H ' + env.shm_base
         for (_, n) in self.listen_sockets(env):
             cmd += ' -h ' + n
         return cmd
 
+    def supports_pcap(self) -> bool:
+        return True
+
     def sockets_cleanup(self, env: ExpEnv) -> tp.List[str]:
         # cleanup here will just have listening eth sockets, switch also creates
-        # shm regions for each with a "-shm" suffix
+        # shm regions for each in env.shm_base
         cleanup = []
         for s in super().sockets_cleanup(env):
             cleanup.append(s)
-            cleanup.append(s + '-shm')
+            cleanup.append(env.listen_shm_path(s))
         return cleanup
 
+    def shm_regions(self, env: ExpEnv) -> tp.List[tp.Tuple[str, int]]:
+        return [(env.listen_shm_path(s), CHANNEL_SHM_SIZE)
+                for (_, s) in self.listen_sockets(env)]
+
 
 class MemSwitchNet(NetSim):
 
@@ -856,10 +1124,13 @@ class MemSwitchNet(NetSim):
         if not self.sync:
             cmd += ' -u'
 
-        if len(env.pcap_file) > 0:
-            cmd += ' -p ' + env.pcap_file
+        cap = self.pcap_capture(env)
+        if cap is not None:
+            cmd += ' -p ' + env.pcap_path(self) + self.pcap_args(env, cap)
         for (_, n) in self.connect_sockets(env):
             cmd += ' -s ' + n
+        if self.listen_sockets(env):
+            cmd += ' -H ' + env.shm_base
         for (_, n) in self.listen_sockets(env):
             cmd += ' -h ' + n
         for m in self.mem_map:
@@ -868,15 +1139,22 @@ class MemSwitchNet(NetSim):
             cmd += f',{m[4]}'
         return cmd
 
+    def supports_pcap(self) -> bool:
+        return True
+
     def sockets_cleanup(self, env: ExpEnv) -> tp.List[str]:
         # cleanup here will just have listening eth sockets, switch also creates
-        # shm regions for each with a "-shm" suffix
+        # shm regions for each in env.shm_base
         cleanup = []
         for s in super().sockets_cleanup(env):
             cleanup.append(s)
-            cleanup.append(s + '-shm')
+            cleanup.append(env.listen_shm_path(s))
         return cleanup
 
+    def shm_regions(self, env: ExpEnv) -> tp.List[tp.Tuple[str, int]]:
+        return [(env.listen_shm_path(s), CHANNEL_SHM_SIZE)
+                for (_, s) in self.listen_sockets(env)]
+
 
 class TofinoNet(NetSim):
 
@@ -898,6 +1176,100 @@ class TofinoNet(NetSim):
         return cmd
 
 
+class MenshenNet(NetSim):
+    """
+    RTL simulation of the Menshen programmable packet processing pipeline.
+
+    Port `i` of the pipeline is the `i`-th socket of `connect_sockets()`. The
+    pipeline is configured at runtime through control packets, e.g. sent by a
+    connected host.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.sync = True
+        """Whether to synchronize with attached simulators."""
+
+    def run_cmd(self, env: ExpEnv) -> str:
+        if self.net_listen:
+            raise ValueError(
+                f'{self.name}: Menshen only connects to other simulators, '
+                'connect it to the other network instead'
+            )
+        cmd = f'{env.repodir}/sims/net/menshen/menshen_hw'
+        cmd += f' -S {self.sync_period} -E {self.eth_latency}'
+        if self.sync:
+            cmd += ' -y'
+        for (_, n) in self.connect_sockets(env):
+            cmd += ' ' + n
+        return cmd
+
+    def resreq_mem(self) -> int:
+        # a guess, similar to the verilated Corundum NIC
+        return 512
+
+
+class TapNet(NetSim):
+    """
+    Bridges the Ethernet channel of one simulator to a TAP device on the
+    machine running the experiment, e.g. to reach a simulated host from the
+    real network or to observe its traffic with host tools.
+
+    The TAP device runs in real time, so the channel is not synchronized and
+    the attached simulator should not be either.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.tap_device: tp.Optional[str] = None
+        """Name of the TAP device, defaults to `tap` followed by the name of
+        this simulator."""
+        self.create_tap = False
+        """Create the TAP device before the run if it doesn't exist yet.
+        Requires the privileges to do so."""
+        self.tap_ip: tp.Optional[str] = None
+        """Address with prefix length, e.g. `10.0.0.100/24`, to assign to a
+        created TAP device."""
+        self.bridge: tp.Optional[str] = None
+        """Existing Linux bridge to add a created TAP device to."""
+
+    def tap_name(self) -> str:
+        if self.tap_device is not None:
+            return self.tap_device
+        # interface names are limited to 15 characters
+        return f'tap{self.name}'[:15]
+
+    def prep_cmds(self, env: ExpEnv) -> tp.List[str]:
+        if not self.create_tap:
+            return []
+        tap = self.tap_name()
+        cmds = [
+            f'sh -c "ip link show dev {tap} >/dev/null 2>&1 ||'
+            f' ip tuntap add dev {tap} mode tap"'
+        ]
+        if self.tap_ip is not None:
+            cmds.append(f'ip addr replace {self.tap_ip} dev {tap}')
+        if self.bridge is not None:
+            cmds.append(f'ip link set dev {tap} master {self.bridge}')
+        cmds.append(f'ip link set dev {tap} up')
+        return cmds
+
+    def run_cmd(self, env: ExpEnv) -> str:
+        connects = self.connect_sockets(env)
+        if len(connects) != 1 or self.net_listen:
+            raise ValueError(
+                f'{self.name}: a TAP network connects exactly one simulator'
+            )
+        return (
+            f'{env.repodir}/sims/net/tap/net_tap {self.tap_name()}'
+            f' {connects[0][1]}'
+        )
+
+
+MAX_CMDLINE_PARAMS = 128 * 1024
+"""Maximum length of E2E arguments passed on the command line."""
+
+
 class NS3E2ENet(NetSim):
 
     def __init__(self) -> None:
@@ -909,6 +1281,11 @@ class NS3E2ENet(NetSim):
         self.e2e_global = e2e.E2EGlobalConfig()
         self.e2e_ns3_logging = e2e.E2ENs3Logging()
         self.use_file = True
+        """Pass the arguments in a file instead of on the command line. Used
+        regardless for arguments longer than `MAX_CMDLINE_PARAMS`."""
+        self.json_config = False
+        """Also write the configuration as JSON, e.g. for inspecting large
+        topologies."""
 
     def add_component(
         self,
@@ -983,18 +1360,24 @@ class NS3E2ENet(NetSim):
                 elif isinstance(c, e2e.E2ENetworkSimbricks):
                     self.resolve_socket_paths(env, c, c.listen)
 
-        params: tp.List[str] = []
-        params.append(self.e2e_global.ns3_config())
-        params.append(self.e2e_ns3_logging.ns3_config())
-        for component in self.e2e_components:
-            params.append(component.ns3_config())
-
-        params_str = f'{" ".join(params)} {self.opt}'
-
-        if self.use_file:
+        if self.json_config:
+            with open(
+                env.ns3_e2e_json_file(self), 'w', encoding='utf-8'
+            ) as f:
+                self.write_json_config(f)
+
+        params = None
+        if not self.use_file:
+            params = io.StringIO()
+            self.write_params(params)
+            # too long for a command line
+            if params.tell() > MAX_CMDLINE_PARAMS:
+                params = None
+
+        if params is None:
             file_path = env.ns3_e2e_params_file(self)
             with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(params_str)
+                self.write_params(f)
             cmd = (
                 f'{env.repodir}/sims/external/ns-3'
                 f'/simbricks-run.sh e2e-cc-example --ConfigFile={file_path}'
@@ -1002,12 +1385,35 @@ class NS3E2ENet(NetSim):
         else:
             cmd = (
                 f'{env.repodir}/sims/external/ns-3'
-                f'/simbricks-run.sh e2e-cc-example {params_str}'
+                f'/simbricks-run.sh e2e-cc-example {params.getvalue()}'
             )
         print(cmd)
 
         return cmd
 
+    def write_params(self, out: tp.TextIO) -> None:
+        """Stream the ns-3 arguments for all components to `out`."""
+        self.e2e_global.write_ns3_config(out)
+        out.write(' ')
+        self.e2e_ns3_logging.write_ns3_config(out)
+        for component in self.e2e_components:
+            out.write(' ')
+            component.write_ns3_config(out)
+        out.write(f' {self.opt}')
+
+    def write_json_config(self, out: tp.TextIO) -> None:
+        """Stream the configuration of all components to `out` as JSON."""
+        out.write('{"global": ')
+        self.e2e_global.write_json_config(out)
+        out.write(', "logging": ')
+        self.e2e_ns3_logging.write_json_config(out)
+        out.write(', "components": [')
+        for (i, component) in enumerate(self.e2e_components):
+            if i > 0:
+                out.write(', ')
+            component.write_json_config(out)
+        out.write(f'], "opt": {json.dumps(self.opt)}}}')
+
 
 class NS3DumbbellNet(NetSim):
 
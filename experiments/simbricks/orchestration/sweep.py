@@ -0,0 +1,136 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Parameter sweeps that only construct the experiments selected to run."""
+
+from __future__ import annotations
+
+import fnmatch
+import itertools
+import typing as tp
+
+if tp.TYPE_CHECKING:  # keep run.py --list from importing the simulators
+    from simbricks.orchestration.experiments import Experiment
+
+
+class Sweep(object):
+    """
+    Experiments for each point of the cartesian product of parameter axes.
+
+    Experiment names are computed from the parameters alone, so experiments
+    can be listed and selected by name before any of them is constructed.
+    Only the selected points are passed to `factory`, which is called as
+    `factory(name, **params)` and has to return an experiment with that name.
+
+    Points are enumerated with the first axis varying slowest, the same order
+    as nested loops over the axes.
+    """
+
+    def __init__(
+        self,
+        name: tp.Union[str, tp.Callable[..., str]],
+        factory: tp.Callable[..., Experiment],
+        axes: tp.Dict[str, tp.Iterable[tp.Any]],
+        where: tp.Optional[tp.Callable[..., bool]] = None
+    ) -> None:
+        """
+        Args:
+            name: Format string with the axes as named fields, or a function
+                called with the parameters as keyword arguments.
+            axes: Values of each parameter, in the order of the name.
+            where: Called with the parameters as keyword arguments to exclude
+                points for which it returns `False`.
+        """
+        self.name = name
+        self.factory = factory
+        self.axes = {k: list(v) for (k, v) in axes.items()}
+        self.where = where
+
+    def points(self) -> tp.Iterator[tp.Dict[str, tp.Any]]:
+        keys = list(self.axes.keys())
+        for values in itertools.product(*self.axes.values()):
+            params = dict(zip(keys, values))
+            if self.where is None or self.where(**params):
+                yield params
+
+    def name_of(self, params: tp.Dict[str, tp.Any]) -> str:
+        if isinstance(self.name, str):
+            return self.name.format(**params)
+        return self.name(**params)
+
+    def names(self) -> tp.Iterator[str]:
+        for params in self.points():
+            yield self.name_of(params)
+
+    def build(self, params: tp.Dict[str, tp.Any]) -> Experiment:
+        name = self.name_of(params)
+        e = self.factory(name, **params)
+        if e.name != name:
+            raise ValueError(
+                f'factory returned experiment {e.name} for point {name}'
+            )
+        return e
+
+    def select(
+        self, patterns: tp.Optional[tp.List[str]] = None
+    ) -> tp.Iterator[Experiment]:
+        """Construct the experiments whose names match any of `patterns`, or
+        all of them."""
+        for params in self.points():
+            if matches(self.name_of(params), patterns):
+                yield self.build(params)
+
+    def __iter__(self) -> tp.Iterator[Experiment]:
+        return self.select()
+
+
+def matches(name: str, patterns: tp.Optional[tp.List[str]]) -> bool:
+    """Whether `name` matches any of the Unix shell style `patterns`. Without
+    patterns every name matches."""
+    if not patterns:
+        return True
+    return any(fnmatch.fnmatch(name, p) for p in patterns)
+
+
+def experiment_names(
+    entries: tp.Iterable[tp.Union[Experiment, Sweep]],
+    patterns: tp.Optional[tp.List[str]] = None
+) -> tp.Iterator[str]:
+    """Names of the experiments and sweep points in `entries` matching
+    `patterns`, without constructing any sweep experiments."""
+    for entry in entries:
+        names = entry.names() if isinstance(entry, Sweep) else [entry.name]
+        for name in names:
+            if matches(name, patterns):
+                yield name
+
+
+def select_experiments(
+    entries: tp.Iterable[tp.Union[Experiment, Sweep]],
+    patterns: tp.Optional[tp.List[str]] = None
+) -> tp.Iterator[Experiment]:
+    """Experiments in `entries` matching `patterns`, constructing sweep
+    experiments only when they match."""
+    for entry in entries:
+        if isinstance(entry, Sweep):
+            yield from entry.select(patterns)
+        elif matches(entry.name, patterns):
+            yield entry
@@ -0,0 +1,191 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Tuning of synchronization periods.
+
+A simulator sends a synchronization message on each of its channels whenever
+it has not sent any other message for one sync period. Peers can never advance
+further than the timestamp of the last received message plus the link latency,
+so a sync period equal to the link latency is the largest one that does not
+affect accuracy, while smaller ones only send more messages. Each simulator
+has a single sync period for all its channels, so it is bounded by the lowest
+latency among them."""
+
+import math
+import typing as tp
+
+from simbricks.orchestration import partition
+from simbricks.orchestration.exectools import Executor, LocalExecutor
+from simbricks.orchestration.experiment.experiment_environment import ExpEnv
+from simbricks.orchestration.experiments import Experiment
+from simbricks.orchestration.runners import ExperimentSimpleRunner
+from simbricks.orchestration.runtime.common import Run
+from simbricks.orchestration.simulators import HostSim, Simulator
+
+_LATENCY_ATTRS = {
+    'pcie': 'pci_latency',
+    'mem': 'mem_latency',
+    'eth': 'eth_latency',
+    'n2n': 'eth_latency',
+    'n2h': 'eth_latency',
+}
+"""Attribute holding a simulator's latency for each channel kind."""
+
+
+def _latency(sim: Simulator, kind: str) -> tp.Optional[int]:
+    # hosts use the network's parameters for direct connections
+    if kind == 'n2h' and isinstance(sim, HostSim):
+        return None
+    if kind not in _LATENCY_ATTRS:
+        return None
+    return getattr(sim, _LATENCY_ATTRS[kind], None)
+
+
+def channel_latencies(
+    exp: Experiment
+) -> tp.Dict[Simulator, tp.List[tp.Tuple[str, Simulator, int]]]:
+    """Outgoing latency of each channel of each simulator as tuples `(kind,
+    peer, latency)`."""
+    lats: tp.Dict[Simulator, tp.List[tp.Tuple[str, Simulator, int]]] = {}
+    for c in partition.channels(exp):
+        for (sim, peer) in ((c.a, c.b), (c.b, c.a)):
+            lat = _latency(sim, c.kind)
+            if lat is not None:
+                lats.setdefault(sim, []).append((c.kind, peer, lat))
+    return lats
+
+
+def latency_mismatches(exp: Experiment) -> tp.List[str]:
+    """Channels whose two ends are configured with different latencies."""
+    msgs = []
+    for c in partition.channels(exp):
+        (la, lb) = (_latency(c.a, c.kind), _latency(c.b, c.kind))
+        if la is not None and lb is not None and la != lb:
+            msgs.append(
+                f'{c.kind} channel {c.a.full_name()} -> {c.b.full_name()}: '
+                f'{la} ns vs. {lb} ns'
+            )
+    return msgs
+
+
+def safe_sync_periods(exp: Experiment,
+                      factor: float = 1.0) -> tp.Dict[Simulator, int]:
+    """
+    Largest sync period in nanoseconds for each simulator that does not affect
+    accuracy, scaled by `factor`.
+
+    Simulators without channels keep their current sync period.
+    """
+    if not 0 < factor <= 1:
+        raise ValueError('sync periods above the link latency lose accuracy')
+    lats = channel_latencies(exp)
+    periods = {}
+    for sim in partition.all_simulators(exp):
+        if not hasattr(sim, 'sync_period'):
+            continue
+        if sim in lats:
+            min_lat = min(lat for (_, _, lat) in lats[sim])
+            periods[sim] = max(1, math.floor(min_lat * factor))
+        else:
+            periods[sim] = sim.sync_period
+    return periods
+
+
+def apply_sync_periods(
+    exp: Experiment, periods: tp.Dict[Simulator, int]
+) -> None:
+    """Set the sync periods of the simulators in `exp` and record them in the
+    experiment's metadata."""
+    for (sim, period) in periods.items():
+        sim.sync_period = period
+    exp.metadata['sync_periods'] = {
+        sim.full_name(): period for (sim, period) in periods.items()
+    }
+
+
+def tune_sync_periods(exp: Experiment) -> tp.Dict[Simulator, int]:
+    """Set each simulator's sync period to the largest one not affecting
+    accuracy. Returns the periods that changed."""
+    periods = safe_sync_periods(exp)
+    changed = {s: p for (s, p) in periods.items() if s.sync_period != p}
+    apply_sync_periods(exp, periods)
+    return changed
+
+
+async def calibrate(
+    make_exp: tp.Callable[[], Experiment],
+    make_env: tp.Callable[[Experiment, float], ExpEnv],
+    factors: tp.Iterable[float] = (0.25, 0.5, 1.0),
+    executor: tp.Optional[Executor] = None,
+    verbose: bool = False
+) -> tp.Dict[float, float]:
+    """
+    Measure the wall-clock time of short calibration runs with sync periods at
+    the given fractions of the safe maximum.
+
+    Args:
+        make_exp: Creates a fresh, shortened instance of the experiment, e.g.
+            with a shorter workload.
+        make_env: Creates the environment for a calibration run with the given
+            factor.
+
+    Returns:
+        Duration in seconds of the calibration run for each factor, or
+        `math.inf` if the run failed.
+
+    Calibration runs are started from a script rather than run.py, e.g.::
+
+        env = lambda e, f: ExpEnv(repo_path, f'{workdir}/cal-{f}', cpdir)
+        durations = asyncio.run(calibrate(make_short_exp, env))
+        factor = best_factor(durations)
+
+    The chosen factor can then be applied to the full experiment with
+    `apply_sync_periods(e, safe_sync_periods(e, factor))`.
+    """
+    if executor is None:
+        executor = LocalExecutor()
+    durations = {}
+    for (i, factor) in enumerate(factors):
+        exp = make_exp()
+        apply_sync_periods(exp, safe_sync_periods(exp, factor))
+        env = make_env(exp, factor)
+        run = Run(exp, i, env, '')
+        await run.prep_dirs(executor)
+
+        runner = ExperimentSimpleRunner(executor, exp, env, verbose)
+        await runner.prepare()
+        out = await runner.run()
+        if out.success:
+            durations[factor] = out.end_time - out.start_time
+        else:
+            durations[factor] = math.inf
+        if verbose:
+            print(
+                f'calibrate {exp.name}: sync period factor {factor}: '
+                f'{durations[factor]:.1f} s'
+            )
+    return durations
+
+
+def best_factor(durations: tp.Dict[float, float]) -> float:
+    """Factor of the fastest successful calibration run, preferring the
+    largest one among equally fast runs."""
+    return min(durations, key=lambda f: (durations[f], -f))
@@ -0,0 +1,196 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Per-process resource usage from the Linux /proc file system.
+
+Statistics are aggregated over the tree of processes rooted at each simulator
+process, since simulators are often started through wrapper scripts or fork
+helper processes."""
+
+import os
+import re
+import typing as tp
+
+CLK_TCK = 100
+"""Clock ticks per second of CPU times in `stat`, 100 on all common Linux
+platforms."""
+if hasattr(os, 'sysconf'):
+    CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+FILES = ['stat', 'status', 'io', 'schedstat']
+
+SNAPSHOT_SCRIPT = (
+    "grep -H '' /proc/[0-9]*/stat /proc/[0-9]*/io /proc/[0-9]*/schedstat "
+    '2>/dev/null; '
+    "grep -H -E '^(VmRSS|voluntary_ctxt_switches|"
+    "nonvoluntary_ctxt_switches):' /proc/[0-9]*/status 2>/dev/null; "
+    'exit 0'
+)
+"""Shell script printing the files of all processes as `path:line`, for
+sampling on remote hosts with a single command."""
+
+_GREP_LINE = re.compile(r'^/proc/(\d+)/(\w+):(.*)$')
+
+ProcFiles = tp.Dict[int, tp.Dict[str, str]]
+"""Contents of the files in `FILES` per pid."""
+
+
+def parse_stat(text: str) -> tp.Dict[str, int]:
+    # the command name in parentheses may contain spaces and parentheses
+    fields = text.rpartition(')')[2].split()
+    return {
+        'ppid': int(fields[1]),
+        'cpu_ticks': int(fields[11]) + int(fields[12]),
+        'threads': int(fields[17]),
+        'starttime': int(fields[19]),
+    }
+
+
+def parse_status(text: str) -> tp.Dict[str, int]:
+    keys = {
+        'VmRSS': 'rss',
+        'voluntary_ctxt_switches': 'vcsw',
+        'nonvoluntary_ctxt_switches': 'ivcsw',
+    }
+    stats = {}
+    for line in text.splitlines():
+        (key, _, value) = line.partition(':')
+        if key in keys:
+            # VmRSS is in kB
+            stats[keys[key]] = int(value.split()[0])
+    return stats
+
+
+def parse_io(text: str) -> tp.Dict[str, int]:
+    stats = {}
+    for line in text.splitlines():
+        (key, _, value) = line.partition(':')
+        if key in ('read_bytes', 'write_bytes'):
+            stats[key] = int(value)
+    return stats
+
+
+def parse_schedstat(text: str) -> tp.Dict[str, int]:
+    # time on cpu, time waiting on a run queue, and timeslices, in ns
+    return {'run_delay': int(text.split()[1])}
+
+
+def parse_grep(lines: tp.List[str]) -> ProcFiles:
+    """Parse the output of `SNAPSHOT_SCRIPT`."""
+    files: ProcFiles = {}
+    for line in lines:
+        m = _GREP_LINE.match(line)
+        if not m or m.group(2) not in FILES:
+            continue
+        per_pid = files.setdefault(int(m.group(1)), {})
+        name = m.group(2)
+        per_pid[name] = per_pid.get(name, '') + m.group(3) + '\n'
+    return files
+
+
+def read_local(roots: tp.List[int]) -> ProcFiles:
+    """Read the files of all processes in the trees rooted at `roots`."""
+    stats = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'r', encoding='utf-8') as f:
+                stats[int(name)] = f.read()
+        except OSError:
+            # process exited in the meantime
+            pass
+
+    files: ProcFiles = {}
+    for pid in _trees(_ppids(stats), roots):
+        files[pid] = {'stat': stats[pid]}
+        for name in FILES[1:]:
+            try:
+                with open(f'/proc/{pid}/{name}', 'r', encoding='utf-8') as f:
+                    files[pid][name] = f.read()
+            except OSError:
+                # io is only readable for our own processes
+                pass
+    return files
+
+
+def _ppids(stats: tp.Dict[int, str]) -> tp.Dict[int, int]:
+    ppids = {}
+    for (pid, text) in stats.items():
+        try:
+            ppids[pid] = parse_stat(text)['ppid']
+        except (IndexError, ValueError):
+            pass
+    return ppids
+
+
+def _trees(ppids: tp.Dict[int, int],
+           roots: tp.Iterable[int]) -> tp.Dict[int, int]:
+    """Map each process in the trees rooted at `roots` to its root."""
+    children: tp.Dict[int, tp.List[int]] = {}
+    for (pid, ppid) in ppids.items():
+        children.setdefault(ppid, []).append(pid)
+    tree = {}
+    for root in roots:
+        if root not in ppids:
+            continue
+        stack = [root]
+        while stack:
+            pid = stack.pop()
+            tree[pid] = root
+            stack.extend(children.get(pid, []))
+    return tree
+
+
+def tree_stats(files: ProcFiles,
+               roots: tp.List[int]) -> tp.Dict[int, tp.Dict[str, int]]:
+    """
+    Resource usage summed over the process tree of each root in `roots`.
+
+    Returns:
+        Per root pid, `starttime` of the root process in clock ticks since
+        boot, `cpu_ticks`, `threads`, `rss` in kB, voluntary and involuntary
+        context switches `vcsw` and `ivcsw`, `read_bytes`, `write_bytes`, and
+        `run_delay`, the time spent waiting for a CPU in ns. Counters that
+        could not be read are missing.
+    """
+    stats = {}
+    for (pid, pfiles) in files.items():
+        if 'stat' not in pfiles:
+            continue
+        try:
+            pstats = parse_stat(pfiles['stat'])
+            pstats.update(parse_status(pfiles.get('status', '')))
+            pstats.update(parse_io(pfiles.get('io', '')))
+            if 'schedstat' in pfiles:
+                pstats.update(parse_schedstat(pfiles['schedstat']))
+        except (IndexError, ValueError):
+            continue
+        stats[pid] = pstats
+
+    sums: tp.Dict[int, tp.Dict[str, int]] = {}
+    tree = _trees({pid: s['ppid'] for (pid, s) in stats.items()}, roots)
+    for (pid, root) in tree.items():
+        total = sums.setdefault(root, {'starttime': stats[root]['starttime']})
+        for (key, value) in stats[pid].items():
+            if key not in ('ppid', 'starttime'):
+                total[key] = total.get(key, 0) + value
+    return sums
@@ -0,0 +1,102 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Benchmark generating the ns-3 configuration of large E2E topologies."""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import simbricks.orchestration.e2e_components as e2e
+from simbricks.orchestration.simulators import NS3E2ENet
+
+
+def build_network(num_nodes: int, fanout: int) -> NS3E2ENet:
+    """A tree of `num_nodes` switches with one host running a bulk sender per
+    switch."""
+    net = NS3E2ENet()
+    net.name = 'bench'
+    switches = []
+    for i in range(num_nodes):
+        switch = e2e.E2ESwitchNode(f'switch{i}')
+        switch.mtu = '1448'
+        host = e2e.E2ESimpleNs3Host(f'host{i}')
+        host.data_rate = '10Gbps'
+        host.delay = '1us'
+        host.ip = f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}/8'
+        app = e2e.E2EBulkSendApplication('sender')
+        app.remote_ip = '10.0.0.0:5000'
+        host.add_component(app)
+        switch.add_component(host)
+        net.add_component(switch)
+        switches.append(switch)
+    for i in range(1, num_nodes):
+        link = e2e.E2ESimpleChannel(f'link{i}')
+        link.left_node = switches[(i - 1) // fanout]
+        link.right_node = switches[i]
+        link.data_rate = '10Gbps'
+        link.delay = '1us'
+        net.add_component(link)
+    net.init_network()
+    return net
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--nodes', help='Number of switches', type=int, default=10000
+    )
+    parser.add_argument(
+        '--fanout', help='Children per switch in the tree', type=int, default=4
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    net = build_network(args.nodes, args.fanout)
+    print(f'build: {time.perf_counter() - start:.3f} s')
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'params')
+        start = time.perf_counter()
+        with open(path, 'w', encoding='utf-8') as f:
+            net.write_params(f)
+        print(
+            f'params: {time.perf_counter() - start:.3f} s, '
+            f'{os.path.getsize(path) / 1e6:.1f} MB'
+        )
+
+        path = os.path.join(tmpdir, 'config.json')
+        start = time.perf_counter()
+        with open(path, 'w', encoding='utf-8') as f:
+            net.write_json_config(f)
+        print(
+            f'json: {time.perf_counter() - start:.3f} s, '
+            f'{os.path.getsize(path) / 1e6:.1f} MB'
+        )
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        assert len(config['components']) == 2 * args.nodes - 1
+
+
+if __name__ == '__main__':
+    main()
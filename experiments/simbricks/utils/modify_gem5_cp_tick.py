@@ -54,8 +54,13 @@ def main():
             data: str = f.read()
         curtick = int(cp.split('.')[1])
         newdata = data.replace(f'curTick={curtick}', f'curTick={args.tick}', 1)
-        with open(cp_file, 'w', encoding='utf-8') as f:
-            f.write(newdata)
+        # replace atomically, a gem5 instance of another run might be restoring
+        # from this checkpoint concurrently
+        if newdata != data:
+            tmp_file = f'{cp_file}.tmp.{os.getpid()}'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(newdata)
+            os.replace(tmp_file, cp_file)
         print(
             f'INFO {os.path.basename(__file__)}: successfully set tick of '
             f'{args.cpdir}/{cp} to {args.tick}'
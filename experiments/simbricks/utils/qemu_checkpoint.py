@@ -0,0 +1,135 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Wrapper script to take a checkpoint of a QEMU VM.
+
+Runs the given QEMU command and forwards its console output. Once the guest
+prints the checkpoint marker, the VM is stopped through QMP, its state is
+migrated into the given file, and QEMU is shut down."""
+
+import argparse
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+
+class QMPClient(object):
+
+    def __init__(self, path: str) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.file = self.sock.makefile('rw', encoding='utf-8')
+        # consume greeting and enter command mode
+        self.file.readline()
+        self.execute('qmp_capabilities')
+
+    def execute(self, cmd: str, **kwargs) -> dict:
+        msg = {'execute': cmd}
+        if kwargs:
+            msg['arguments'] = kwargs
+        self.file.write(json.dumps(msg) + '\n')
+        self.file.flush()
+        while True:
+            resp = json.loads(self.file.readline())
+            # skip asynchronous events
+            if 'event' in resp:
+                continue
+            if 'error' in resp:
+                raise RuntimeError(f'QMP command {cmd} failed: {resp["error"]}')
+            return resp['return']
+
+    def close(self) -> None:
+        self.file.close()
+        self.sock.close()
+
+
+def checkpoint(qmp_path: str, cpfile: str) -> None:
+    qmp = QMPClient(qmp_path)
+    qmp.execute('stop')
+    qmp.execute('migrate', uri=f'exec:cat > {cpfile}')
+    while True:
+        status = qmp.execute('query-migrate').get('status')
+        if status == 'completed':
+            break
+        if status in ('failed', 'cancelled'):
+            raise RuntimeError(f'QEMU migration {status}')
+        time.sleep(0.1)
+    qmp.execute('quit')
+    qmp.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--qmp', help='Path to QMP unix socket of QEMU', required=True
+    )
+    parser.add_argument(
+        '--cpfile', help='File to store the VM state in', required=True
+    )
+    parser.add_argument(
+        '--marker',
+        help='Console line indicating that the checkpoint should be taken',
+        default='ready to checkpoint'
+    )
+    parser.add_argument('cmd', nargs=argparse.REMAINDER, help='QEMU command')
+
+    args = parser.parse_args()
+    cmd = args.cmd
+    if cmd and cmd[0] == '--':
+        cmd = cmd[1:]
+
+    # the orchestration framework stops us with SIGINT, pass it on to QEMU
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    signal.signal(signal.SIGINT, lambda *_: proc.send_signal(signal.SIGINT))
+    signal.signal(signal.SIGTERM, lambda *_: proc.terminate())
+
+    # only match the marker printed by the guest, not the echo of the command
+    # when running with `set -x`
+    marker_re = re.compile(r'^\s*' + re.escape(args.marker) + r'\s*$')
+    taken = False
+    for line in proc.stdout:
+        sys.stdout.buffer.write(line)
+        sys.stdout.flush()
+        if not taken and marker_re.match(line.decode('utf-8', 'replace')):
+            print(
+                f'INFO {os.path.basename(__file__)}: taking checkpoint',
+                flush=True
+            )
+            checkpoint(args.qmp, args.cpfile)
+            taken = True
+
+    rc = proc.wait()
+    if not taken:
+        print(
+            f'ERROR {os.path.basename(__file__)}: QEMU terminated before '
+            'checkpoint was taken',
+            flush=True
+        )
+        sys.exit(rc if rc != 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+/*
+ * Copyright 2023 Max Planck Institute for Software Systems, and
+ * National University of Singapore
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining
+ * a copy of this software and associated documentation files (the
+ * "Software"), to deal in the Software without restriction, including
+ * without limitation the rights to use, copy, modify, merge, publish,
+ * distribute, sublicense, and/or sell copies of the Software, and to
+ * permit persons to whom the Software is furnished to do so, subject to
+ * the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be
+ * included in all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+ * EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+ * MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+ * IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+ * CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+ * TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+ * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ */
+
+#include "lib/simbricks/network/capture.h"
+
+#include <pcap/pcap.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+
+// size of the pcap file header and the per-packet record header
+#define PCAP_FILE_HDR_LEN 24
+#define PCAP_PKT_HDR_LEN 16
+
+static int rotating(struct SimbricksNetCapture *cap) {
+  return cap->rotate_bytes != 0 || cap->rotate_interval != 0;
+}
+
+static int open_file(struct SimbricksNetCapture *cap) {
+  char name[4096];
+
+  if (!rotating(cap)) {
+    snprintf(name, sizeof(name), "%s", cap->path);
+  } else {
+    snprintf(name, sizeof(name), "%s.%u", cap->path, cap->file_idx);
+  }
+
+  cap->dumper = pcap_dump_open(cap->pc, name);
+  if (cap->dumper == NULL) {
+    fprintf(stderr, "SimbricksNetCapture: opening %s failed: %s\n", name,
+            pcap_geterr(cap->pc));
+    return -1;
+  }
+  cap->file_bytes = PCAP_FILE_HDR_LEN;
+
+  if (rotating(cap) && cap->keep != 0 && cap->file_idx >= cap->keep) {
+    snprintf(name, sizeof(name), "%s.%u", cap->path,
+             cap->file_idx - cap->keep);
+    unlink(name);
+  }
+  return 0;
+}
+
+int SimbricksNetCaptureOpen(struct SimbricksNetCapture *cap,
+                            const char *path) {
+  cap->pc = pcap_open_dead_with_tstamp_precision(DLT_EN10MB, 65535,
+                                                 PCAP_TSTAMP_PRECISION_NANO);
+  if (cap->pc == NULL) {
+    perror("SimbricksNetCaptureOpen: pcap_open_dead failed");
+    return -1;
+  }
+
+  cap->path = strdup(path);
+  cap->file_idx = 0;
+  cap->file_start = 0;
+  return open_file(cap);
+}
+
+static int rotate(struct SimbricksNetCapture *cap, uint64_t ts) {
+  pcap_dump_close(cap->dumper);
+  cap->dumper = NULL;
+  cap->file_idx++;
+  if (cap->rotate_interval != 0 && ts >= cap->file_start) {
+    // keep files aligned to multiples of the interval
+    cap->file_start = ts - (ts - cap->file_start) % cap->rotate_interval;
+  }
+  return open_file(cap);
+}
+
+int SimbricksNetCaptureDump(struct SimbricksNetCapture *cap, uint64_t ts,
+                            const void *data, size_t len) {
+  struct pcap_pkthdr ph;
+
+  if (cap->dumper == NULL)
+    return -1;
+
+  if ((cap->rotate_interval != 0 &&
+       ts >= cap->file_start + cap->rotate_interval) ||
+      (cap->rotate_bytes != 0 && cap->file_bytes > PCAP_FILE_HDR_LEN &&
+       cap->file_bytes + PCAP_PKT_HDR_LEN + len > cap->rotate_bytes)) {
+    if (rotate(cap, ts) != 0)
+      return -1;
+  }
+
+  memset(&ph, 0, sizeof(ph));
+  ph.ts.tv_sec = ts / 1000000000000ULL;
+  ph.ts.tv_usec = (ts % 1000000000000ULL) / 1000ULL;
+  ph.caplen = len;
+  ph.len = len;
+  pcap_dump((unsigned char *)cap->dumper, &ph, (const unsigned char *)data);
+  cap->file_bytes += PCAP_PKT_HDR_LEN + len;
+  return 0;
+}
+
+void SimbricksNetCaptureClose(struct SimbricksNetCapture *cap) {
+  if (cap->dumper != NULL) {
+    pcap_dump_close(cap->dumper);
+    cap->dumper = NULL;
+  }
+  if (cap->pc != NULL) {
+    pcap_close(cap->pc);
+    cap->pc = NULL;
+  }
+  free(cap->path);
+  cap->path = NULL;
+}
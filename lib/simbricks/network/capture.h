@@ -0,0 +1,67 @@
+/*
+ * Copyright 2023 Max Planck Institute for Software Systems, and
+ * National University of Singapore
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining
+ * a copy of this software and associated documentation files (the
+ * "Software"), to deal in the Software without restriction, including
+ * without limitation the rights to use, copy, modify, merge, publish,
+ * distribute, sublicense, and/or sell copies of the Software, and to
+ * permit persons to whom the Software is furnished to do so, subject to
+ * the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be
+ * included in all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+ * EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+ * MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+ * IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+ * CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+ * TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+ * SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ */
+
+#ifndef SIMBRICKS_NETWORK_CAPTURE_H_
+#define SIMBRICKS_NETWORK_CAPTURE_H_
+
+#include <stddef.h>
+#include <stdint.h>
+
+struct pcap;
+struct pcap_dumper;
+
+/**
+ * Packet capture into pcap files, optionally rotated by size or virtual time.
+ *
+ * Zero-initialize, set the parameters, and call SimbricksNetCaptureOpen().
+ * Without rotation packets are written to `path`, otherwise to `path.0`,
+ * `path.1`, ...
+ */
+struct SimbricksNetCapture {
+  /** Start a new file once the current one exceeds this many bytes (0: off) */
+  uint64_t rotate_bytes;
+  /** Start a new file every interval of virtual time in ps (0: off) */
+  uint64_t rotate_interval;
+  /** Only keep the last files when rotating, delete older ones (0: keep all) */
+  unsigned keep;
+
+  struct pcap *pc;
+  struct pcap_dumper *dumper;
+  char *path;
+  unsigned file_idx;
+  uint64_t file_bytes;
+  uint64_t file_start;
+};
+
+int SimbricksNetCaptureOpen(struct SimbricksNetCapture *cap, const char *path);
+/** Write packet with timestamp `ts` in ps, returns 0 on success. */
+int SimbricksNetCaptureDump(struct SimbricksNetCapture *cap, uint64_t ts,
+                            const void *data, size_t len);
+void SimbricksNetCaptureClose(struct SimbricksNetCapture *cap);
+
+static inline int SimbricksNetCaptureActive(struct SimbricksNetCapture *cap) {
+  return cap->dumper != NULL;
+}
+
+#endif  // SIMBRICKS_NETWORK_CAPTURE_H_
@@ -24,7 +24,7 @@ include mk/subdir_pre.mk
 
 lib_netif := $(d)libnetwork.a
 
-OBJS := $(addprefix $(d),if.o)
+OBJS := $(addprefix $(d),if.o capture.o)
 
 libsimbricks_objs += $(OBJS)
 
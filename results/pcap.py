@@ -0,0 +1,85 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import sys
+
+from results.utils.pcap import (
+    analyze, flow_str, one_way_latency, run_captures
+)
+
+# How to use
+# $ python3 -m results.pcap out/pcap [INTERVAL_NS]
+# $ python3 -m results.pcap out/RUN.json [INTERVAL_NS]
+# $ python3 -m results.pcap --latency SENDER_PCAP RECEIVER_PCAP
+#
+
+
+def fmt_ns(x):
+    if x is None:
+        return '-'
+    if x >= 1e6:
+        return f'{x / 1e6:.1f}ms'
+    if x >= 1e3:
+        return f'{x / 1e3:.1f}us'
+    return f'{x:.0f}ns'
+
+
+def print_stats(stats, interval):
+    print(
+        f'{stats.packets} packets, {len(stats.flows)} IPv4 flows, '
+        f'{stats.other_packets} other packets'
+    )
+    print(
+        f'{"flow":50} {"packets":>10} {"Mbit/s":>10} {"peak":>10} '
+        f'{"iat p50":>10} {"iat p99":>10} {"retrans":>8}'
+    )
+    for (key, flow) in sorted(stats.flows.items()):
+        duration = flow.last_ts - flow.first_ts
+        mbps = flow.bytes * 8e3 / duration if duration > 0 else 0
+        tput = flow.throughput(interval)
+        peak = tput.max() / 1e6 if len(tput) else 0
+        print(
+            f'{flow_str(key):50} {flow.packets:>10} {mbps:>10.1f} '
+            f'{peak:>10.1f} '
+            f'{fmt_ns(flow.iat_quantile(0.5)):>10} '
+            f'{fmt_ns(flow.iat_quantile(0.99)):>10} {flow.retransmissions:>8}'
+        )
+
+
+if len(sys.argv) > 1 and sys.argv[1] == '--latency':
+    stats = one_way_latency(sys.argv[2], sys.argv[3])
+    print(
+        f'matched {stats.matched} packets: mean {fmt_ns(stats.mean())}, '
+        f'min {fmt_ns(stats.min)}, p50 {fmt_ns(stats.quantile(0.5))}, '
+        f'p99 {fmt_ns(stats.quantile(0.99))}, max {fmt_ns(stats.max)}'
+    )
+    for (key, (n, s)) in sorted(stats.flows.items()):
+        print(f'{flow_str(key):50} {n:>10} {fmt_ns(s / n):>10}')
+    sys.exit()
+
+interval = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+if sys.argv[1].endswith('.json'):
+    for (sim, files) in sorted(run_captures(sys.argv[1]).items()):
+        print(f'{sim}: {len(files)} files')
+        print_stats(analyze(files, interval), interval)
+else:
+    print_stats(analyze(sys.argv[1], interval), interval)
@@ -0,0 +1,61 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import sys
+
+from results.utils.sync_profile import channel_report, sim_progress, straggler
+
+# How to use
+# $ python3 -m results.sync_profile out/EXPERIMENT-1.json
+#
+
+
+def fmt(x, scale=1.0, unit=''):
+    if x is None:
+        return '-'
+    return f'{x / scale:.2f}{unit}'
+
+
+for path in sys.argv[1:]:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    print(path)
+    print(
+        f'{"simulator":40} {"channel":40} {"virt ns/s":>12} '
+        f'{"peer ns/s":>12} {"sync msg/s":>12} {"blocked":>8}'
+    )
+    for r in channel_report(data):
+        print(
+            f'{r["sim"]:40} {r["channel"]:40} '
+            f'{fmt(r["progress"], 1000):>12} {fmt(r["in_rate"], 1000):>12} '
+            f'{fmt(r["sync_rate"]):>12} {fmt(r["blocked"], 0.01, "%"):>8}'
+        )
+
+    for (name, progress) in sorted(sim_progress(data).items()):
+        if progress:
+            print(f'{name}: slowdown {1e12 / progress:.0f}x')
+    slowest = straggler(data)
+    if slowest is not None:
+        print(f'straggler: {slowest}')
+    print()
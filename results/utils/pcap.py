@@ -0,0 +1,493 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Streaming analysis of pcap captures written by the SimBricks switch and wire
+# (`run.py --pcap`). Captures are memory-mapped and processed in chunks of
+# records, so memory use is bounded by the chunk size and the number of flows
+# rather than by the size of the capture.
+
+import json
+import mmap
+import struct
+
+import numpy as np
+
+CHUNK_RECORDS = 1 << 18
+
+IAT_EDGES = 10**np.arange(0, 10.05, 0.1)
+"""Log-spaced histogram bin edges for inter-arrival times in nanoseconds,
+from 1 ns to 10 s."""
+
+_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1000),
+    b'\xa1\xb2\xc3\xd4': ('>', 1000),
+    b'\x4d\x3c\xb2\xa1': ('<', 1),
+    b'\xa1\xb2\x3c\x4d': ('>', 1),
+}
+"""Byte order and nanoseconds per timestamp fraction by magic number."""
+
+LINKTYPE_ETHERNET = 1
+
+PACKET_DTYPE = np.dtype([
+    ('ts', np.int64),
+    ('len', np.uint32),
+    ('src', np.uint32),
+    ('dst', np.uint32),
+    ('proto', np.uint8),
+    ('sport', np.uint16),
+    ('dport', np.uint16),
+    ('ip_id', np.uint16),
+    ('seq', np.uint32),
+    ('payload', np.int32),
+    ('flags', np.uint8),
+    ('ipv4', np.bool_),
+])
+"""Parsed packet: timestamp in ns, length on the wire, and IPv4/TCP/UDP header
+fields, which are zero for other packets."""
+
+TCP = 6
+UDP = 17
+
+
+class PcapReader(object):
+    """Memory-mapped pcap file, iterated in chunks of parsed packets."""
+
+    def __init__(self, path, chunk_records=CHUNK_RECORDS):
+        self.path = path
+        self.chunk_records = chunk_records
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        except ValueError:
+            # empty file
+            self._mm = b''
+        if len(self._mm) < 24 or self._mm[:4] not in _MAGIC:
+            self.close()
+            raise ValueError(f'{path}: not a pcap file')
+        (self.endian, self.ns_per_frac) = _MAGIC[self._mm[:4]]
+        (self.snaplen, self.linktype) = struct.unpack_from(
+            self.endian + 'II', self._mm, 16
+        )
+        self._buf = np.frombuffer(self._mm, dtype=np.uint8)
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._buf = None
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def records(self):
+        """Yield chunks of record headers as tuples of arrays `(offset, ts,
+        caplen, len)`, with `offset` pointing at the packet data."""
+        caplen_at = struct.Struct(self.endian + 'I').unpack_from
+        size = len(self._mm)
+        off = 24
+        while off + 16 <= size:
+            # walking the records is inherently sequential, only collect
+            # offsets here and read the headers vectorized below
+            offs = []
+            for _ in range(self.chunk_records):
+                if off + 16 > size:
+                    break
+                next_off = off + 16 + caplen_at(self._mm, off + 8)[0]
+                if next_off > size:
+                    # truncated last record of a capture still being written
+                    size = off
+                    break
+                offs.append(off)
+                off = next_off
+            if not offs:
+                break
+            hdr = np.array(offs, dtype=np.int64)
+            sec = self._u32le(hdr).astype(np.int64)
+            frac = self._u32le(hdr + 4).astype(np.int64)
+            ts = sec * 1000000000 + frac * self.ns_per_frac
+            yield (
+                hdr + 16,
+                ts,
+                self._u32le(hdr + 8).astype(np.int64),
+                self._u32le(hdr + 12)
+            )
+            self._release(off)
+
+    def _release(self, end):
+        """Drop pages of records before `end` from memory, they will not be
+        accessed again."""
+        end -= end % mmap.PAGESIZE
+        if end > 0 and hasattr(mmap, 'MADV_DONTNEED'):
+            self._mm.madvise(mmap.MADV_DONTNEED, 0, end)
+
+    def _u32le(self, idx):
+        """32-bit integers in the byte order of the capture's headers."""
+        if self.endian == '>':
+            return self._u32(idx)
+        return (
+            self._u8(idx) | self._u8(idx + 1) << 8 | self._u8(idx + 2) << 16 |
+            self._u8(idx + 3) << 24
+        )
+
+    def _u8(self, idx):
+        return self._buf[np.minimum(idx, len(self._buf) - 1)].astype(np.uint32)
+
+    def _u16(self, idx):
+        return (self._u8(idx) << 8) | self._u8(idx + 1)
+
+    def _u32(self, idx):
+        return (self._u16(idx) << 16) | self._u16(idx + 2)
+
+    def chunks(self):
+        """Yield chunks of packets as arrays of `PACKET_DTYPE`."""
+        if self.linktype != LINKTYPE_ETHERNET:
+            raise ValueError(
+                f'{self.path}: unsupported link type {self.linktype}'
+            )
+        for (off, ts, caplen, length) in self.records():
+            pkts = np.zeros(len(off), dtype=PACKET_DTYPE)
+            pkts['ts'] = ts
+            pkts['len'] = length
+
+            # skip a single VLAN tag
+            ethertype = self._u16(off + 12)
+            vlan = ethertype == 0x8100
+            ip = off + 14 + 4 * vlan
+            ethertype = np.where(vlan, self._u16(off + 16), ethertype)
+            ipv4 = (ethertype == 0x0800) & (caplen >= ip - off + 20)
+            ipv4 &= (self._u8(ip) >> 4) == 4
+            ihl = (self._u8(ip) & 0xf) * 4
+            l4 = ip + ihl
+            proto = self._u8(ip + 9)
+            total = self._u16(ip + 2).astype(np.int64)
+
+            pkts['ipv4'] = ipv4
+            pkts['src'] = np.where(ipv4, self._u32(ip + 12), 0)
+            pkts['dst'] = np.where(ipv4, self._u32(ip + 16), 0)
+            pkts['ip_id'] = np.where(ipv4, self._u16(ip + 4), 0)
+
+            ports = ipv4 & ((proto == TCP) | (proto == UDP))
+            ports &= caplen >= l4 - off + 4
+            pkts['proto'] = np.where(ipv4, proto, 0)
+            pkts['sport'] = np.where(ports, self._u16(l4), 0)
+            pkts['dport'] = np.where(ports, self._u16(l4 + 2), 0)
+
+            tcp = ports & (proto == TCP) & (caplen >= l4 - off + 14)
+            doff = (self._u8(l4 + 12) >> 4) * 4
+            pkts['seq'] = np.where(tcp, self._u32(l4 + 4), 0)
+            pkts['flags'] = np.where(tcp, self._u8(l4 + 13), 0)
+            payload = np.where(tcp, total - ihl - doff, 0)
+            payload = np.where(ports & (proto == UDP), total - ihl - 8, payload)
+            pkts['payload'] = np.maximum(payload, 0)
+            yield pkts
+
+
+def ip_str(addr):
+    addr = int(addr)
+    return '.'.join(str(addr >> s & 0xff) for s in (24, 16, 8, 0))
+
+
+def flow_str(key):
+    (src, dst, proto, sport, dport) = key
+    name = {TCP: 'tcp', UDP: 'udp'}.get(proto, f'proto {proto}')
+    if proto in (TCP, UDP):
+        return f'{name} {ip_str(src)}:{sport} -> {ip_str(dst)}:{dport}'
+    return f'{name} {ip_str(src)} -> {ip_str(dst)}'
+
+
+def _flow_index(pkts):
+    """Unique flow keys of `pkts` and the index of each packet's key."""
+    addrs = pkts['src'].astype(np.uint64) << np.uint64(32) | pkts['dst']
+    ports = (
+        pkts['proto'].astype(np.uint64) << np.uint64(32) |
+        pkts['sport'].astype(np.uint64) << np.uint64(16) | pkts['dport']
+    )
+    # sorting integers is much faster than sorting structured keys
+    (uniq_addrs, inv_addrs) = np.unique(addrs, return_inverse=True)
+    combined = inv_addrs.astype(np.uint64) << np.uint64(40) | ports
+    (uniq, inv) = np.unique(combined, return_inverse=True)
+    keys = []
+    for c in uniq.tolist():
+        a = int(uniq_addrs[c >> 40])
+        keys.append((a >> 32, a & 0xffffffff, c >> 32 & 0xff, c >> 16 & 0xffff,
+                     c & 0xffff))
+    return (keys, inv)
+
+
+def _flow_groups(pkts):
+    """Split a chunk of IPv4 packets by flow. Yields the flow key and the
+    packets of that flow in capture order."""
+    (keys, inv) = _flow_index(pkts)
+    order = np.argsort(inv, kind='stable')
+    bounds = np.searchsorted(inv[order], np.arange(len(keys) + 1))
+    for (i, key) in enumerate(keys):
+        yield (key, pkts[order[bounds[i]:bounds[i + 1]]])
+
+
+def hist_quantile(hist, q):
+    """Approximate quantile of values in a histogram over `IAT_EDGES`,
+    interpolating logarithmically within the bin."""
+    total = hist.sum()
+    if total == 0:
+        return None
+    cum = np.cumsum(hist)
+    i = min(int(np.searchsorted(cum, q * total)), len(hist) - 1)
+    frac = (q * total - (cum[i] - hist[i])) / hist[i] if hist[i] else 0.0
+    (lo, hi) = (IAT_EDGES[i], IAT_EDGES[i + 1])
+    return float(lo * (hi / lo)**frac)
+
+
+def _unwrap_seq(seq, last):
+    """Extend 32-bit TCP sequence numbers to 64 bits, continuing from the
+    extended sequence number `last` of the previous packet."""
+    d = np.diff(seq.astype(np.int64), prepend=last & 0xffffffff)
+    d = (d + (1 << 31)) % (1 << 32) - (1 << 31)
+    return last + np.cumsum(d)
+
+
+class FlowStats(object):
+    """Statistics of a single flow."""
+
+    def __init__(self, key):
+        self.key = key
+        self.packets = 0
+        self.bytes = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.bin_bytes = np.zeros(0, dtype=np.int64)
+        """Bytes on the wire per throughput interval since the start of the
+        capture."""
+        self.iat_hist = np.zeros(len(IAT_EDGES) - 1, dtype=np.int64)
+        """Histogram of inter-arrival times over `IAT_EDGES`."""
+        self.retransmissions = 0
+        self._seq = None
+        self._max_end = None
+
+    def add(self, pkts, t0, interval):
+        if self.first_ts is None:
+            self.first_ts = int(pkts['ts'][0])
+            iat = np.diff(pkts['ts'])
+        else:
+            iat = np.diff(pkts['ts'], prepend=self.last_ts)
+        self.iat_hist += np.histogram(iat, IAT_EDGES)[0]
+        self.packets += len(pkts)
+        self.bytes += int(pkts['len'].sum())
+        self.last_ts = int(pkts['ts'][-1])
+
+        bins = (pkts['ts'] - t0) // interval
+        counts = np.bincount(bins, weights=pkts['len']).astype(np.int64)
+        if len(counts) > len(self.bin_bytes):
+            self.bin_bytes = np.pad(
+                self.bin_bytes, (0, len(counts) - len(self.bin_bytes))
+            )
+        self.bin_bytes[:len(counts)] += counts
+
+        if self.key[2] == TCP:
+            self._add_tcp(pkts)
+
+    def _add_tcp(self, pkts):
+        if self._seq is None:
+            self._seq = int(pkts['seq'][0])
+            self._max_end = self._seq
+        seq = _unwrap_seq(pkts['seq'], self._seq)
+        self._seq = int(seq[-1])
+        end = seq + pkts['payload']
+        # highest sequence number sent before each packet
+        prev_max = np.maximum.accumulate(np.concatenate(([self._max_end],
+                                                         end)))[:-1]
+        self._max_end = int(max(self._max_end, end.max()))
+        data = pkts['payload'] > 0
+        self.retransmissions += int(np.count_nonzero(data & (end <= prev_max)))
+
+    def throughput(self, interval):
+        """Throughput in bit/s per interval since the start of the capture."""
+        return self.bin_bytes * 8e9 / interval
+
+    def iat_quantile(self, q):
+        """Approximate inter-arrival time quantile in nanoseconds."""
+        return hist_quantile(self.iat_hist, q)
+
+
+class CaptureStats(object):
+    """Per-flow statistics of a capture."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        """Throughput interval in nanoseconds."""
+        self.t0 = None
+        self.packets = 0
+        self.other_packets = 0
+        """Packets other than IPv4, e.g. ARP."""
+        self.flows = {}
+
+    def add(self, pkts):
+        if not len(pkts):
+            return
+        if self.t0 is None:
+            self.t0 = int(pkts['ts'][0])
+        self.packets += len(pkts)
+        ip = pkts[pkts['ipv4']]
+        self.other_packets += len(pkts) - len(ip)
+        # packets before t0 if the capture is not ordered by time
+        ip = ip[ip['ts'] >= self.t0]
+        for (key, fpkts) in _flow_groups(ip):
+            if key not in self.flows:
+                self.flows[key] = FlowStats(key)
+            self.flows[key].add(fpkts, self.t0, self.interval)
+
+
+def analyze(path, interval=1000000, chunk_records=CHUNK_RECORDS):
+    """
+    Per-flow throughput, inter-arrival times and TCP retransmissions of a
+    capture.
+
+    Args:
+        path: Capture file, or list of rotated capture files in the order they
+            were written.
+        interval: Throughput interval in nanoseconds.
+    """
+    stats = CaptureStats(interval)
+    for p in [path] if isinstance(path, str) else path:
+        with PcapReader(p, chunk_records) as reader:
+            for pkts in reader.chunks():
+                stats.add(pkts)
+    return stats
+
+
+def run_captures(run_json):
+    """Capture files registered in the output of a run, by network
+    simulator."""
+    with open(run_json, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {
+        sim: cap['files'] or [cap['path']]
+        for (sim, cap) in data.get('pcaps', {}).items()
+    }
+
+
+def _packet_ids(pkts):
+    """Hash identifying an IPv4 packet at different points in the network."""
+    h = pkts['src'].astype(np.uint64)
+    for (field, mult) in (('dst', 0x9e3779b97f4a7c15),
+                          ('ip_id', 0xc2b2ae3d27d4eb4f),
+                          ('sport', 0x165667b19e3779f9),
+                          ('dport', 0x27d4eb2f165667c5),
+                          ('seq', 0xff51afd7ed558ccd),
+                          ('proto', 0xc4ceb9fe1a85ec53)):
+        h = (h ^ pkts[field].astype(np.uint64)) * np.uint64(mult)
+        h ^= h >> np.uint64(29)
+    return h
+
+
+class LatencyStats(object):
+    """One-way latencies of packets matched between two captures."""
+
+    def __init__(self):
+        self.matched = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+        self.hist = np.zeros(len(IAT_EDGES) - 1, dtype=np.int64)
+        """Histogram of latencies over `IAT_EDGES`."""
+        self.flows = {}
+        """Number of matched packets and latency sum per flow."""
+
+    def add(self, pkts, lat):
+        if not len(lat):
+            return
+        self.matched += len(lat)
+        self.sum += int(lat.sum())
+        (lo, hi) = (int(lat.min()), int(lat.max()))
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+        self.hist += np.histogram(lat, IAT_EDGES)[0]
+        (keys, inv) = _flow_index(pkts)
+        counts = np.bincount(inv)
+        sums = np.bincount(inv, weights=lat)
+        for (key, n, s) in zip(keys, counts, sums):
+            (n0, s0) = self.flows.get(key, (0, 0))
+            self.flows[key] = (n0 + int(n), s0 + int(s))
+
+    def mean(self):
+        return self.sum / self.matched if self.matched else None
+
+    def quantile(self, q):
+        x = hist_quantile(self.hist, q)
+        return None if x is None else min(max(x, self.min), self.max)
+
+
+def one_way_latency(
+    path_a, path_b, max_latency=1000000000, chunk_records=CHUNK_RECORDS
+):
+    """
+    Latency of IPv4 packets captured first in `path_a` and later in `path_b`,
+    e.g. at the sender's and receiver's switch.
+
+    Packets are matched by addresses, ports, IP ID and TCP sequence number
+    within a window of `max_latency` nanoseconds, so memory use is bounded by
+    the number of packets captured in `path_a` during that window. Both
+    captures have to use the same (virtual) clock.
+    """
+    stats = LatencyStats()
+    with PcapReader(path_a, chunk_records) as ra, \
+            PcapReader(path_b, chunk_records) as rb:
+        chunks_a = ra.chunks()
+        pend_ids = np.zeros(0, dtype=np.uint64)
+        pend_ts = np.zeros(0, dtype=np.int64)
+        a_done = False
+        a_last = None
+        for pkts_b in rb.chunks():
+            pkts_b = pkts_b[pkts_b['ipv4']]
+            if not len(pkts_b):
+                continue
+            b_max = int(pkts_b['ts'].max())
+            # read A up to the end of this chunk of B
+            while not a_done and (a_last is None or a_last <= b_max):
+                pkts_a = next(chunks_a, None)
+                if pkts_a is None:
+                    a_done = True
+                    break
+                pkts_a = pkts_a[pkts_a['ipv4']]
+                if len(pkts_a):
+                    a_last = int(pkts_a['ts'].max())
+                    pend_ids = np.concatenate((pend_ids, _packet_ids(pkts_a)))
+                    pend_ts = np.concatenate((pend_ts, pkts_a['ts']))
+
+            order = np.argsort(pend_ids, kind='stable')
+            (s_ids, s_ts) = (pend_ids[order], pend_ts[order])
+            ids_b = _packet_ids(pkts_b)
+            pos = np.searchsorted(s_ids, ids_b)
+            found = pos < len(s_ids)
+            found[found] &= s_ids[pos[found]] == ids_b[found]
+            lat = pkts_b['ts'][found] - s_ts[pos[found]]
+            ok = (lat >= 0) & (lat <= max_latency)
+            stats.add(pkts_b[found][ok], lat[ok])
+
+            # forget packets that are too old to still arrive
+            keep = pend_ts >= int(pkts_b['ts'].min()) - max_latency
+            (pend_ids, pend_ts) = (pend_ids[keep], pend_ts[keep])
+    return stats
@@ -0,0 +1,88 @@
+# Copyright 2023 Max Planck Institute for Software Systems, and
+# National University of Singapore
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Analysis of the profiling time series recorded with `run.py --profile-int`.
+
+
+def _rate(values, times):
+    """Average increase per second over all samples with a value."""
+    pts = [(t, v) for (t, v) in zip(times, values) if v is not None]
+    if len(pts) < 2 or pts[-1][0] <= pts[0][0]:
+        return None
+    return (pts[-1][1] - pts[0][1]) / (pts[-1][0] - pts[0][0])
+
+
+def _blocked(main_times, in_ts):
+    """Fraction of samples in which the simulator had caught up with the last
+    timestamp received on a channel and therefore waited for that peer."""
+    n = 0
+    blocked = 0
+    for (mt, ts) in zip(main_times, in_ts):
+        if mt is None or ts is None:
+            continue
+        n += 1
+        if mt >= ts:
+            blocked += 1
+    return blocked / n if n else None
+
+
+def sim_progress(data):
+    """Virtual picoseconds per wall-clock second for each simulator."""
+    ret = {}
+    for (name, series) in data.get('profile', {}).items():
+        if 'time' in series:
+            ret[name] = _rate(series['main_time'], series['time'])
+    return ret
+
+
+def channel_report(data):
+    """Per-channel statistics of one run output as list of dicts."""
+    rows = []
+    for (name, series) in sorted(data.get('profile', {}).items()):
+        if 'time' not in series:
+            continue
+        times = series['time']
+        progress = _rate(series['main_time'], times)
+        sync_period = series.get('sync_period')
+        for (chan, ts) in sorted(series['channels'].items()):
+            out_rate = _rate(ts['out'], times)
+            sync_rate = None
+            if out_rate is not None and sync_period:
+                # upper bound, reached when no data messages are sent
+                sync_rate = out_rate / (sync_period * 1000)
+            rows.append({
+                'sim': name,
+                'channel': chan,
+                'progress': progress,
+                'in_rate': _rate(ts['in'], times),
+                'sync_rate': sync_rate,
+                'blocked': _blocked(series['main_time'], ts['in']),
+            })
+    return rows
+
+
+def straggler(data):
+    """Name of the simulator making the slowest progress."""
+    progress = {n: p for (n, p) in sim_progress(data).items() if p is not None}
+    if not progress:
+        return None
+    return min(progress, key=progress.get)
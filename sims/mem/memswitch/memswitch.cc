@@ -25,7 +25,6 @@
 #include <arpa/inet.h>
 #include <linux/if_ether.h>
 #include <linux/ip.h>
-#include <pcap/pcap.h>
 #include <unistd.h>
 
 #include <cassert>
@@ -34,12 +33,14 @@
 #include <cstdio>
 #include <cstdlib>
 #include <cstring>
+#include <set>
 #include <string>
 #include <unordered_map>
 #include <vector>
 
 #include <simbricks/base/cxxatomicfix.h>
 extern "C" {
+#include <simbricks/network/capture.h>
 #include <simbricks/network/if.h>
 #include <simbricks/nicif/nicif.h>
 
@@ -50,7 +51,9 @@ extern "C" {
 #define NETSWITCH_STAT
 
 struct SimbricksBaseIfParams netParams;
-static pcap_dumper_t *dumpfile = nullptr;
+static struct SimbricksNetCapture capture;
+/* Ports to capture packets of, all if empty */
+static std::set<size_t> capture_ports;
 
 #ifdef NETSWITCH_STAT
 #endif
@@ -233,6 +236,23 @@ class NetPort {
   }
 };
 
+/** Directory for shm regions of listening ports (-H), if not next to socket */
+static const char *shm_dir = nullptr;
+
+static std::string ShmPath(const char *sock_path) {
+  std::string shm_path;
+  if (shm_dir) {
+    const char *base = strrchr(sock_path, '/');
+    shm_path = shm_dir;
+    shm_path += '/';
+    shm_path += base ? base + 1 : sock_path;
+  } else {
+    shm_path = sock_path;
+  }
+  shm_path += "-shm";
+  return shm_path;
+}
+
 /** Listening switch port (connected to by another network) */
 class NetListenPort : public NetPort {
  protected:
@@ -251,8 +271,7 @@ class NetListenPort : public NetPort {
     if (!Init())
       return false;
 
-    std::string shm_path = path_;
-    shm_path += "-shm";
+    std::string shm_path = ShmPath(path_);
 
     if (SimbricksBaseIfSHMPoolCreate(
             &pool_, shm_path.c_str(),
@@ -321,17 +340,13 @@ static void sigusr2_handler(int dummy) {
 
 static void forward_pkt(const void *pkt_data, size_t pkt_len, size_t port_id,
                         size_t iport_id) {
-  struct pcap_pkthdr ph;
   NetPort &dest_port = *ports[port_id];
 
   // log to pcap file if initialized
-  if (dumpfile) {
-    memset(&ph, 0, sizeof(ph));
-    ph.ts.tv_sec = cur_ts / 1000000000000ULL;
-    ph.ts.tv_usec = (cur_ts % 1000000000000ULL) / 1000ULL;
-    ph.caplen = pkt_len;
-    ph.len = pkt_len;
-    pcap_dump((unsigned char *)dumpfile, &ph, (unsigned char *)pkt_data);
+  if (SimbricksNetCaptureActive(&capture) &&
+      (capture_ports.empty() || capture_ports.count(port_id) ||
+       capture_ports.count(iport_id))) {
+    SimbricksNetCaptureDump(&capture, cur_ts, pkt_data, pkt_len);
   }
   // print sending tick: [packet type] source_IP -> dest_IP len:
 
@@ -474,7 +489,7 @@ int main(int argc, char *argv[]) {
   int c;
   int bad_option = 0;
   int sync_eth = 1;
-  pcap_t *pc = nullptr;
+  const char *capture_path = nullptr;
   int netmem_idx = 0;
   size_t port_i;
   std::string netmem_name;
@@ -482,7 +497,8 @@ int main(int argc, char *argv[]) {
   SimbricksNetIfDefaultParams(&netParams);
 
   // Parse command line argument
-  while ((c = getopt(argc, argv, "s:h:uS:E:p:m:")) != -1 && !bad_option) {
+  while ((c = getopt(argc, argv, "s:h:H:uS:E:p:m:P:r:R:k:")) != -1 &&
+         !bad_option) {
     switch (c) {
       case 's': {
         NetPort *port = new NetPort(optarg, sync_eth);
@@ -498,6 +514,10 @@ int main(int argc, char *argv[]) {
         break;
       }
 
+      case 'H':
+        shm_dir = optarg;
+        break;
+
       case 'u':
         sync_eth = 0;
         break;
@@ -511,14 +531,23 @@ int main(int argc, char *argv[]) {
         break;
 
       case 'p':
-        pc = pcap_open_dead_with_tstamp_precision(DLT_EN10MB, 65535,
-                                                  PCAP_TSTAMP_PRECISION_NANO);
-        if (pc == nullptr) {
-          perror("pcap_open_dead failed");
-          return EXIT_FAILURE;
-        }
+        capture_path = optarg;
+        break;
 
-        dumpfile = pcap_dump_open(pc, optarg);
+      case 'P':
+        capture_ports.insert(strtoull(optarg, NULL, 0));
+        break;
+
+      case 'r':
+        capture.rotate_bytes = strtoull(optarg, NULL, 0);
+        break;
+
+      case 'R':
+        capture.rotate_interval = strtoull(optarg, NULL, 0) * 1000ULL;
+        break;
+
+      case 'k':
+        capture.keep = strtoul(optarg, NULL, 0);
         break;
 
       case 'm':
@@ -608,10 +637,16 @@ int main(int argc, char *argv[]) {
   if (ports.empty() || bad_option) {
     fprintf(stderr,
             "Usage: net_switch [-S SYNC-PERIOD] [-E ETH-LATENCY] "
+            "[-p PCAP-FILE [-P PORT ...] [-r ROTATE-BYTES] "
+            "[-R ROTATE-INTERVAL] [-k KEEP-FILES]] [-H SHM-DIR] "
             "-s SOCKET-A [-s SOCKET-B ...]\n");
     return EXIT_FAILURE;
   }
 
+  if (capture_path && SimbricksNetCaptureOpen(&capture, capture_path) != 0) {
+    return EXIT_FAILURE;
+  }
+
   signal(SIGINT, sigint_handler);
   signal(SIGTERM, sigint_handler);
   signal(SIGUSR1, sigusr1_handler);
@@ -663,5 +698,6 @@ int main(int argc, char *argv[]) {
           s_d2n_poll_sync, (double)s_d2n_poll_sync / s_d2n_poll_suc);
 #endif
 
+  SimbricksNetCaptureClose(&capture);
   return 0;
 }
@@ -23,6 +23,7 @@
  */
 
 #include <signal.h>
+#include <unistd.h>
 #include <verilated.h>
 #include <verilated_fst_c.h>
 
@@ -326,15 +327,40 @@ int main(int argc, char *argv[]) {
 
   dump_if(top);
 
-  if (argc <= 1) {
+  int c;
+  while ((c = getopt(argc, argv, "S:E:y")) != -1) {
+    switch (c) {
+      case 'S':
+        sync_period = strtoull(optarg, NULL, 0) * 1000ULL;
+        break;
+
+      case 'E':
+        eth_latency = strtoull(optarg, NULL, 0) * 1000ULL;
+        break;
+
+      case 'y':
+        synchronized = 1;
+        break;
+
+      default:
+        std::cerr << "Usage: menshen_hw [-S SYNC-PERIOD] [-E ETH-LATENCY] "
+                     "[-y] SOCKET-A [SOCKET-B ...]"
+                  << std::endl;
+        return EXIT_FAILURE;
+    }
+  }
+
+  if (optind >= argc) {
     std::cerr << "no ports" << std::endl;
     return EXIT_FAILURE;
   }
 
   struct SimbricksBaseIfParams params;
   SimbricksNetIfDefaultParams(&params);
+  params.sync_interval = sync_period;
+  params.link_latency = eth_latency;
 
-  for (int i = 1; i < argc; i++) {
+  for (int i = optind; i < argc; i++) {
     NetPort *np = new NetPort(&params);
     if (!np->Connect(argv[i], synchronized)) {
       std::cerr << "connecting to port " << argv[i] << " failed" << std::endl;
@@ -359,6 +385,16 @@ int main(int argc, char *argv[]) {
 
     poll_ports();
 
+    // wait until all peers have caught up with the current time
+    if (synchronized) {
+      for (auto port : ports) {
+        while (!exiting && port->IsSync() &&
+               port->NextTimestamp() <= main_time) {
+          poll_ports();
+        }
+      }
+    }
+
     /* falling edge */
     top->clk = !top->clk;
     main_time += clock_period / 2;
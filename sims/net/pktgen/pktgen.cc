@@ -25,6 +25,7 @@
 #include <arpa/inet.h>
 #include <linux/if_ether.h>
 #include <linux/ip.h>
+#include <linux/udp.h>
 #include <pcap/pcap.h>
 #include <unistd.h>
 
@@ -49,16 +50,28 @@ extern "C" {
 
 struct SimbricksBaseIfParams netParams;
 static pcap_dumper_t *dumpfile = nullptr;
-#define PKT_LEN 1500                                           // byte
-static uint64_t bit_rate = 100 * 1000ULL * 1000ULL * 1000ULL;  // 100 Gbps
+#define MAX_PKT_LEN 1536                                       // byte
+#define MIN_PKT_LEN (ETH_HLEN + sizeof(struct iphdr) + sizeof(struct udphdr))
+static size_t pkt_len = 1500;                                  // byte
+static double bit_rate = 100 * 1000ULL * 1000ULL * 1000ULL;   // 100 Gbps
 static uint64_t target_tick = 1 * 1000ULL * 1000ULL * 1000ULL * 1000ULL;  // 1s
 static uint64_t last_pkt_sent = 0;
 static uint64_t pkt_recv_num = 0;
 static uint64_t pkt_recv_byte = 0;
 static uint64_t pkt_tx_num = 0;
 static uint64_t pkt_tx_byte = 0;
-static uint64_t period = (1E12 * 8 * PKT_LEN) / bit_rate;  // per packet
-static uint8_t packet[PKT_LEN];
+static uint64_t pkt_tx_drop = 0;
+static uint64_t period = ULLONG_MAX;  // per packet
+
+/* Packets to one destination, sent in proportion to the weight */
+struct Flow {
+  uint8_t dest;
+  int weight;
+  int current;
+  uint64_t tx_num;
+  uint8_t packet[MAX_PKT_LEN];
+};
+static std::vector<Flow> flows;
 
 #ifdef NETSWITCH_STAT
 #endif
@@ -221,6 +234,23 @@ class NetPort : public Port {
   }
 };
 
+/** Directory for shm regions of listening ports (-H), if not next to socket */
+static const char *shm_dir = nullptr;
+
+static std::string ShmPath(const char *sock_path) {
+  std::string shm_path;
+  if (shm_dir) {
+    const char *base = strrchr(sock_path, '/');
+    shm_path = shm_dir;
+    shm_path += '/';
+    shm_path += base ? base + 1 : sock_path;
+  } else {
+    shm_path = sock_path;
+  }
+  shm_path += "-shm";
+  return shm_path;
+}
+
 /** Hosting network switch port (connected to another network) */
 class NetHostPort : public NetPort {
  protected:
@@ -238,8 +268,7 @@ class NetHostPort : public NetPort {
 
   bool Connect(const char *path, int sync) override {
     sync_ = sync;
-    std::string shm_path = path;
-    shm_path += "-shm";
+    std::string shm_path = ShmPath(path);
     struct SimbricksBaseIfParams params = netParams;
     params.sock_path = path;
     if (!sync)
@@ -320,17 +349,75 @@ static void pollq(Port &port, size_t iport) {
   port.RxDone();
 }
 
+/* Pick the next flow by smooth weighted round robin */
+static Flow &next_flow() {
+  int total = 0;
+  Flow *best = nullptr;
+  for (auto &f : flows) {
+    f.current += f.weight;
+    total += f.weight;
+    if (!best || f.current > best->current)
+      best = &f;
+  }
+  best->current -= total;
+  return *best;
+}
+
+static void send_pkt(Port &port, uint64_t ts) {
+  Flow &f = next_flow();
+  if (port.TxPacket(f.packet, pkt_len, ts)) {
+    f.tx_num++;
+    pkt_tx_num++;
+    pkt_tx_byte += pkt_len;
+  } else {
+    pkt_tx_drop++;
+  }
+}
+
+static void build_packet(Flow &f, uint8_t src, uint16_t sport) {
+  uint8_t *p = f.packet;
+  memset(p, 0xFF, sizeof(f.packet));
+
+  struct ethhdr *eth = (struct ethhdr *)p;
+  memset(eth->h_dest, 0, ETH_ALEN);
+  memset(eth->h_source, 0, ETH_ALEN);
+  eth->h_dest[5] = f.dest;
+  eth->h_source[5] = src;
+  eth->h_proto = htons(ETH_P_IP);
+
+  struct iphdr *ip = (struct iphdr *)(eth + 1);
+  memset(ip, 0, sizeof(*ip));
+  ip->version = 4;
+  ip->ihl = sizeof(*ip) / 4;
+  ip->tot_len = htons(pkt_len - ETH_HLEN);
+  ip->ttl = 64;
+  ip->protocol = IPPROTO_UDP;
+  ip->saddr = htonl(0x0a000000 | src);
+  ip->daddr = htonl(0x0a000000 | f.dest);
+  uint32_t sum = 0;
+  const uint16_t *w = (const uint16_t *)ip;
+  for (size_t i = 0; i < sizeof(*ip) / 2; i++)
+    sum += w[i];
+  while (sum >> 16)
+    sum = (sum & 0xFFFF) + (sum >> 16);
+  ip->check = ~sum;
+
+  struct udphdr *udp = (struct udphdr *)(ip + 1);
+  udp->source = htons(sport);
+  udp->dest = htons(9);  // discard
+  udp->len = htons(pkt_len - ETH_HLEN - sizeof(*ip));
+  udp->check = 0;
+}
+
 static void sendq(Port &port, size_t iport) {
   // then send
   if (port.IsSync()) {
     while ((last_pkt_sent + period) <= cur_ts) {
-      port.TxPacket(packet, PKT_LEN, last_pkt_sent + period);
+      send_pkt(port, last_pkt_sent + period);
       last_pkt_sent += period;
-      pkt_tx_num++;
-      pkt_tx_byte += PKT_LEN;
     }
-  } else {
-    port.TxPacket(packet, PKT_LEN, last_pkt_sent + period);
+  } else if (period != ULLONG_MAX) {
+    send_pkt(port, last_pkt_sent + period);
   }
   // if not sync: send packet
   // else: send packet periodically until allowed time
@@ -346,12 +433,14 @@ int main(int argc, char *argv[]) {
   int sync_eth = 1;
   pcap_t *pc = nullptr;
   int my_num = 0;
-  int brate = 10;
+  double brate = 10;
+  char *end;
 
   SimbricksNetIfDefaultParams(&netParams);
 
   // Parse command line argument
-  while ((c = getopt(argc, argv, "s:h:uS:E:p:n:b:")) != -1 && !bad_option) {
+  while ((c = getopt(argc, argv, "s:h:H:uS:E:p:n:b:l:d:T:")) != -1 &&
+         !bad_option) {
     switch (c) {
       case 's': {
         NetPort *port = new NetPort;
@@ -375,6 +464,10 @@ int main(int argc, char *argv[]) {
         break;
       }
 
+      case 'H':
+        shm_dir = optarg;
+        break;
+
       case 'u':
         sync_eth = 0;
         break;
@@ -404,15 +497,38 @@ int main(int argc, char *argv[]) {
         break;
 
       case 'b':
-        brate = strtol(optarg, NULL, 0);
-        fprintf(stderr, "bit rate set to: %d Gbps\n", brate);
-        if (brate == 0) {
-          period = ULLONG_MAX;
-        } else {
-          bit_rate = brate * 1000ULL * 1000ULL * 1000ULL;
-          period = (1E12 * 8 * PKT_LEN) / bit_rate;  // per packet
+        brate = strtod(optarg, NULL);
+        fprintf(stderr, "bit rate set to: %g Gbps\n", brate);
+        bit_rate = brate * 1000ULL * 1000ULL * 1000ULL;
+        assert(brate >= 0 && brate < 200);
+        break;
+
+      case 'l':
+        pkt_len = strtoul(optarg, NULL, 0);
+        if (pkt_len < MIN_PKT_LEN || pkt_len > MAX_PKT_LEN) {
+          fprintf(stderr, "packet length has to be between %zu and %d\n",
+                  MIN_PKT_LEN, MAX_PKT_LEN);
+          return EXIT_FAILURE;
         }
-        assert(brate < 200);
+        break;
+
+      case 'd': {
+        // DEST[:WEIGHT]
+        Flow f;
+        f.dest = strtoul(optarg, &end, 0);
+        f.weight = *end == ':' ? strtol(end + 1, NULL, 0) : 1;
+        f.current = 0;
+        f.tx_num = 0;
+        if (f.weight <= 0) {
+          fprintf(stderr, "flow weight has to be positive\n");
+          return EXIT_FAILURE;
+        }
+        flows.push_back(f);
+        break;
+      }
+
+      case 'T':
+        target_tick = strtoull(optarg, NULL, 0) * 1000ULL;
         break;
 
       default:
@@ -424,8 +540,9 @@ int main(int argc, char *argv[]) {
 
   if (ports.empty() || bad_option) {
     fprintf(stderr,
-            "Usage: pktgen [-S SYNC-PERIOD] [-E ETH-LATENCY] "
-            "-s SOCKET-A [-s SOCKET-B ...] [-n my_num] [-b bitrate(GB)]\n");
+            "Usage: pktgen [-S SYNC-PERIOD] [-E ETH-LATENCY] [-H SHM-DIR] "
+            "-s SOCKET-A [-s SOCKET-B ...] [-n my_num] [-b bitrate(GB)] "
+            "[-l PKT-LEN] [-d DEST[:WEIGHT] ...] [-T DURATION]\n");
     return EXIT_FAILURE;
   }
 
@@ -436,15 +553,21 @@ int main(int argc, char *argv[]) {
   } else {  // even number
     pkt_port->dest_mac.addr[5] = my_num + 1;
   }
-  struct mac_addr *mac_tmp = (struct mac_addr *)(&packet[0]);
-  mac_tmp->addr[5] = pkt_port->dest_mac.addr[5];  // dest mac
-  mac_tmp = (struct mac_addr *)(&packet[6]);
-  mac_tmp->addr[5] = pkt_port->my_mac.addr[5];  // source mac
-
-  int kk;
-  for (kk = 12; kk < PKT_LEN - 12; kk++) {
-    packet[kk] = 0xFF;
+
+  // without explicit destinations send to the peer of the pair
+  if (flows.empty()) {
+    Flow f;
+    f.dest = pkt_port->dest_mac.addr[5];
+    f.weight = 1;
+    f.current = 0;
+    f.tx_num = 0;
+    flows.push_back(f);
   }
+  for (size_t i = 0; i < flows.size(); i++)
+    build_packet(flows[i], my_num, 1024 + i);
+
+  if (bit_rate > 0)
+    period = (1E12 * 8 * pkt_len) / bit_rate;
 
   signal(SIGINT, sigint_handler);
   signal(SIGTERM, sigint_handler);
@@ -493,6 +616,13 @@ int main(int argc, char *argv[]) {
           pkt_recv_byte);
 
 #endif
+  fprintf(stderr, "pktgen: tx_packets = %lu\n", pkt_tx_num);
+  fprintf(stderr, "pktgen: tx_bytes = %lu\n", pkt_tx_byte);
+  fprintf(stderr, "pktgen: tx_dropped = %lu\n", pkt_tx_drop);
+  fprintf(stderr, "pktgen: rx_packets = %lu\n", pkt_recv_num);
+  fprintf(stderr, "pktgen: rx_bytes = %lu\n", pkt_recv_byte);
+  for (auto &f : flows)
+    fprintf(stderr, "pktgen: flow_%u_tx_packets = %lu\n", f.dest, f.tx_num);
 
   return 0;
 }
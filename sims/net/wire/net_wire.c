@@ -26,7 +26,6 @@
 #include <fcntl.h>
 #include <linux/if.h>
 #include <linux/if_tun.h>
-#include <pcap/pcap.h>
 #include <pthread.h>
 #include <signal.h>
 #include <stdio.h>
@@ -36,11 +35,15 @@
 #include <sys/mman.h>
 #include <unistd.h>
 
+#include <simbricks/network/capture.h>
 #include <simbricks/network/if.h>
 
 static uint64_t cur_ts;
 static int exiting = 0;
-static pcap_dumper_t *dumpfile = NULL;
+static struct SimbricksNetCapture capture;
+/* bit mask of directions to capture, bit 0 for packets from A to B, bit 1 for
+ * packets from B to A */
+static unsigned capture_dirs = 0;
 
 static void sigint_handler(int dummy) {
   exiting = 1;
@@ -50,13 +53,13 @@ static void sigusr1_handler(int dummy) {
   fprintf(stderr, "main_time = %lu\n", cur_ts);
 }
 
-static void move_pkt(struct SimbricksNetIf *from, struct SimbricksNetIf *to) {
+static void move_pkt(struct SimbricksNetIf *from, struct SimbricksNetIf *to,
+                     unsigned dir) {
   volatile union SimbricksProtoNetMsg *msg_from =
       SimbricksNetIfInPoll(from, cur_ts);
   volatile union SimbricksProtoNetMsg *msg_to;
   volatile struct SimbricksProtoNetMsgPacket *tx;
   volatile struct SimbricksProtoNetMsgPacket *rx;
-  struct pcap_pkthdr ph;
   uint8_t type;
 
   if (msg_from == NULL)
@@ -67,13 +70,10 @@ static void move_pkt(struct SimbricksNetIf *from, struct SimbricksNetIf *to) {
     tx = &msg_from->packet;
 
     // log to pcap file if initialized
-    if (dumpfile) {
-      memset(&ph, 0, sizeof(ph));
-      ph.ts.tv_sec = cur_ts / 1000000000000ULL;
-      ph.ts.tv_usec = (cur_ts % 1000000000000ULL) / 1000ULL;
-      ph.caplen = tx->len;
-      ph.len = tx->len;
-      pcap_dump((unsigned char *)dumpfile, &ph, (unsigned char *)tx->data);
+    if (SimbricksNetCaptureActive(&capture) &&
+        (capture_dirs == 0 || (capture_dirs & (1 << dir)))) {
+      SimbricksNetCaptureDump(&capture, cur_ts, (const void *)tx->data,
+                              tx->len);
     }
 
     msg_to = SimbricksNetIfOutAlloc(to, cur_ts);
@@ -101,14 +101,46 @@ int main(int argc, char *argv[]) {
   struct SimbricksNetIf nsif_a, nsif_b;
   uint64_t ts_a, ts_b;
   int sync_a, sync_b;
-  pcap_t *pc = NULL;
+  int c;
+  int bad_option = 0;
+  int nargs;
+  char **args;
 
   SimbricksNetIfDefaultParams(&params);
 
-  if (argc < 3 || argc > 7) {
+  // capture options precede the positional arguments
+  while ((c = getopt(argc, argv, "P:r:R:k:")) != -1) {
+    switch (c) {
+      case 'P':
+        capture_dirs |= 1 << (strtoul(optarg, NULL, 0) & 1);
+        break;
+
+      case 'r':
+        capture.rotate_bytes = strtoull(optarg, NULL, 0);
+        break;
+
+      case 'R':
+        capture.rotate_interval = strtoull(optarg, NULL, 0) * 1000ULL;
+        break;
+
+      case 'k':
+        capture.keep = strtoul(optarg, NULL, 0);
+        break;
+
+      default:
+        bad_option = 1;
+        break;
+    }
+  }
+  // positional arguments, with args[1] as the first one
+  args = argv + optind - 1;
+  nargs = argc - optind + 1;
+
+  if (bad_option || nargs < 3 || nargs > 7) {
     fprintf(stderr,
-            "Usage: net_wire SOCKET-A SOCKET-B [SYNC-MODE (ignored)] "
-            "[SYNC-PERIOD] [ETH-LATENCY] [PCAP-FILE]\n");
+            "Usage: net_wire [-P DIRECTION ...] [-r ROTATE-BYTES] "
+            "[-R ROTATE-INTERVAL] [-k KEEP-FILES] SOCKET-A SOCKET-B "
+            "[SYNC-MODE (ignored)] [SYNC-PERIOD] [ETH-LATENCY] [PCAP-FILE]\n");
     return EXIT_FAILURE;
   }
 
@@ -116,28 +148,20 @@ int main(int argc, char *argv[]) {
   signal(SIGTERM, sigint_handler);
   signal(SIGUSR1, sigusr1_handler);
 
-  if (argc >= 5)
-    params.sync_interval = strtoull(argv[4], NULL, 0) * 1000ULL;
-
-  if (argc >= 6)
-    params.link_latency = strtoull(argv[5], NULL, 0) * 1000ULL;
+  if (nargs >= 5)
+    params.sync_interval = strtoull(args[4], NULL, 0) * 1000ULL;
 
-  if (argc >= 7) {
-    pc = pcap_open_dead_with_tstamp_precision(DLT_EN10MB, 65535,
-                                              PCAP_TSTAMP_PRECISION_NANO);
-    if (pc == NULL) {
-      perror("pcap_open_dead failed");
-      return EXIT_FAILURE;
-    }
+  if (nargs >= 6)
+    params.link_latency = strtoull(args[5], NULL, 0) * 1000ULL;
 
-    dumpfile = pcap_dump_open(pc, argv[6]);
-  }
+  if (nargs >= 7 && SimbricksNetCaptureOpen(&capture, args[6]) != 0)
+    return EXIT_FAILURE;
 
   sync_a = sync_b = 1;
-  if (SimbricksNetIfInit(&nsif_a, &params, argv[1], &sync_a) != 0) {
+  if (SimbricksNetIfInit(&nsif_a, &params, args[1], &sync_a) != 0) {
     return -1;
   }
-  if (SimbricksNetIfInit(&nsif_b, &params, argv[2], &sync_b) != 0) {
+  if (SimbricksNetIfInit(&nsif_b, &params, args[2], &sync_b) != 0) {
     return -1;
   }
 
@@ -153,8 +177,8 @@ int main(int argc, char *argv[]) {
     }
 
     do {
-      move_pkt(&nsif_a, &nsif_b);
-      move_pkt(&nsif_b, &nsif_a);
+      move_pkt(&nsif_a, &nsif_b, 0);
+      move_pkt(&nsif_b, &nsif_a, 1);
       ts_a = SimbricksNetIfInTimestamp(&nsif_a);
       ts_b = SimbricksNetIfInTimestamp(&nsif_b);
     } while (!exiting &&
@@ -168,7 +192,6 @@ int main(int argc, char *argv[]) {
       cur_ts = ts_b;
   }
 
-  if (dumpfile)
-    pcap_dump_close(dumpfile);
+  SimbricksNetCaptureClose(&capture);
   return 0;
 }